@@ -6,6 +6,7 @@ Session API
 This file is released under the GNU GPL version 3 or later.
 """
 
+import io
 import os
 
 from ..compat import text_type
@@ -13,6 +14,7 @@ from ..compat import text_type
 from .base import error
 from .devices import NameWrapper
 from . import implementation
+from .display import recorder
 
 from ..data import read_codepage as codepage
 from ..data import read_fonts as font
@@ -27,6 +29,8 @@ class Session(object):
         self.interface = interface
         self._kwargs = kwargs
         self._impl = None
+        # screen recording in progress
+        self._recorder = None
 
     def __enter__(self):
         """Context guard."""
@@ -43,6 +47,7 @@ class Session(object):
         """Pickle the session."""
         pickle_dict = self.__dict__.copy()
         pickle_dict['interface'] = None
+        pickle_dict['_recorder'] = None
         return pickle_dict
 
     def __setstate__(self, pickle_dict):
@@ -137,6 +142,64 @@ class Session(object):
         self.start()
         return self._impl.display.vpage.pixels[:, :].to_rows()
 
+    def get_pixel_snapshot(self):
+        """
+        Get currently displayed pixels as a read-only snapshot,
+        with attributes `height`, `width`, `pitch` and `pixels`, a memoryview of the bytes.
+        The same snapshot is returned until the screen changes.
+        """
+        self.start()
+        return self._impl.display.get_pixel_snapshot()
+
+    def get_text_snapshot(self):
+        """
+        Get currently displayed text as a read-only snapshot, with attributes `height`, `width`,
+        `chars` and `attrs`, memoryviews of the bytes of each cell.
+        The same snapshot is returned until the screen changes.
+        """
+        self.start()
+        return self._impl.display.get_text_snapshot()
+
+    def get_generation(self):
+        """Get a number that changes whenever the displayed screen changes."""
+        self.start()
+        return self._impl.display.get_generation()
+
+    def save_screen(self, file_name_or_object):
+        """Save currently displayed pixels as a PNG image, to a file name or binary stream."""
+        self.start()
+        snapshot = self._impl.display.get_pixel_snapshot()
+        data = recorder.encode_png(
+            snapshot.height, snapshot.width, snapshot.pixels.tobytes(),
+            self._impl.display.get_rgb_table()
+        )
+        if isinstance(file_name_or_object, (bytes, text_type)):
+            with io.open(file_name_or_object, 'wb') as f:
+                f.write(data)
+        else:
+            file_name_or_object.write(data)
+
+    def start_recording(self, file_name_or_object, frame_rate=10):
+        """
+        Record the screen as an animated PNG, to a file name or binary stream.
+        Changes are captured at most `frame_rate` times a second while BASIC runs.
+        """
+        self.start()
+        self.stop_recording()
+        self._recorder = recorder.ScreenRecorder(
+            self._impl.display, file_name_or_object, frame_rate
+        )
+        self._impl.queues.add_frame_handler(self._recorder)
+        # capture the starting screen
+        self._recorder.flush()
+
+    def stop_recording(self):
+        """Stop recording the screen and write the animated PNG."""
+        if self._recorder:
+            self._impl.queues.remove_frame_handler(self._recorder)
+            self._recorder.close()
+            self._recorder = None
+
     def greet(self):
         """Emit the interpreter greeting and show the key bar."""
         self.start()
@@ -150,5 +213,6 @@ class Session(object):
 
     def close(self):
         """Close the session."""
+        self.stop_recording()
         if self._impl:
             self._impl.close()
@@ -65,10 +65,13 @@ class ByteMatrix(object):
         if isinstance(value, int):
             if isinstance(x, slice):
                 if isinstance(y, slice):
+                    # all rows have the same width, so the run of bytes can be reused
+                    fill = bytearray((value,)) * len(xrange(*x.indices(self._width)))
                     for row in self._rows[y]:
-                        row[x] = bytearray(value for _ in iterbytes(row[x]))
+                        row[x] = fill
                 else:
-                    self._rows[y][x] = bytearray(value for _ in iterbytes(self._rows[y][x]))
+                    row = self._rows[y]
+                    row[x] = bytearray((value,)) * len(xrange(*x.indices(len(row))))
             else:
                 if isinstance(y, slice):
                     for row in self._rows[y]:
@@ -112,13 +115,18 @@ class ByteMatrix(object):
     def _elementwise_list(self, rhs, oper):
         """Helper for elementwise operations."""
         if isinstance(rhs, int):
-            return [
-                bytearray(oper(_lbyte, rhs) for _lbyte in iterbytes(_lrow))
-                for _lrow in self._rows
-            ]
+            # apply through a lookup table
+            table = _scalar_table(oper, rhs)
+            return [bytearray(_lrow).translate(table) for _lrow in self._rows]
         else:
             assert self._height == rhs._height
             assert self._width == rhs._width
+            if oper in _BITWISE_OPERATORS:
+                # bitwise operations work on whole rows at once
+                return [
+                    _int_to_row(oper(_row_to_int(_lrow), _row_to_int(_rrow)), len(_lrow))
+                    for _lrow, _rrow in zip(self._rows, rhs._rows)
+                ]
             return [
                 bytearray(
                     oper(_lbyte, _rbyte)
@@ -149,7 +157,7 @@ class ByteMatrix(object):
 
     def __lshift__(self, rhs):
         """Byte-masked left-shift."""
-        return self.elementwise(rhs, lambda _l, _r: (_l << _r) & 0xff)
+        return self.elementwise(rhs, _masked_lshift)
 
     def elementwise_inplace(self, rhs, oper):
         """In-place element-wise operation with another matrix or a scalar."""
@@ -174,7 +182,7 @@ class ByteMatrix(object):
 
     def __ilshift__(self, rhs):
         """In-place left-shift."""
-        return self.elementwise_inplace(rhs, lambda _l, _r: (_l << _r) & 0xff)
+        return self.elementwise_inplace(rhs, _masked_lshift)
 
     @property
     def width(self):
@@ -229,10 +237,8 @@ class ByteMatrix(object):
 
     def render(self, back, fore):
         """Set attributes on bit matrix."""
-        return self._create_from_rows([
-            bytearray(fore if _c else back for _c in _row)
-            for _row in self._rows
-        ])
+        table = bytearray((back,)) + bytearray((fore,)) * 255
+        return self._create_from_rows([bytearray(_row).translate(table) for _row in self._rows])
 
     def hextend(self, by_width, fill=0):
         """Extend width by given number of bytes."""
@@ -325,6 +331,51 @@ class ByteMatrix(object):
         ])
 
 
+##############################################################################
+# frame shared between threads
+
+class SharedFrame(object):
+    """
+    Pixel matrix handed over between interpreter and interface threads.
+    The interpreter writes a generation only once the interface has released the previous one,
+    so that the two never access the pixels at the same time.
+    """
+
+    def __init__(self, height, width):
+        """Create a new shared frame."""
+        self.pixels = ByteMatrix(height, width)
+        # last generation written by the interpreter and released by the interface
+        self._written = 0
+        self._released = 0
+
+    def is_free(self):
+        """The interface has released the last generation written."""
+        return self._released == self._written
+
+    def write(self, source, rects):
+        """Copy rectangles (x0, y0, x1, y1 inclusive) from a matrix; return new generation."""
+        dst_rows, src_rows = self.pixels._rows, source._rows
+        for x0, y0, x1, y1 in rects:
+            for y in xrange(y0, min(y1+1, self.pixels.height)):
+                dst_rows[y][x0:x1+1] = src_rows[y][x0:x1+1]
+        self._written += 1
+        return self._written
+
+    def copy_to(self, target, rects):
+        """Copy rectangles (x0, y0, x1, y1 inclusive) to a matrix, clipped to its size."""
+        dst_rows, src_rows = target._rows, self.pixels._rows
+        width = min(target.width, self.pixels.width)
+        height = min(target.height, self.pixels.height)
+        for x0, y0, x1, y1 in rects:
+            x1 = min(x1, width-1)
+            for y in xrange(y0, min(y1+1, height)):
+                dst_rows[y][x0:x1+1] = src_rows[y][x0:x1+1]
+
+    def release(self, generation):
+        """Hand the frame back to the interpreter."""
+        self._released = generation
+
+
 ##############################################################################
 # concatenation
 
@@ -346,29 +397,76 @@ def vstack(matrices):
 ##############################################################################
 # bytearray functions
 
-def unpack_bytes(packed, items_per_byte):
-    """Unpack from packed-bits representation."""
+# operators that can be applied to whole rows converted to integers
+_BITWISE_OPERATORS = (
+    operator.__and__, operator.__or__, operator.__xor__,
+    operator.__iand__, operator.__ior__, operator.__ixor__,
+)
+
+# maximum number of cached lookup tables for operations with a scalar
+_SCALAR_TABLE_CACHE_SIZE = 256
+_SCALAR_TABLES = {}
+
+def _masked_lshift(lhs, rhs):
+    """Byte-masked left-shift."""
+    return (lhs << rhs) & 0xff
+
+def _scalar_table(oper, rhs):
+    """Lookup table for an operation with a scalar on each byte value."""
+    try:
+        return _SCALAR_TABLES[oper, rhs]
+    except KeyError:
+        if len(_SCALAR_TABLES) >= _SCALAR_TABLE_CACHE_SIZE:
+            _SCALAR_TABLES.clear()
+        table = bytearray(oper(_byte, rhs) for _byte in xrange(256))
+        _SCALAR_TABLES[oper, rhs] = table
+        return table
+
+def _row_to_int(row):
+    """Convert a row of bytes to a big integer."""
+    return int(hexlify(row), 16) if len(row) else 0
+
+def _int_to_row(value, length):
+    """Convert a big integer to a row of bytes."""
+    return bytearray(unhexlify(b'%0*x' % (2*length, value))) if length else bytearray()
+
+def _build_unpack_table(items_per_byte):
+    """Build a table of unpacked items for each byte value."""
     bpp = 8 // items_per_byte
     mask = (1 << bpp) - 1
     shifts = [8 - bpp - _sh for _sh in range(0, 8, bpp)]
-    return bytearray(
-        (_byte >> _shift) & mask
-        for _byte in iterbytes(packed)
-        for _shift in shifts
-    )
+    return [
+        bytes(bytearray((_byte >> _shift) & mask for _shift in shifts))
+        for _byte in xrange(256)
+    ]
+
+# unpacked items for each byte value, by number of items per byte
+_UNPACK_TABLES = {_ipb: _build_unpack_table(_ipb) for _ipb in (1, 2, 4, 8)}
+# packed byte value for each group of (masked) items
+_PACK_TABLES = {
+    _ipb: {_items: _byte for _byte, _items in enumerate(_table)}
+    for _ipb, _table in _UNPACK_TABLES.items()
+}
+# masks to apply to items before packing
+_MASK_TABLES = {
+    _ipb: bytearray(_byte & ((1 << (8 // _ipb)) - 1) for _byte in xrange(256))
+    for _ipb in (1, 2, 4, 8)
+}
+
+def unpack_bytes(packed, items_per_byte):
+    """Unpack from packed-bits representation."""
+    table = _UNPACK_TABLES[items_per_byte]
+    return bytearray(b''.join([table[_byte] for _byte in iterbytes(packed)]))
 
 def pack_bytes(unpacked, items_per_byte):
     """Pack into packed-bits representation."""
-    bpp = 8 // items_per_byte
-    mask = (1 << bpp) - 1
-    shifts = [8 - bpp - _sh for _sh in range(0, 8, bpp)]
-    # ceildiv(a,b) == -(floordiv(-a,b))
-    packed_width = -(-len(unpacked) // items_per_byte)
-    prepacked = [
-        (_byte & mask) << _shift
-        for _byte, _shift in zip(iterbytes(unpacked), shifts*packed_width)
-    ]
+    masked = bytearray(unpacked).translate(_MASK_TABLES[items_per_byte])
+    if items_per_byte == 1:
+        return masked
+    # pad incomplete last byte with zeros
+    masked.extend(bytearray(-len(masked) % items_per_byte))
+    table = _PACK_TABLES[items_per_byte]
     return bytearray([
-        sum(prepacked[_offs : _offs+items_per_byte])
-        for _offs in xrange(0, len(prepacked), items_per_byte)
+        table[bytes(masked[_offs : _offs+items_per_byte])]
+        for _offs in xrange(0, len(masked), items_per_byte)
     ])
@@ -57,6 +57,10 @@ VIDEO_SCROLL = 'scroll'
 VIDEO_SET_PALETTE = 'set_palette'
 # update screen section
 VIDEO_UPDATE = 'update'
+# share a pixel frame with the interface
+VIDEO_SHARE_FRAME = 'share_frame'
+# update screen sections from the shared frame
+VIDEO_UPDATE_FRAME = 'update_frame'
 # set caption message
 VIDEO_SET_CAPTION = 'set_caption'
 # clipboard copy reply
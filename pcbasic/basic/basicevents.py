@@ -211,6 +211,9 @@ class PlayHandler(EventHandler):
 
     def check_input(self, signal):
         """Check and trigger PLAY (music queue) events."""
+        if signal.event_type is None:
+            # checked once per statement; in simulated time, the program must move time forward
+            self._sound.poll()
         play_now = self._sound.tones_waiting()
         if self._sound.multivoice:
             if (self.last > play_now and play_now < self.trig):
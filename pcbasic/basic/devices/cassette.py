@@ -8,10 +8,12 @@ This file is released under the GNU GPL version 3 or later.
 
 import os
 import io
+import re
 import math
 import struct
 import logging
 from chunk import Chunk
+from binascii import hexlify, unhexlify
 
 from ...compat import int2byte, iterchar, zip
 
@@ -28,6 +30,22 @@ TOKEN_TO_TYPE = {
 
 TYPE_TO_TOKEN = dict(reversed(item) for item in TOKEN_TO_TYPE.items())
 
+# file headers indexed on tape images, by image file name, size and modification time
+_header_index = {}
+# tolerance on tape positions of records, in seconds; records are more than a second apart
+_POSITION_SLACK = 0.1
+
+# WAV levels below, around and above zero
+_LOW, _ZERO, _HIGH = b'\0', b'\1', b'\2'
+# runs of equal levels
+_RUNS = re.compile(b'\0+|\1+|\2+')
+# zeros between opposite levels
+_UP_THROUGH_ZERO = re.compile(b'(?<=\0)\1+(?=\2)')
+_DOWN_THROUGH_ZERO = re.compile(b'(?<=\2)\1+(?=\0)')
+# CAS bytes that are not all zeros, not all ones
+_NOT_ZEROS = re.compile(b'[^\x00]')
+_NOT_ONES = re.compile(b'[^\xff]')
+
 
 #################################################################################
 # Exceptions
@@ -109,12 +127,22 @@ class CASDevice(object):
     def _search(self, trunk_req=None, filetypes_req=None):
         """Play until a file header record is found for the given filename."""
         try:
+            # if we know where the headers are, we don't need to play through the files
+            headers = self.tapestream.headers()
             while True:
-                trunk, filetype, seg, offset, length = self.tapestream.open_read()
+                if headers is None:
+                    trunk, filetype, seg, offset, length = self.tapestream.open_read()
+                elif headers:
+                    position, trunk, filetype, seg, offset, length = headers.pop(0)
+                else:
+                    raise EndOfTape()
                 if (
                         (not trunk_req or trunk.rstrip() == trunk_req.rstrip()) and
                         (not filetypes_req or filetype in filetypes_req)
                     ):
+                    if headers is not None:
+                        self.tapestream.wind(position)
+                        trunk, filetype, seg, offset, length = self.tapestream.open_read()
                     message = b'%s.%s Found.' % (trunk, filetype)
                     if not self.is_quiet:
                         self.console.write_line(message)
@@ -127,6 +155,8 @@ class CASDevice(object):
                     logging.debug(timestamp(self.tapestream.counter()) + message)
         except EndOfTape:
             # reached end-of-tape without finding appropriate file
+            # don't leave the last skipped file open
+            self.tapestream.close()
             # we'll loop the tape for future use
             self.tapestream.wind(0)
             # timeout error to align with GW-BASIC behaviour
@@ -186,11 +216,21 @@ class CassetteStream(object):
         self.length = 0
         self.filetype = b''
         self.rwmode = ''
+        self.record_num = 0
+        # file headers on tape: position, name, type, segment, offset, length
+        self._index = None
+        # position from which the tape is not yet indexed; None if all of it is
+        self._indexed_to = 0
+        # tape could not be read through
+        self._unindexable = False
 
     def close(self):
         """Finalise the track on the tape stream."""
         if self.is_open:
             self._close_record_buffer()
+            if self.rwmode == 'w' and self._index is not None:
+                # anything after the new file needs to be indexed again
+                self._indexed_to = self.counter()
             self.is_open = False
             self.rwmode = ''
 
@@ -245,7 +285,7 @@ class CassetteStream(object):
             else:
                 # unknown record type
                 logging.debug('%s Skipped non-header record.', timestamp(self.bitstream.counter()))
-        file_trunk, token, self.length, seg, offset = struct.unpack('<8sBHHH', record[1:16])
+        file_trunk, token, self.length, seg, offset = _unpack_header(record)
         try:
             self.filetype = TOKEN_TO_TYPE[token]
         except KeyError:
@@ -255,6 +295,55 @@ class CassetteStream(object):
         self.is_open = True
         return file_trunk, self.filetype, seg, offset, self.length
 
+    def headers(self):
+        """
+        List the file headers from the current position onwards, with their tape positions.
+        Returns None if the tape can't be indexed.
+        """
+        here = self.counter()
+        if not self._update_index():
+            return None
+        return [_entry for _entry in self._index if _entry[0] >= here - _POSITION_SLACK]
+
+    def _update_index(self):
+        """Index the headers on the tape that have not been indexed yet; False on failure."""
+        if self._unindexable:
+            return False
+        if self._index is None:
+            key = self.bitstream.image_key()
+            if key in _header_index:
+                self._index, self._indexed_to = list(_header_index[key]), None
+                return True
+            self._index, self._indexed_to = [], 0
+        if self._indexed_to is None:
+            return True
+        here, mode = self.counter(), self.bitstream.operating_mode
+        self.bitstream.switch_mode('r')
+        self.wind(self._indexed_to)
+        try:
+            while True:
+                position = self.counter()
+                record = self._read_record(None)
+                if record[0:1] == b'\xa5':
+                    file_trunk, token, length, seg, offset = _unpack_header(record)
+                    self._index.append(
+                        (position, file_trunk, TOKEN_TO_TYPE[token], seg, offset, length)
+                    )
+        except EndOfTape:
+            self._indexed_to = None
+            key = self.bitstream.image_key()
+            if key:
+                _header_index[key] = list(self._index)
+        except (CassetteIOError, KeyError) as e:
+            # unreadable record or unknown file type; play through the tape instead
+            logging.debug('Could not index tape: %r', e)
+            self._index = None
+            self._unindexable = True
+        finally:
+            self.wind(here)
+            self.bitstream.switch_mode(mode)
+        return self._index is not None
+
     def open_write(self, name, filetype, seg, offs, length):
         """Write a file header to the tape."""
         self.record_num = 0
@@ -275,7 +364,14 @@ class CassetteStream(object):
             b'\xa5', name[:8] + b' ' * (8-len(name)),
             TYPE_TO_TOKEN[filetype], length, seg, offs, 0, 1
         )
+        position = self.counter()
         self._write_record(header)
+        if self._index is not None:
+            # the new file overwrites whatever was on the tape from here
+            self._index = [
+                _entry for _entry in self._index if _entry[0] < position - _POSITION_SLACK
+            ]
+            self._index.append((position, header[1:9], filetype, seg, offs, length))
         self.is_open = True
 
     def _read_record(self, reclen):
@@ -311,18 +407,10 @@ class CassetteStream(object):
 
     def _read_block(self):
         """Read a block of data from tape."""
-        count = 0
-        data = b''
-        while True:
-            if count == 256:
-                break
-            byte = self.bitstream.read_byte()
-            if byte is None:
-                raise PulseError()
-            data += int2byte(byte)
-            count += 1
-        bytes0, bytes1 = self.bitstream.read_byte(), self.bitstream.read_byte()
-        crc_given = bytes0 * 0x100 + bytes1
+        block = self.bitstream.read_bytes(258)
+        data = block[:256]
+        # crc is written big-endian
+        crc_given, = struct.unpack('>H', block[256:])
         crc_calc = crc(data)
         # if crc for either polarity matches, return that
         if crc_given == crc_calc:
@@ -333,13 +421,8 @@ class CassetteStream(object):
         """Write a 256-byte block to tape."""
         # fill out short blocks with last byte
         data += data[-1:]*(256-len(data))
-        for b in iterchar(data):
-            self.bitstream.write_byte(ord(b))
-        crc_word = crc(data)
         # crc is written big-endian
-        lo, hi = (ord(_b) for _b in iterchar(struct.pack('<H', crc_word)))
-        self.bitstream.write_byte(hi)
-        self.bitstream.write_byte(lo)
+        self.bitstream.write_bytes(data + struct.pack('>H', crc(data)))
 
     def _fill_record_buffer(self):
         """Read to fill the tape buffer."""
@@ -425,6 +508,10 @@ class TapeBitStream(object):
         """Set position of tape in seconds."""
         pass
 
+    def image_key(self):
+        """Identify the tape image by file name, size and modification time; None if unsaved."""
+        return None
+
     def read_intro(self):
         """Try to read intro; ensure image not empty."""
         for b in bytearray(self.intro):
@@ -475,8 +562,7 @@ class TapeBitStream(object):
 
     def write_leader(self):
         """Write the leader / pilot tone."""
-        for _ in range(256):
-            self.write_byte(0xff)
+        self.write_bytes(b'\xff' * 256)
         self.write_bit(0)
         self.write_byte(0x16)
 
@@ -497,6 +583,15 @@ class TapeBitStream(object):
         for bit in bits:
             self.write_bit(bit)
 
+    def read_bytes(self, count):
+        """Read a number of bytes from the tape."""
+        return bytes(bytearray(self.read_byte() for _ in range(count)))
+
+    def write_bytes(self, data):
+        """Write a number of bytes to tape image."""
+        for byte in bytearray(data):
+            self.write_byte(byte)
+
     def close(self):
         """Eject tape."""
         pass
@@ -541,30 +636,38 @@ class TapeBitStream(object):
 
 
 class CASBitStream(TapeBitStream):
-    """CAS-file cassette image bit stream."""
+    """
+    CAS-file cassette image bit stream.
+    The image is held in memory and written back to the file when flushed.
+    """
 
     def __init__(self, image_name, mode):
         """Initialise CAS-file."""
         TapeBitStream.__init__(self)
         # 'r' or 'w'
         self.cas_name = image_name
+        # position on the tape, in bits; CAS-files need not be byte-aligned
+        self._pos = 0
+        # image has changes that are not in the file yet
+        self._changed = False
         if not os.path.exists(self.cas_name):
             self._create()
         else:
             self.operating_mode = 'r'
-            self.mask = 0x100
             try:
                 self.cas = io.open(self.cas_name, 'r+b')
             except EnvironmentError:
                 self.cas = io.open(self.cas_name, 'rb')
-            self.current_byte = self.cas.read(1)
-            if self.current_byte == b'' or not self.read_intro():
+            self._data = bytearray(self.cas.read())
+            if not self._data or not self.read_intro():
                 self.cas.close()
                 self._create()
         self.switch_mode(mode)
 
     def __getstate__(self):
         """Get pickling dict for stream."""
+        # the resumed stream reloads the image from file
+        self.flush()
         return {
             'filename': self.cas_name,
             'mode': self.operating_mode,
@@ -579,84 +682,141 @@ class CASBitStream(TapeBitStream):
     def counter(self):
         """Time stamp in seconds."""
         # approximate: average 750 us per bit, cut on bytes
-        return self.cas.tell() * 8 * 750 / 1000000.
+        return (self._pos // 8) * 8 * 750 / 1000000.
 
     def wind(self, loc):
         """Set position of tape in seconds."""
-        self.cas.seek(int(loc * 1000000 // (750 * 8)))
-        self.current_byte = self.cas.read(1)
+        self._pos = 8 * min(len(self._data), int(loc * 1000000 // (750 * 8)))
+
+    def image_key(self):
+        """Identify the tape image by file name, size and modification time; None if unsaved."""
+        if self._changed:
+            return None
+        stat = os.stat(self.cas_name)
+        return os.path.abspath(self.cas_name), stat.st_size, stat.st_mtime
 
     def close(self):
         """Close tape image."""
-        # ensure any buffered bits are written
         self.flush()
         self.cas.close()
 
+    def read_leader(self):
+        """Read the leader / pilot wave."""
+        try:
+            while True:
+                self._skip_bits(0)
+                # the first 1-bit is not counted
+                counter = self._skip_bits(1) - 1
+                # sync bit 0, at least 64*8 bits, then check sync byte 0x16
+                self.read_bit()
+                if counter >= 512 and self.read_byte() == self.sync_byte:
+                    return True
+        except EndOfTape:
+            return False
+
+    def read_trailer(self):
+        """Read the trailing wave """
+        try:
+            self._skip_bits(1)
+            self.read_bit()
+        except EndOfTape:
+            pass
+
+    def _skip_bits(self, bit):
+        """Skip a run of equal bits and return its length."""
+        start = self._pos
+        if self._pos % 8 == 0:
+            # skip whole bytes at once
+            match = (_NOT_ONES if bit else _NOT_ZEROS).search(self._data, self._pos // 8)
+            if not match:
+                self._pos = 8 * len(self._data)
+                raise EndOfTape()
+            self._pos = 8 * match.start()
+        while self.read_bit() == bit:
+            if self._pos % 8 == 0:
+                return self._pos - start + self._skip_bits(bit)
+        self._pos -= 1
+        return self._pos - start
+
     def read_bit(self):
         """Read the next bit."""
-        self.mask >>= 1
-        if self.mask <= 0:
-            self.current_byte = self.cas.read(1)
-            if not self.current_byte:
-                raise EndOfTape()
-            self.mask = 0x80
-        if (ord(self.current_byte) & self.mask == 0):
-            return 0
-        else:
-            return 1
+        byte, shift = divmod(self._pos, 8)
+        if byte >= len(self._data):
+            raise EndOfTape()
+        self._pos += 1
+        return (self._data[byte] >> (7 - shift)) & 1
+
+    def read_byte(self, skip_start=False):
+        """Read a byte from the tape."""
+        return ord(self.read_bytes(1))
+
+    def read_bytes(self, count):
+        """Read a number of bytes from the tape."""
+        start, shift = divmod(self._pos, 8)
+        end = start + count + (shift > 0)
+        if end > len(self._data):
+            # tape runs out in the middle
+            self._pos = 8 * len(self._data)
+            raise EndOfTape()
+        self._pos += 8 * count
+        chunk = self._data[start:end]
+        if shift:
+            value = int(hexlify(chunk), 16) >> (8 - shift)
+            return unhexlify(b'%0*x' % (2*count, value & ((1 << 8*count) - 1)))
+        return bytes(chunk)
 
     def write_bit(self, bit):
         """Write a bit to tape."""
-        # note that CAS-files aren't necessarily byte aligned
-        # the ones we make are, but PCE's ones aren't.
-        self.mask >>= 1
-        if self.mask <= 0:
-            self.cas.write(self.current_byte)
-            self.current_byte = b'\0'
-            self.mask = 0x80
-        self.current_byte = int2byte(ord(self.current_byte) | (bit*self.mask))
+        byte, shift = divmod(self._pos, 8)
+        if byte == len(self._data):
+            self._data.append(0)
+        if bit:
+            self._data[byte] |= 0x80 >> shift
+        else:
+            self._data[byte] &= ~(0x80 >> shift)
+        self._pos += 1
+        self._changed = True
+
+    def write_byte(self, byte):
+        """Write a byte to tape image."""
+        self.write_bytes(int2byte(byte))
+
+    def write_bytes(self, data):
+        """Write a number of bytes to tape image."""
+        if not data:
+            return
+        count = len(data)
+        start, shift = divmod(self._pos, 8)
+        if shift:
+            # keep the existing bits before and after in the first and last byte
+            existing = self._data[start:start+count+1].ljust(count+1, b'\0')
+            keep = ~(((1 << 8*count) - 1) << (8 - shift))
+            value = int(hexlify(existing), 16) & keep | int(hexlify(data), 16) << (8 - shift)
+            data = unhexlify(b'%0*x' % (2*count + 2, value))
+        self._data[start:start+len(data)] = data
+        self._pos += 8 * count
+        self._changed = True
 
     def flush(self):
-        """Write remaining bits to tape."""
-        if self.operating_mode == 'w':
-            # write -> read
-            # read bit on stream to combine with
-            existing = self.cas.read(1)
-            if not existing:
-                existing = b'\0'
-            else:
-                self.cas.seek(-1, 1)
-            # 0b1000 -> 0b1111 etc.
-            combine_mask = self.mask * 2 - 1
-            self.current_byte = int2byte(
-                (ord(existing) & combine_mask) +
-                (ord(self.current_byte) & (0xff^combine_mask))
-            )
-            # flush bits in write buffer
-            # pad with zero if necessary to align on byte limit
-            self.cas.write(self.current_byte)
-            # if we continue to write, we should seek(-1,1)
-            self.cas.seek(-1, 1)
+        """Write changes to the image file."""
+        if self._changed:
+            self.cas.seek(0)
+            self.cas.write(self._data)
+            self.cas.flush()
+            self._changed = False
 
     def switch_mode(self, new_mode):
         """Switch tape to reading or writing mode."""
-        self.flush()
-        if self.operating_mode == 'w' and new_mode == 'r':
-            self.current_byte = self.cas.read(1)
-        elif self.operating_mode == 'r' and new_mode == 'w':
-            self.cas.seek(-1, 1)
         self.operating_mode = new_mode
 
     def _create(self):
         """Create a new CAS-file."""
-        self.current_byte = b'\0'
-        self.mask = 0x100
-        with io.open(self.cas_name, 'wb') as self.cas:
-            self.operating_mode = 'w'
-            self.current_byte = b'\0'
-            self.write_intro()
-        self.cas = io.open(self.cas_name, 'r+b')
-        self.cas.seek(0, 2)
+        self._data = bytearray()
+        self._pos = 0
+        self.cas = io.open(self.cas_name, 'w+b')
+        self.operating_mode = 'w'
+        self.write_intro()
+        self.flush()
 
 
 
@@ -731,6 +891,8 @@ class WAVBitStream(TapeBitStream):
         """Initialise WAV-file."""
         TapeBitStream.__init__(self)
         self.filename = filename
+        # frames have been written; the length fields need updating
+        self._changed = False
         if not os.path.exists(filename):
             # create/overwrite file
             self.framerate = 22050
@@ -749,7 +911,8 @@ class WAVBitStream(TapeBitStream):
                 raise EndOfTape()
             self.operating_mode = 'r'
         self.wav_pos = 0
-        self.buf_len = 1024
+        # number of frames to decode at a time
+        self.buf_len = 65536
         # convert 8-bit and 16-bit values to ints
         if self.sampwidth == 1:
             self.sub_threshold = 0
@@ -759,6 +922,10 @@ class WAVBitStream(TapeBitStream):
             self.subtractor =  256*self.nchannels
         # volume above/below zero that is interpreted as zero
         self.zero_threshold = self.nchannels
+        # table from summed most significant bytes to level: 0 below, 1 around, 2 above zero
+        self._levels = _level_table(
+            self.nchannels, self.sub_threshold, self.subtractor, self.zero_threshold
+        )
         # 1000 us for 1, 500 us for 0; threshold for half-pulse (500 us, 250 us)
         self.halflength = [(250*self.framerate) // 1000000, (500*self.framerate) // 1000000]
         self.halflength_cut = (375 * self.framerate) // 1000000
@@ -793,6 +960,9 @@ class WAVBitStream(TapeBitStream):
 
     def switch_mode(self, mode):
         """Switch tape to reading or writing mode."""
+        if mode != self.operating_mode:
+            # carry on from the last half-pulse read, not from the end of the frames decoded
+            self._seek_frame(self.wav_pos)
         self.operating_mode = mode
 
     def counter(self):
@@ -801,8 +971,20 @@ class WAVBitStream(TapeBitStream):
 
     def wind(self, loc):
         """Set position of tape in seconds."""
-        self.wav_pos = int(loc * self.framerate)
-        self.wav.seek(self.wav_pos)
+        self._seek_frame(int(loc * self.framerate))
+
+    def _seek_frame(self, frame):
+        """Set position of tape in frames."""
+        self.wav_pos = frame
+        self.wav.seek(self.start + frame * self.nchannels * self.sampwidth)
+        # restart decoding from the new position
+        self.read_half = self._gen_read_halfpulse()
+
+    def image_key(self):
+        """Identify the tape image by file name, size and modification time; None if unsaved."""
+        self.wav.flush()
+        stat = os.stat(self.filename)
+        return os.path.abspath(self.filename), stat.st_size, stat.st_mtime
 
     def read_bit(self):
         """Read the next bit."""
@@ -822,6 +1004,10 @@ class WAVBitStream(TapeBitStream):
     def close(self):
         """Close WAV-file."""
         TapeBitStream.close(self)
+        if not self._changed:
+            # leave the file untouched, so that its tape index stays valid
+            self.wav.close()
+            return
         # write file length fields
         self.wav.seek(0, 2)
         end_pos = self.wav.tell()
@@ -832,45 +1018,71 @@ class WAVBitStream(TapeBitStream):
         self.wav.close()
 
     def _fill_buffer(self):
-        """Fill buffer with frames and pre-process."""
-        frame_buf = []
+        """Read a block of frames and convert to levels."""
         frames = self.wav.read(self.buf_len*self.nchannels*self.sampwidth)
         if not frames:
             raise EndOfTape
-        # convert MSBs to int (data stored little endian)
+        # keep the most significant bytes (data stored little endian)
         # note that we simply throw away all the less significant bytes
-        frames = (ord(_c) for _c in iterchar(frames[self.sampwidth-1::self.sampwidth]))
-        # sum frames over channels
-        frames = map(sum, zip(*[iter(frames)]*self.nchannels))
-        frames = [
-            _x-self.subtractor if _x >= self.sub_threshold else _x
-            for _x in frames
-        ]
-        return self.filter.send(frames)
+        msbs = frames[self.sampwidth-1::self.sampwidth]
+        if self.nchannels == 1:
+            levels = msbs.translate(self._levels)
+        else:
+            # sum frames over channels, dropping any incomplete frame
+            sums = map(sum, zip(*[iter(bytearray(msbs))]*self.nchannels))
+            levels = bytes(bytearray(map(bytearray(self._levels).__getitem__, sums)))
+        return self.filter.send(levels)
+
+    def _read_halfpulses(self, state):
+        """Read a block of frames and return the lengths of the half-pulses that end in it."""
+        # last level before any zeros held back, number of zeros held back,
+        # length of the half-pulse up to the first zero held back
+        last, held, pending = state
+        try:
+            levels = self._fill_buffer()
+        except EndOfTape:
+            if not held:
+                raise
+            # a change into zero is a crossing, even if the tape ends in the zero run
+            state[1] = 0
+            return [pending]
+        # a level change into zero is a crossing; one out of zero is if it goes back where it was
+        body = levels.lstrip(_ZERO)
+        zeros = held + len(levels) - len(body)
+        if not body:
+            # we can't tell what kind of zero run this is until it ends
+            state[1] = zeros
+            return []
+        # hold back trailing zeros
+        stripped = body.rstrip(_ZERO)
+        first = body[:1]
+        if not zeros:
+            if first == last:
+                lengths = []
+            else:
+                lengths, pending = [pending], 0
+        elif first == last:
+            lengths, pending = [pending, zeros], 0
+        else:
+            lengths, pending = [pending], zeros
+        # zeros between opposite levels count as part of the level that follows;
+        # after this, each change of level is a crossing
+        stripped = _UP_THROUGH_ZERO.sub(_rise, stripped)
+        stripped = _DOWN_THROUGH_ZERO.sub(_fall, stripped)
+        runs = list(map(len, _RUNS.findall(stripped)))
+        runs[0] += pending
+        lengths.extend(runs[:-1])
+        state[:] = stripped[-1:], len(body) - len(stripped), runs[-1]
+        return lengths
 
     def _gen_read_halfpulse(self):
         """Generator to read a half-pulse and yield its length."""
-        length = 0
-        frame = 1
-        prezero = 1
-        pos_in_frame = 0
-        frame_buf = []
+        # the first frame crosses if it is not above zero
+        state = [_HIGH, 0, 1]
         while True:
-            try:
-                sample = frame_buf[pos_in_frame]
-                pos_in_frame += 1
-            except IndexError:
-                frame_buf = self._fill_buffer()
-                pos_in_frame = 0
-                continue
-            length += 1
-            last, frame = frame, (sample > self.zero_threshold) + (sample >= -self.zero_threshold) - 1
-            if last != frame and (last != 0 or frame == prezero):
-                if frame == 0 and last != 0:
-                    prezero = last
+            for length in self._read_halfpulses(state):
                 self.wav_pos += length
                 yield length
-                length = 0
 
     def write_pause(self, milliseconds):
         """Write a pause of given length to the tape."""
@@ -878,6 +1090,7 @@ class WAVBitStream(TapeBitStream):
         zero = {1: b'\x7f', 2: b'\x00\x00'}
         self.wav.write(zero[self.sampwidth] * self.nchannels * length)
         self.wav_pos += length
+        self._changed = True
 
     def write_bit(self, bit):
         """Write a bit to tape."""
@@ -889,6 +1102,7 @@ class WAVBitStream(TapeBitStream):
             up[self.sampwidth] * self.nchannels * half_length
         )
         self.wav_pos += 2 * half_length
+        self._changed = True
 
     def _read_wav_header(self):
         """Read RIFF WAV header."""
@@ -998,19 +1212,32 @@ class WAVBitStream(TapeBitStream):
 ##############################################################################
 # supporting functions
 
-def crc(data):
-    """Calculate 16-bit CRC-16-CCITT for data."""
-    # see http://en.wikipedia.org/wiki/Computation_of_cyclic_redundancy_checks
-    # for a lookup table version, see e.g. WAV2CAS v1.3 for Poisk PC. by Tronix (C) 2013
-    # however, speed is not critical for this function
-    rem = 0xffff
-    for d in bytearray(data):
-        rem ^= d << 8
+def _crc_table():
+    """Build the CRC-16-CCITT remainders for each value of the top byte."""
+    table = []
+    for byte in range(256):
+        rem = byte << 8
         for _ in range(8):
             rem <<= 1
             if rem & 0x10000:
                 rem ^= 0x1021
             rem &= 0xffff
+        table.append(rem)
+    return table
+
+_CRC_TABLE = _crc_table()
+
+def _unpack_header(record):
+    """Unpack name, file type token, length, segment and offset from a header record."""
+    return struct.unpack('<8sBHHH', record[1:16])
+
+def crc(data):
+    """Calculate 16-bit CRC-16-CCITT for data."""
+    # see http://en.wikipedia.org/wiki/Computation_of_cyclic_redundancy_checks
+    # lookup table version, cf. WAV2CAS v1.3 for Poisk PC. by Tronix (C) 2013
+    rem = 0xffff
+    for d in bytearray(data):
+        rem = (rem << 8) & 0xffff ^ _CRC_TABLE[(rem >> 8) ^ d]
     return rem ^ 0xffff
 
 def hms(seconds):
@@ -1023,6 +1250,22 @@ def timestamp(counter):
     """Time stamp."""
     return b'[%d:%02d:%02d] ' % hms(counter)
 
+def _rise(match):
+    """Replace zeros by high levels."""
+    return _HIGH * len(match.group())
+
+def _fall(match):
+    """Replace zeros by low levels."""
+    return _LOW * len(match.group())
+
+def _level_table(nchannels, sub_threshold, subtractor, zero_threshold):
+    """Build a table from the sum of most significant bytes over channels to a level."""
+    table = bytearray()
+    for total in range(256*nchannels):
+        sample = total - subtractor if total >= sub_threshold else total
+        table.append((sample > zero_threshold) + (sample >= -zero_threshold))
+    return bytes(table)
+
 def passthrough():
     """Passthrough filter."""
     x = []
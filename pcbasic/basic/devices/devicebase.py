@@ -218,6 +218,9 @@ class RawFile(object):
 # TAB x09 is not whitespace for input#. NUL \x00 and LF \x0a are.
 INPUT_WHITESPACE = b' \0\n'
 
+# nonprinting characters, not counted for WIDTH
+_CONTROL_CHARS = bytes(bytearray(range(32)))
+
 
 class DeviceSettings(object):
     """Device-level width and column settings."""
@@ -240,6 +243,8 @@ class TextFileBase(RawFile):
 
     # for INPUT# - numbers read from file can be separated by spaces too
     soft_sep = b' '
+    # minimum number of bytes to read ahead from the file
+    _read_size = 1
 
     def __init__(self, fhandle, filetype, mode):
         """Setup the basic properties of the file."""
@@ -248,7 +253,7 @@ class TextFileBase(RawFile):
         self.width = 255
         self.col = 1
         # allow first char to be specified (e.g. already read)
-        self._readahead = []
+        self._readahead = b''
         self._current, self._previous = b'', b''
 
     # readable files
@@ -258,8 +263,8 @@ class TextFileBase(RawFile):
         to_read = num - len(self._readahead)
         if to_read > 0:
             with safe_io():
-                self._readahead.extend(iterchar(self._fhandle.read(to_read)))
-        return b''.join(self._readahead[:num])
+                self._readahead += self._fhandle.read(max(to_read, self._read_size))
+        return self._readahead[:num]
 
     def read(self, num):
         """Read num characters."""
@@ -309,35 +314,22 @@ class TextFileBase(RawFile):
         """Write the string s to the file, taking care of width settings."""
         assert isinstance(s, bytes)
         # only break lines at the start of a new string. width 255 means unlimited width
-        s_width = 0
-        newline = False
-        # find width of first line in s
-        for c in iterchar(s):
-            if c in (b'\r', b'\n'):
-                newline = True
-                break
-            if c >= b' ':
+        if can_break and self.width != 255 and self.col != 1:
+            # a line break anywhere in s means we don't break
+            if b'\r' not in s and b'\n' not in s:
                 # nonprinting characters including tabs are not counted for WIDTH
-                s_width += 1
-        if (
-                can_break and self.width != 255 and self.col != 1 and
-                self.col-1 + s_width > self.width and not newline
-            ):
-            self.write_line()
+                s_width = len(s.translate(None, _CONTROL_CHARS))
+                if self.col-1 + s_width > self.width:
+                    self.write_line()
+                    self.col = 1
+        # don't replace CR or LF with CRLF when writing to files
+        self._fhandle.write(s)
+        # CR returns to column 1
+        last_line = s.rsplit(b'\r', 1)
+        if len(last_line) > 1:
             self.col = 1
-        for c in iterchar(s):
-            # don't replace CR or LF with CRLF when writing to files
-            if c == b'\r':
-                self._fhandle.write(c)
-                self.col = 1
-            else:
-                self._fhandle.write(c)
-                # nonprinting characters including tabs are not counted for WIDTH
-                if c >= b' ':
-                    self.col += 1
-                    # col-1 is a byte that wraps
-                    if self.col == 257:
-                        self.col = 1
+        # col-1 is a byte that wraps
+        self.col = (self.col - 1 + len(last_line[-1].translate(None, _CONTROL_CHARS))) % 256 + 1
 
     def write_line(self, s=b''):
         """Write string and follow with device-standard line break."""
@@ -528,6 +520,8 @@ class KYBDFile(TextFileBase, RealTimeInputMixin):
     def __init__(self, keyboard, display):
         """Initialise keyboard file."""
         TextFileBase.__init__(self, nullstream(), filetype=b'D', mode=b'I')
+        # characters read ahead, one per item
+        self._readahead = []
         # buffer for the separator character that broke the last INPUT# field
         # to be attached to the next
         self._keyboard = keyboard
@@ -334,6 +334,9 @@ class DiskDevice(object):
         # obtain a lock
         self._locks.open_file(dos_basename, number, mode, lock, access)
         try:
+            if mode != b'R':
+                # random-access files open on the same path may hold changes in their record cache
+                self._locks.flush_record_cache(native_name)
             # open the underlying stream
             fhandle = self.open_stream(native_name, filetype, mode)
             # apply the BASIC file wrapper
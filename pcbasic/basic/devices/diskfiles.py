@@ -17,6 +17,12 @@ from ..base import error
 from .devicebase import RawFile, TextFileBase, InputMixin, safe_io, TYPE_TO_MAGIC
 
 
+# size of the pages in which random-access files are cached
+_PAGE_SIZE = 4096
+# maximum number of pages cached for each file
+_MAX_PAGES = 256
+
+
 # binary file interface: file interface +
 #   seg
 #   offset
@@ -69,6 +75,9 @@ class BinaryFile(RawFile):
 class TextFile(TextFileBase, InputMixin):
     """Text file on disk device."""
 
+    # read ahead in blocks, so that lines can be scanned for at once
+    _read_size = 512
+
     def __init__(self, fhandle, filetype, number, mode, locks):
         """Initialise text file object."""
         TextFileBase.__init__(self, fhandle, filetype, mode)
@@ -108,17 +117,41 @@ class TextFile(TextFileBase, InputMixin):
 
     def read_line(self):
         """Read line from text file, break on CR or CRLF (not LF)."""
-        s = []
+        self._locks.try_access(self._number, b'R')
+        # enough to hold a full line, its CR and an LF
+        data = self.peek(257)
+        # EOF char stops reading
+        data = data.split(b'\x1a', 1)[0]
+        # break on CR, CRLF but allow LF, LFCR to pass
+        start = 0
         while True:
-            c = self.read_one()
-            if not c or (c == b'\r' and self._previous != b'\n'):
-                # break on CR, CRLF but allow LF, LFCR to pass
-                break
-            s.append(c)
-            if len(s) == 255:
-                c = b'\r' if self.peek(1) == b'\r' else None
+            end = data.find(b'\r', start, 255)
+            if end == -1 or (data[end-1:end] if end else self._current) != b'\n':
                 break
-        return b''.join(s), c
+            start = end + 1
+        if end == -1:
+            if len(data) < 255:
+                # end of file
+                self._consume(len(data))
+                self._previous, self._current = self._current, b''
+                return data, b''
+            # line is 255 characters long, report CR if it follows
+            self._consume(255)
+            return data[:255], b'\r' if data[255:256] == b'\r' else None
+        self._consume(end + 1)
+        # report CRLF as CR
+        if data[end+1:end+2] == b'\n':
+            self._readahead = self._readahead[1:]
+        return data[:end], b'\r'
+
+    def _consume(self, num):
+        """Drop characters from the readahead buffer, as if read."""
+        if num:
+            self._previous, self._current = (
+                self._readahead[num-2:num-1] if num > 1 else self._current,
+                self._readahead[num-1:num]
+            )
+            self._readahead = self._readahead[num:]
 
     def write(self, s, can_break=True):
         """Write string to file."""
@@ -160,6 +193,9 @@ class TextFile(TextFileBase, InputMixin):
 class FieldFile(TextFile):
     """Text file on FIELD."""
 
+    # don't read ahead, the field buffer may change
+    _read_size = 1
+
     def __init__(self, field, reclen):
         """Initialise text file object."""
         # don't let the field file use device locks
@@ -196,7 +232,7 @@ class FieldFile(TextFile):
             self.mode = b'I'
         elif new_mode == b'O' and self.mode == b'I':
             self._fhandle.seek(-len(self._readahead), 1)
-            self._readahead = []
+            self._readahead = b''
             self._previous, self._current = b'', b''
             self.mode = b'O'
 
@@ -218,8 +254,8 @@ class FieldFile(TextFile):
         self._fhandle.seek(0)
 
     def get_buffer(self):
-        """Get a copy of the contents of the buffer."""
-        return bytearray(self._field.view_buffer())
+        """Get a view of the record in the buffer."""
+        return self._field.view_buffer()[:self._reclen]
 
     def write(self, bytestr, can_break=True):
         """Write bytes to buffer."""
@@ -244,12 +280,16 @@ class RandomFile(RawFile):
         # actually work on the FIELD buffer; the file stream itself is not
         # touched until PUT or GET.
         self._field_file = FieldFile(field, reclen)
+        # records are read and written through a cache shared with other numbers on the same file
+        self._cache = locks.record_cache(number, fhandle)
         # position at start of file
         self._recpos = 0
         self._fhandle.seek(0)
 
     def close(self):
         """Close random-access file."""
+        with safe_io():
+            self._cache.flush(self._fhandle)
         RawFile.close(self)
         self._locks.close_file(self._number)
 
@@ -313,10 +353,12 @@ class RandomFile(RawFile):
         # exceptionally, GET is allowed if the file holding the lock is open for OUTPUT
         self._locks.try_record_access(self._number, self._recpos+1, self._recpos+1, b'R')
         if self.eof():
-            contents = b'\0' * self.reclen
+            contents = b''
         else:
             with safe_io():
-                contents = self._fhandle.read(self.reclen)
+                contents = self._cache.read(
+                    self._fhandle, self._recpos * self.reclen, self.reclen
+                )
         # take contents and pad with NULL to required size
         self._field_file.set_buffer(contents)
         self._recpos += 1
@@ -325,21 +367,17 @@ class RandomFile(RawFile):
         """Write a record."""
         self._set_record_pos(pos)
         self._locks.try_record_access(self._number, self._recpos+1, self._recpos+1, b'W')
-        current_length = self.lof()
+        # any gap before the record reads as NULL
         with safe_io():
-            if self._recpos > current_length:
-                self._fhandle.seek(0, 2)
-                numrecs = self._recpos - current_length
-                self._fhandle.write(b'\0' * numrecs * self.reclen)
-            self._fhandle.write(bytes(self._field_file.get_buffer()))
+            self._cache.write(
+                self._fhandle, self._recpos * self.reclen, self._field_file.get_buffer()
+            )
         self._recpos += 1
 
     def _set_record_pos(self, pos):
         """Move record pointer to new position."""
         if pos is not None:
             # first record is number 1
-            with safe_io():
-                self._fhandle.seek((pos-1) * self.reclen)
             self._recpos = pos - 1
 
     def loc(self):
@@ -349,19 +387,97 @@ class RandomFile(RawFile):
     def lof(self):
         """Get length of file, in bytes, for LOF."""
         with safe_io():
-            current = self._fhandle.tell()
-            self._fhandle.seek(0, 2)
-            lof = self._fhandle.tell()
-            self._fhandle.seek(current)
-        return lof
+            return self._cache.length(self._fhandle)
 
     def lock(self, start, stop):
         """Lock range of records."""
         self._locks.acquire_record_lock(self._number, start, stop)
+        # write out changes and re-read records on access, as other processes may have written
+        with safe_io():
+            self._cache.clear(self._fhandle)
 
     def unlock(self, start, stop):
         """Unlock range of records."""
         self._locks.release_record_lock(self._number, start, stop)
+        with safe_io():
+            self._cache.clear(self._fhandle)
+
+
+class _RecordCache(object):
+    """
+    Write-back cache of the contents of a random-access file, in pages.
+    Shared by all numbers open on the same file, which may use different record lengths.
+    """
+
+    def __init__(self):
+        """Start with an empty cache."""
+        # cached pages by page number
+        self._pages = {}
+        # numbers of pages changed since the last flush
+        self._dirty = set()
+        # length of the file including changes, or None if not known
+        self._length = None
+
+    def length(self, fhandle):
+        """Length of the file, including any changes not yet written."""
+        if self._length is None:
+            fhandle.seek(0, 2)
+            self._length = fhandle.tell()
+        return self._length
+
+    def read(self, fhandle, offset, length):
+        """Read bytes from the file; return less if the end of file is reached."""
+        length = max(0, min(length, self.length(fhandle) - offset))
+        return b''.join(
+            bytes(self._page(fhandle, _page)[_start:_stop])
+            for _page, _start, _stop in self._span(offset, length)
+        )
+
+    def write(self, fhandle, offset, data):
+        """Write bytes to the file, extending it with NULL bytes if needed."""
+        self._length = max(self.length(fhandle), offset + len(data))
+        done = 0
+        for page, start, stop in self._span(offset, len(data)):
+            self._page(fhandle, page)[start:stop] = data[done:done+stop-start]
+            self._dirty.add(page)
+            done += stop - start
+
+    def flush(self, fhandle):
+        """Write changed pages to the file."""
+        for page in sorted(self._dirty):
+            start = page * _PAGE_SIZE
+            fhandle.seek(start)
+            fhandle.write(bytes(self._pages[page][:self._length-start]))
+        self._dirty = set()
+        fhandle.flush()
+
+    def clear(self, fhandle):
+        """Write changed pages to the file and forget all contents."""
+        self.flush(fhandle)
+        self._pages = {}
+        self._length = None
+
+    def _span(self, offset, length):
+        """Split a byte range into page number, start and stop offsets within each page."""
+        end = offset + length
+        while offset < end:
+            page, start = divmod(offset, _PAGE_SIZE)
+            stop = min(_PAGE_SIZE, start + end - offset)
+            yield page, start, stop
+            offset += stop - start
+
+    def _page(self, fhandle, page):
+        """Retrieve a page from cache or file."""
+        try:
+            return self._pages[page]
+        except KeyError:
+            pass
+        if len(self._pages) >= _MAX_PAGES:
+            self.flush(fhandle)
+            self._pages = {}
+        fhandle.seek(page * _PAGE_SIZE)
+        self._pages[page] = bytearray(fhandle.read(_PAGE_SIZE).ljust(_PAGE_SIZE, b'\0'))
+        return self._pages[page]
 
 
 ###############################################################################
@@ -378,6 +494,10 @@ class LockingParameters(object):
         self.lock_type = lock_type
         self.access = access
         self.mode = mode
+        # native path of a random-access file, which identifies its record cache
+        self.path = None
+        # stream of a random-access file, through which its record cache can be written
+        self.fhandle = None
 
 
 class Locks(object):
@@ -387,12 +507,18 @@ class Locks(object):
         """Initialise locks."""
         # dict of LockingParameters objects, one for each open disk file, by file number
         self._locking_parameters = {}
+        # dict of record caches for random-access files, by native path
+        self._record_caches = {}
 
     def list_open(self, name, exclude_number=None):
         """Retrieve a list of files open on the same disk device."""
+        return self._list_open(ntpath.basename(name).upper(), exclude_number)
+
+    def _list_open(self, name, exclude_number=None):
+        """Retrieve a list of files open under a normalised name."""
         return [
             f for number, f in iteritems(self._locking_parameters)
-            if f.name == ntpath.basename(name).upper() and number != exclude_number
+            if f.name == name and number != exclude_number
         ]
 
     def open_file(self, name, number, mode, lock_type, access):
@@ -436,9 +562,30 @@ class Locks(object):
     def close_file(self, number):
         """Deregister disk file."""
         try:
-            del self._locking_parameters[number]
+            path = self._locking_parameters.pop(number).path
         except KeyError:
-            pass
+            return
+        if not any(_f.path == path for _f in self._locking_parameters.values()):
+            self._record_caches.pop(path, None)
+
+    def record_cache(self, number, fhandle):
+        """Retrieve the record cache shared by random-access files open on the same path."""
+        path = getattr(fhandle, 'name', None)
+        if not number or not path:
+            return _RecordCache()
+        this_file = self._locking_parameters[number]
+        this_file.path, this_file.fhandle = path, fhandle
+        return self._record_caches.setdefault(path, _RecordCache())
+
+    def flush_record_cache(self, path):
+        """Write out and forget the records cached for a path, before it is opened directly."""
+        try:
+            cache = self._record_caches[path]
+        except KeyError:
+            return
+        fhandle = next(_f.fhandle for _f in self._locking_parameters.values() if _f.path == path)
+        with safe_io():
+            cache.clear(fhandle)
 
     def try_access(self, number, access):
         """Attempt to access a file."""
@@ -449,7 +596,7 @@ class Locks(object):
         if this_file.access and not (set(access) & set(this_file.access)):
             raise error.BASICError(error.PATH_FILE_ACCESS_ERROR)
         # access in violation of other's LOCK declation in OPEN: path/file access error
-        others = self.list_open(this_file.name, number)
+        others = self._list_open(this_file.name, number)
         for f in others:
             if (f.lock_type and f.lock_type != b'SHARED' and (set(f.lock_type) & set(access))):
                 raise error.BASICError(error.PATH_FILE_ACCESS_ERROR)
@@ -463,7 +610,7 @@ class Locks(object):
         """Attempt to access a record."""
         this_file = self._locking_parameters[number]
         other_locks = [
-            f.lock_set for f in self.list_open(this_file.name, number if allow_self else None)
+            f.lock_set for f in self._list_open(this_file.name, number if allow_self else None)
             # access parameter only exists to allow reading a record on locked OUTPUT file
             if not (f.mode in b'OA' and read_only)
         ]
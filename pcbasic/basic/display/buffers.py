@@ -53,10 +53,12 @@ class _PixelAccess(object):
 
     def __getitem__(self, index):
         """Retrieve a copy of a pixel range."""
+        self._video_buffer._render_pixels()
         return self._pixels[index]
 
     def __setitem__(self, index, data):
         """Set a pixel range, clear affected text buffers and submit to interface."""
+        self._video_buffer.set_text_only(False)
         self._pixels[index] = data
         # make sure the indices are slices so that __getattr__ returns a matrix
         yslice, xslice = index
@@ -66,20 +68,74 @@ class _PixelAccess(object):
             xslice = slice(xslice, xslice+1)
         self._video_buffer._update_pixels(yslice.start, xslice.start, yslice.stop-1, xslice.stop-1)
 
+    def fill_rects(self, rects, attr):
+        """Fill rectangles (x0, y0, x1, y1 inclusive) and submit their bounding box in one go."""
+        self._video_buffer.set_text_only(False)
+        for x0, y0, x1, y1 in rects:
+            self._pixels[y0:y1+1, x0:x1+1] = attr
+        self._update_rects(rects)
+
+    def put_matrices(self, placed):
+        """Put (x, y, matrix) pixel matrices and submit their bounding box in one go."""
+        self._video_buffer.set_text_only(False)
+        rects = []
+        for x, y, matrix in placed:
+            if matrix.width and matrix.height:
+                self._pixels[y:y+matrix.height, x:x+matrix.width] = matrix
+                rects.append((x, y, x + matrix.width - 1, y + matrix.height - 1))
+        self._update_rects(rects)
+
+    def _update_rects(self, rects):
+        """Clear text under changed rectangles (x0, y0, x1, y1 inclusive) and submit."""
+        text_areas = set()
+        for x0, y0, x1, y1 in rects:
+            text_areas.add(self._video_buffer.pixel_to_text_area(x0, y0, x1, y1))
+        # many runs fall within the same text cells
+        for row0, col0, row1, col1 in text_areas:
+            self._video_buffer._clear_text_area(
+                row0, col0, row1, col1, 0, adjust_end=False, clear_wrap=False
+            )
+        if rects:
+            self._video_buffer._submit_pixels(
+                min(_r[1] for _r in rects), min(_r[0] for _r in rects),
+                max(_r[3] for _r in rects), max(_r[2] for _r in rects)
+            )
+
+
+class PixelSnapshot(object):
+    """Read-only copy of the pixel attributes on a page, in contiguous row-major order."""
+
+    def __init__(self, height, width, data):
+        """Wrap the pixel bytes."""
+        self.height = height
+        self.width = width
+        # bytes between the starts of consecutive rows
+        self.pitch = width
+        self.pixels = memoryview(data)
+
+
+class TextSnapshot(object):
+    """Read-only copy of the text cells on a page, in contiguous row-major order."""
+
+    def __init__(self, height, width, chars, attrs):
+        """Wrap the character and attribute bytes."""
+        self.height = height
+        self.width = width
+        self.chars = memoryview(chars)
+        self.attrs = memoryview(attrs)
+
 
 class VideoBuffer(object):
     """Buffer for a screen page."""
 
     def __init__(
             self, queues, pixel_height, pixel_width, height, width,
-            colourmap, attr, font, codepage, do_fullwidth
+            colourmap, attr, font, codepage, do_fullwidth, text_only=False
         ):
         """Initialise the screen buffer to given dimensions."""
         self._rows = [_TextRow(attr, width) for _ in range(height)]
         self._width = width
         self._height = height
-        self._font = font
-        self._colourmap = colourmap
         # DBCS support
         self._codepage = codepage
         self._dbcs_enabled = codepage.dbcs and do_fullwidth
@@ -90,11 +146,56 @@ class VideoBuffer(object):
         self._pixel_access = _PixelAccess(self)
         # needed for signals only
         self._queues = queues
+        # counts changes to the contents
+        self.generation = 0
+        # snapshots of the contents, with the generation they were taken at
+        self._pixel_snapshot = -1, None
+        self._text_snapshot = -1, None
+        self._init_state(colourmap, attr, font, text_only)
+
+    def _init_state(self, colourmap, attr, font, text_only):
+        """Set the mode-dependent state of an empty buffer."""
+        self._font = font
+        self._colourmap = colourmap
+        # in text-only mode, text is rendered to pixels only when these are accessed
+        self._text_only = text_only
+        self._pixels_stale = False
         # dirty rectangle collection
         self._dirty_left = {}
         self._dirty_right = {}
         self._locked = False
         self._visible = False
+        # damaged rows not yet sent to the interface: row -> [left, right]
+        self._damage = {}
+        # pixel frame shared with the interface, if it supports that
+        self._shared_frame = None
+        # nothing has been written since the buffer was emptied; attribute it was emptied with
+        self._clean = True
+        self._clean_attr = attr
+
+    def reset(self, colourmap, attr, font, text_only=False):
+        """Empty the buffer for reuse in a mode with the same dimensions."""
+        if not self._clean:
+            blank_chars, blank_attrs = [b' '] * self._width, [attr] * self._width
+            for row in self._rows:
+                row.chars[:] = blank_chars
+                row.attrs[:] = blank_attrs
+                row.length = 0
+                row.wrap = False
+            self._dbcs_text = [[u' '] * self._width for _ in range(self._height)]
+            self._pixels[:, :] = 0
+        elif attr != self._clean_attr:
+            blank_attrs = [attr] * self._width
+            for row in self._rows:
+                row.attrs[:] = blank_attrs
+        # the rendered pixels may differ even if the buffer was clean
+        self.generation += 1
+        self._init_state(colourmap, attr, font, text_only)
+
+    def _changed(self):
+        """Record a change to the contents of the buffer."""
+        self._clean = False
+        self.generation += 1
 
     def set_visible(self, visible):
         """Set the vpage flag."""
@@ -102,12 +203,30 @@ class VideoBuffer(object):
             self._visible = visible
             if visible:
                 self.resubmit()
+            else:
+                self._damage = {}
 
     @property
     def pixels(self):
         """Pixel-buffer access."""
         return self._pixel_access
 
+    def set_shared_frame(self, shared_frame):
+        """Send pixels to the interface through a shared frame rather than in update signals."""
+        self._shared_frame = shared_frame
+
+    def set_text_only(self, text_only):
+        """Set whether to render text to pixels only when the pixels are accessed."""
+        if not text_only:
+            self._render_pixels()
+        self._text_only = text_only
+
+    def _render_pixels(self):
+        """Bring the pixel buffer up to date with the text, if rendering was skipped."""
+        if self._pixels_stale:
+            self._pixels_stale = False
+            self._draw_text(1, 1, self._height, self._width)
+
     def __repr__(self):
         """Return an ascii representation of the screen buffer (for debugging)."""
         horiz_bar = ('   +' + '-' * self._width + '+')
@@ -147,6 +266,14 @@ class VideoBuffer(object):
         """Retrieve attribute from the screen."""
         return self._rows[row-1].attrs[col-1]
 
+    def get_bytes(self, row, start, stop):
+        """Retrieve a run of bytes from the character buffer (inclusive columns, as bytearray)."""
+        return bytearray(b''.join(self._rows[row-1].chars[start-1:stop]))
+
+    def get_attrs(self, row, start, stop):
+        """Retrieve a run of attributes from the screen (inclusive columns, as bytearray)."""
+        return bytearray(self._rows[row-1].attrs[start-1:stop])
+
     def get_charwidth(self, row, col):
         """Get DBCS width of cell on active page."""
         if col == self._width:
@@ -164,11 +291,31 @@ class VideoBuffer(object):
         else:
             raise ValueError('`as_type` must be bytes or unicode, not %s.' % type(as_type))
 
+    def get_pixel_snapshot(self):
+        """Retrieve a read-only copy of the pixels, shared between calls until the page changes."""
+        self._render_pixels()
+        if self._pixel_snapshot[0] != self.generation:
+            self._pixel_snapshot = self.generation, PixelSnapshot(
+                self._pixels.height, self._pixels.width, self._pixels.to_bytes()
+            )
+        return self._pixel_snapshot[1]
+
+    def get_text_snapshot(self):
+        """Retrieve a read-only copy of the text cells, shared between calls until the page changes."""
+        if self._text_snapshot[0] != self.generation:
+            self._text_snapshot = self.generation, TextSnapshot(
+                self._height, self._width,
+                b''.join(b''.join(_row.chars) for _row in self._rows),
+                bytes(bytearray(_attr for _row in self._rows for _attr in _row.attrs))
+            )
+        return self._text_snapshot[1]
+
     ##########################################################################
     # logical line parameters: wrap and row length
 
     def set_wrap(self, row, wrap):
         """Connect/disconnect rows on active page by line wrap."""
+        self._changed()
         self._rows[row-1].wrap = wrap
 
     def wraps(self, row):
@@ -177,6 +324,7 @@ class VideoBuffer(object):
 
     def set_row_length(self, row, length):
         """Return logical length of row."""
+        self._changed()
         self._rows[row-1].length = length
 
     def row_length(self, row):
@@ -218,6 +366,7 @@ class VideoBuffer(object):
 
     def copy_from(self, src):
         """Copy source into this page."""
+        self._changed()
         for dst_row, src_row in zip(self._rows, src._rows):
             assert len(dst_row.chars) == len(src_row.chars)
             assert len(dst_row.attrs) == len(src_row.attrs)
@@ -226,7 +375,12 @@ class VideoBuffer(object):
             dst_row.length = src_row.length
             dst_row.wrap = src_row.wrap
         self._dbcs_text[:] = src._dbcs_text
-        self._pixels[:, :] = src._pixels
+        if self._text_only and src._text_only:
+            self._pixels_stale = True
+        else:
+            self.set_text_only(False)
+            src._render_pixels()
+            self._pixels[:, :] = src._pixels
         self._pixel_access = _PixelAccess(self)
         # resubmit to interface
         self.resubmit()
@@ -236,13 +390,20 @@ class VideoBuffer(object):
 
     def _update_pixels(self, top, left, bottom, right):
         """Clear the text under the rect and submit to interface."""
+        self._clear_pixel_text(top, left, bottom, right)
+        self._submit_pixels(top, left, bottom, right)
+
+    def _clear_pixel_text(self, top, left, bottom, right):
+        """Clear the text under a pixel rect."""
         row0, col0, row1, col1 = self.pixel_to_text_area(left, top, right, bottom)
-        # clear text area
         # we can't see or query the attribute in graphics mode - might as well set to zero
         self._clear_text_area(
             row0, col0, row1, col1, 0, adjust_end=False, clear_wrap=False
         )
-        rect = self._pixels[top:bottom+1, left:right+1]
+
+    def _submit_pixels(self, top, left, bottom, right):
+        """Submit the text area under a pixel rect to the interface."""
+        row0, col0, row1, col1 = self.pixel_to_text_area(left, top, right, bottom)
         self._submit(row0, col0, row1, col1)
 
     ##########################################################################
@@ -258,6 +419,13 @@ class VideoBuffer(object):
             self._rows[row-1].length = max(self._rows[row-1].length, col)
         self._update(row, col, col)
 
+    def put_chars_attrs(self, row, col, chars, attrs):
+        """Overwrite a run of bytes and attributes on one row and mark the cells for update."""
+        therow = self._rows[row-1]
+        therow.chars[col-1:col-1+len(chars)] = chars
+        therow.attrs[col-1:col-1+len(attrs)] = attrs
+        self._update(row, col, col+len(chars)-1)
+
     def insert_char_attr(self, row, col, char, attr):
         """
         Insert a halfwidth character,
@@ -337,15 +505,74 @@ class VideoBuffer(object):
         self._submit(1, 1, self._height, self._width)
 
     def _submit(self, top, left, bottom, right):
-        """Submit a rectangular screen section to interface (text coordinates)."""
+        """Mark a rectangular screen section for submission to interface (text coordinates)."""
         if self._visible:
-            text = [_row[left-1:right] for _row in self._dbcs_text[top-1:bottom]]
-            attrs = [_row.attrs[left-1:right] for _row in self._rows[top-1:bottom]]
-            x0, y0 = self.text_to_pixel_pos(top, left)
-            x1, y1 = self.text_to_pixel_pos(bottom+1, right+1)
+            for row in range(top, bottom+1):
+                if row in self._damage:
+                    damage = self._damage[row]
+                    damage[0] = min(left, damage[0])
+                    damage[1] = max(right, damage[1])
+                else:
+                    self._damage[row] = [left, right]
+            if not self._queues.frame_paced:
+                self.flush()
+
+    def flush(self):
+        """Submit damaged screen sections to interface."""
+        if not self._damage:
+            return
+        if self._shared_frame and not self._text_only:
+            # keep collecting damage until the interface has released the frame
+            if not self._shared_frame.is_free():
+                return
+            rects = [
+                self.text_to_pixel_area(*_area) for _area in self._merge_damage()
+            ]
+            generation = self._shared_frame.write(self._pixels, rects)
             self._queues.video.put(signals.Event(
-                signals.VIDEO_UPDATE, (top, left, text, attrs, y0, x0, self._pixels[y0:y1, x0:x1])
+                signals.VIDEO_UPDATE_FRAME, (generation, rects)
             ))
+        else:
+            for area in self._merge_damage():
+                self._send_update(*area)
+        self._damage = {}
+
+    def _merge_damage(self):
+        """Merge runs of adjacent damaged rows into rectangles (text coordinates)."""
+        rows = sorted(self._damage)
+        top = rows[0]
+        left, right = self._damage[top]
+        for bottom, row in zip(rows, rows[1:] + [None]):
+            if row == bottom + 1:
+                left = min(left, self._damage[row][0])
+                right = max(right, self._damage[row][1])
+                continue
+            yield top, left, bottom, right
+            if row is not None:
+                top = row
+                left, right = self._damage[row]
+
+    def _send_update(self, top, left, bottom, right):
+        """Send a rectangular screen section to interface (text coordinates)."""
+        text = [_row[left-1:right] for _row in self._dbcs_text[top-1:bottom]]
+        attrs = [_row.attrs[left-1:right] for _row in self._rows[top-1:bottom]]
+        x0, y0 = self.text_to_pixel_pos(top, left)
+        x1, y1 = self.text_to_pixel_pos(bottom+1, right+1)
+        sprite = None if self._text_only else self._pixels[y0:y1, x0:x1]
+        self._queues.video.put(signals.Event(
+            signals.VIDEO_UPDATE, (top, left, text, attrs, y0, x0, sprite)
+        ))
+
+    def _scroll_damage(self, from_row, to_row, shift):
+        """Move unsubmitted damage along with a scroll; the interface clears the exposed row."""
+        damage = {}
+        for row, cols in self._damage.items():
+            if from_row <= row <= to_row:
+                row += shift
+                if not from_row <= row <= to_row:
+                    continue
+            damage[row] = cols
+        self._damage = damage
 
     ###########################################################################
     # text rendering - dirty rectangles
@@ -366,6 +593,7 @@ class VideoBuffer(object):
 
     def _update(self, row, start, stop):
         """Mark section of screen row as dirty for update."""
+        self._changed()
         # merge with existing dirty rects for row
         if row in self._dirty_left:
             self._dirty_left[row] = min(start, self._dirty_left[row])
@@ -377,10 +605,13 @@ class VideoBuffer(object):
             self.force_submit()
 
     def force_submit(self):
-        """Update dbcs, write all dirty text rectangles to pixels and submit."""
+        """Update dbcs, write all dirty text rectangles to pixels and mark them for submission."""
         for row in sorted(self._dirty_left):
             start, stop = self._refresh_dbcs(row, self._dirty_left[row], self._dirty_right[row])
-            self._draw_text(row, start, row, stop)
+            if self._text_only:
+                self._pixels_stale = True
+            else:
+                self._draw_text(row, start, row, stop)
             self._submit(row, start, row, stop)
         self._dirty_left = {}
         self._dirty_right = {}
@@ -390,6 +621,8 @@ class VideoBuffer(object):
 
     def _draw_text(self, top, left, bottom, right):
         """Draw text in a rectangular screen section to pixel buffer."""
+        # this renders text already counted as a change, but the pixels must be cleared on reset
+        self._clean = False
         for row in range(top, bottom+1):
             gen_chunks = iter_chunks(
                 self._dbcs_text[row-1][left-1:right], self._rows[row-1].attrs[left-1:right]
@@ -421,14 +654,20 @@ class VideoBuffer(object):
             start, 1, stop, self._width, attr, adjust_end=True, clear_wrap=True
         )
         # clear pixels
-        x0, y0, x1, y1 = self.text_to_pixel_area(start, 1, stop, self._width)
         _, back, _, _ = self._colourmap.split_attr(attr)
-        self._pixels[y0:y1+1, x0:x1+1] = back
+        if self._text_only:
+            self._pixels_stale = True
+        else:
+            x0, y0, x1, y1 = self.text_to_pixel_area(start, 1, stop, self._width)
+            self._pixels[y0:y1+1, x0:x1+1] = back
         # submit dirty rects before clear
         self.force_submit()
         # this should only be called on the active page
         if self._visible:
             self._queues.video.put(signals.Event(signals.VIDEO_CLEAR_ROWS, (back, start, stop)))
+            # no need to send the cleared rows separately
+            for row in range(start, stop+1):
+                self._damage.pop(row, None)
 
     def clear_row_from(self, row, col, attr):
         """Clear from given position to end of row."""
@@ -447,6 +686,7 @@ class VideoBuffer(object):
         Clear a rectangular area of the screen (inclusive bounds; 1-based indexing).
         Does not clear pixels or submit to interface (which allows its use in put_rect).
         """
+        self._changed()
         for row in self._rows[from_row-1:to_row]:
             row.chars[from_col-1:to_col] = [b' '] * (to_col - from_col + 1)
             row.attrs[from_col-1:to_col] = [attr] * (to_col - from_col + 1)
@@ -470,6 +710,7 @@ class VideoBuffer(object):
 
     def scroll_up(self, from_row, to_row, attr):
         """Scroll up by one line, between from_row and to_row, filling empty row with attr."""
+        self._changed()
         # submit dirty rects before scroll
         self.force_submit()
         _, back, _, _ = self._colourmap.split_attr(attr)
@@ -477,6 +718,7 @@ class VideoBuffer(object):
             self._queues.video.put(signals.Event(
                 signals.VIDEO_SCROLL, (-1, from_row, to_row, back)
             ))
+            self._scroll_damage(from_row, to_row, -1)
         # update text buffer
         new_row = _TextRow(attr, self._width)
         self._rows.insert(to_row, new_row)
@@ -489,14 +731,21 @@ class VideoBuffer(object):
         self._dbcs_text[from_row-1:to_row-1] = self._dbcs_text[from_row:to_row]
         self._dbcs_text[to_row-1] = [u' '] * self._width
         # update pixel buffer
+        if self._text_only:
+            self._pixels_stale = True
+            return
         sx0, sy0, sx1, sy1 = self.text_to_pixel_area(
             from_row+1, 1, to_row, self._width
         )
         tx0, ty0 = self.text_to_pixel_pos(from_row, 1)
         self._pixels.move(sy0, sy1+1, sx0, sx1+1, ty0, tx0)
+        # fill the emptied row with the background attribute, as the interface does
+        x0, y0, x1, y1 = self.text_to_pixel_area(to_row, 1, to_row, self._width)
+        self._pixels[y0:y1+1, x0:x1+1] = back
 
     def scroll_down(self, from_row, to_row, attr):
         """Scroll down by one line, between from_row and to_row, filling empty row with attr."""
+        self._changed()
         # submit dirty rects before scroll
         self.force_submit()
         _, back, _, _ = self._colourmap.split_attr(attr)
@@ -504,6 +753,7 @@ class VideoBuffer(object):
             self._queues.video.put(signals.Event(
                 signals.VIDEO_SCROLL, (1, from_row, to_row, back)
             ))
+            self._scroll_damage(from_row, to_row, 1)
         # update text buffer
         new_row = _TextRow(attr, self._width)
         # insert at row # from_row
@@ -518,8 +768,13 @@ class VideoBuffer(object):
         self._dbcs_text[from_row:to_row] = self._dbcs_text[from_row-1:to_row-1]
         self._dbcs_text[from_row-1] = [u' '] * self._width
         # update pixel buffer
+        if self._text_only:
+            self._pixels_stale = True
+            return
         sx0, sy0, sx1, sy1 = self.text_to_pixel_area(
             from_row, 1, to_row-1, self._width
         )
         tx0, ty0 = self.text_to_pixel_pos(from_row+1, 1)
         self._pixels.move(sy0, sy1+1, sx0, sx1+1, ty0, tx0)
+        x0, y0, x1, y1 = self.text_to_pixel_area(from_row, 1, from_row, self._width)
+        self._pixels[y0:y1+1, x0:x1+1] = back
@@ -190,6 +190,17 @@ class _ColourMapper(object):
         else:
             self._palette_change_policy = 'allow'
         self.submit()
+        # state and palette table just after initialisation, to return to on reuse
+        self._initial_table = self._get_rgb_table()
+        self._initial_state = dict(self.__dict__)
+        self._initial_state['_palette'] = list(self._palette)
+
+    def restore(self):
+        """Return to the state just after initialisation and submit to interface."""
+        self.__dict__.update(self._initial_state)
+        # don't let PALETTE change the snapshot in place
+        self._palette = list(self._initial_state['_palette'])
+        self._queues.video.put(signals.Event(signals.VIDEO_SET_PALETTE, self._initial_table))
 
     def allows_palette_change(self):
         """Check if the video mode allows palette change."""
@@ -270,6 +281,10 @@ class _ColourMapper(object):
         """Retrieve the colour for a given attribute."""
         return self._palette[index]
 
+    def get_rgb_table(self):
+        """List of RGB/blink/underline for all attributes, as submitted to the interface."""
+        return self._get_rgb_table()[0]
+
     def submit(self):
         """Submit to interface."""
         # all attributes split into foreground RGB, background RGB, blink and underline
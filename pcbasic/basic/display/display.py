@@ -17,6 +17,7 @@ from . import graphics
 from . import modes
 from . import font
 
+from ..base.bytematrix import SharedFrame
 from .buffers import VideoBuffer
 from .textscreen import TextScreen
 from .colours import MONO_TINT
@@ -77,6 +78,18 @@ class Display(object):
         )
         # page buffers, set by _set_mode
         self.pages = None
+        # page buffers and colour maps kept for reuse on mode switches
+        self._page_cache = {}
+        self._colourmap_cache = {}
+        # skip rendering text to pixels in text modes, unless the pixels are needed
+        self._text_only = False
+        # pixel frame shared with the interface, if it supports that
+        self._share_frame = False
+        self._shared_frame = None
+        # number that changes with the contents of the visible page, and the page and its
+        # generation it was last counted at
+        self._generation = 0
+        self._generation_key = None, None
         # screen aspect ratio: used to determine pixel aspect ratio, which is used by CIRCLE
         # all adapters including PCjr target 4x3, except Tandy
         if self._adapter == 'tandy':
@@ -98,9 +111,7 @@ class Display(object):
             input_methods, self._values, self._memory, aspect
         )
         # colour palette
-        self.colourmap = self.mode.colourmap(
-            self._queues, self._adapter, self._monitor, self.colorswitch
-        )
+        self.colourmap = self._get_colourmap(self.mode, self.colorswitch)
         # initialise a fresh textmode screen
         self._set_mode(self.mode, 1, 0, 0, erase=True)
 
@@ -123,25 +134,12 @@ class Display(object):
         ):
         """Change the video mode, colourburst, visible or active page."""
         # reset palette happens even if the SCREEN call fails
-        self.colourmap.reset()
-        # find the new mode we're trying to get into
-        if new_mode_nr is None:
-            # keep current mode if graphics but maybe change width if text
-            if self.mode.is_text_mode and new_width is not None:
-                new_mode = modes.get_mode(
-                    0, new_width, self._adapter, self._monitor, self._video_mem_size
-                )
-            else:
-                new_mode = self.mode
-        else:
-            if new_mode_nr == 0 and new_width is None:
-                # if we switch out of a 20-col mode (Tandy screen 3), switch to 40-col.
-                # otherwise, width persists on change to screen 0
-                new_width = 40 if (self.mode.width == 20) else self.mode.width
-            # retrieve the specs for the new video mode
-            new_mode = modes.get_mode(
-                new_mode_nr, new_width, self._adapter, self._monitor, self._video_mem_size
-            )
+        # on a full reset, the palette is initialised for the new mode instead
+        try:
+            new_mode = self._find_mode(new_mode_nr, new_width)
+        except error.BASICError:
+            self.colourmap.reset()
+            raise
         # set colorswitch
         new_colorswitch = bool(new_colorswitch)
         if new_colorswitch is None:
@@ -165,14 +163,34 @@ class Display(object):
         # illegal fn call before anything happens.
         # signal the signals to change the screen resolution
         if (new_apagenum >= new_mode.num_pages or new_vpagenum >= new_mode.num_pages):
+            self.colourmap.reset()
             raise error.BASICError(error.IFC)
         # if mode or colorswitch changed, do a full reset
         # otherwise only change pages
         if force_reset or new_mode != self.mode or new_colorswitch != self.colorswitch:
             self._set_mode(new_mode, new_colorswitch, new_apagenum, new_vpagenum, erase)
         else:
+            self.colourmap.reset()
             self.set_page(new_vpagenum, new_apagenum)
 
+    def _find_mode(self, new_mode_nr, new_width):
+        """Find the new mode we're trying to get into."""
+        if new_mode_nr is None:
+            # keep current mode if graphics but maybe change width if text
+            if self.mode.is_text_mode and new_width is not None:
+                return modes.get_mode(
+                    0, new_width, self._adapter, self._monitor, self._video_mem_size
+                )
+            return self.mode
+        if new_mode_nr == 0 and new_width is None:
+            # if we switch out of a 20-col mode (Tandy screen 3), switch to 40-col.
+            # otherwise, width persists on change to screen 0
+            new_width = 40 if (self.mode.width == 20) else self.mode.width
+        # retrieve the specs for the new video mode
+        return modes.get_mode(
+            new_mode_nr, new_width, self._adapter, self._monitor, self._video_mem_size
+        )
+
     def _set_mode(self, new_mode, new_colorswitch, new_apagenum, new_vpagenum, erase):
         """Change the video mode, colourburst, visible or active page."""
         # preserve memory if erase==0; don't distingush erase==1 and erase==2
@@ -210,20 +228,9 @@ class Display(object):
         if (not text_to_text or page_changes or colorswitch_changes):
             self.attr = new_mode.attr
         # initialise the palette
-        self.colourmap = new_mode.colourmap(
-            self._queues, self._adapter, self._monitor, self.colorswitch
-        )
+        self.colourmap = self._get_colourmap(new_mode, self.colorswitch)
         # initialise pixel and character buffers
-        self.pages = [
-            VideoBuffer(
-                self._queues,
-                self.mode.pixel_height, self.mode.pixel_width,
-                self.mode.height, self.mode.width,
-                self.colourmap, self.attr, font, self._codepage,
-                do_fullwidth=(self.mode.is_text_mode and self.mode.font_height >= 14),
-            )
-            for _pagenum in range(self.mode.num_pages)
-        ]
+        self.pages = self._get_pages(font)
         # submit the mode change to the interface
         self._queues.video.put(signals.Event(
             signals.VIDEO_SET_MODE, (
@@ -231,6 +238,7 @@ class Display(object):
                 new_mode.height, new_mode.width
             )
         ))
+        self._submit_shared_frame()
         # border persists on width-only change or no change; set to black otherwise
         if not text_to_text and mode_changes:
             self.set_border(0)
@@ -251,6 +259,39 @@ class Display(object):
         # set graphics attribute
         self.graphics.set_attr(self.attr)
 
+    def _get_colourmap(self, mode, colorswitch):
+        """Get a colour map in its initial state, reusing one from an earlier mode switch."""
+        key = mode.colourmap, colorswitch
+        if key in self._colourmap_cache:
+            colourmap = self._colourmap_cache[key]
+            colourmap.restore()
+        else:
+            colourmap = mode.colourmap(self._queues, self._adapter, self._monitor, colorswitch)
+            self._colourmap_cache[key] = colourmap
+        return colourmap
+
+    def _get_pages(self, font):
+        """Get empty page buffers for the current mode, reusing those of modes of equal size."""
+        do_fullwidth = self.mode.is_text_mode and self.mode.font_height >= 14
+        text_only = self.mode.is_text_mode and self._text_only
+        pages = self._page_cache.setdefault((
+            self.mode.pixel_height, self.mode.pixel_width,
+            self.mode.height, self.mode.width, do_fullwidth
+        ), [])
+        for page in pages[:self.mode.num_pages]:
+            page.reset(self.colourmap, self.attr, font, text_only)
+        pages.extend(
+            VideoBuffer(
+                self._queues,
+                self.mode.pixel_height, self.mode.pixel_width,
+                self.mode.height, self.mode.width,
+                self.colourmap, self.attr, font, self._codepage,
+                do_fullwidth=do_fullwidth, text_only=text_only,
+            )
+            for _pagenum in range(len(pages), self.mode.num_pages)
+        )
+        return pages[:self.mode.num_pages]
+
     def set_width(self, to_width):
         """Set the number of columns of the screen, reset pages and change modes."""
         # if we're currently at that width, do nothing
@@ -283,6 +324,32 @@ class Display(object):
         print('here')
         self.screen(0, 0, 0, 0, force_reset=True)
 
+    def set_shared_frame(self, share_frame):
+        """Set whether to send pixels to the interface through a shared frame, from next rebuild."""
+        self._share_frame = share_frame
+        if not share_frame and self.pages:
+            # nobody will release the frame we have
+            self._submit_shared_frame()
+
+    def _submit_shared_frame(self):
+        """Create a new shared frame for the pages and send it to the interface."""
+        if self._share_frame:
+            self._shared_frame = SharedFrame(self.mode.pixel_height, self.mode.pixel_width)
+            self._queues.video.put(signals.Event(
+                signals.VIDEO_SHARE_FRAME, (self._shared_frame,)
+            ))
+        else:
+            self._shared_frame = None
+        for page in self.pages:
+            page.set_shared_frame(self._shared_frame)
+
+    def set_text_only(self, text_only):
+        """Set whether text-mode pages are only rendered to pixels when the pixels are needed."""
+        self._text_only = text_only
+        if self.mode.is_text_mode:
+            for page in self.pages:
+                page.set_text_only(text_only)
+
     def rebuild(self):
         """Completely resubmit the screen to the interface."""
         # set the screen mode
@@ -292,6 +359,7 @@ class Display(object):
                 self.mode.height, self.mode.width
             )
         ))
+        self._submit_shared_frame()
         # rebuild palette
         self.colourmap.submit()
         # set the border
@@ -301,6 +369,34 @@ class Display(object):
         # redraw the text screen and submit to interface
         for page in self.pages:
             page.resubmit()
+        self.flush()
+
+    def flush(self):
+        """Submit screen changes collected since the last frame to the interface."""
+        self.vpage.flush()
+
+    ###########################################################################
+    # snapshots
+
+    def get_generation(self):
+        """Get a number that changes whenever the contents of the visible page change."""
+        key = self.vpage, self.vpage.generation
+        if key != self._generation_key:
+            self._generation += 1
+            self._generation_key = key
+        return self._generation
+
+    def get_pixel_snapshot(self):
+        """Get a read-only copy of the pixels on the visible page."""
+        return self.vpage.get_pixel_snapshot()
+
+    def get_text_snapshot(self):
+        """Get a read-only copy of the text cells on the visible page."""
+        return self.vpage.get_text_snapshot()
+
+    def get_rgb_table(self):
+        """Get foreground and background RGB, blink and underline for all attributes."""
+        return self.colourmap.get_rgb_table()
 
     ###########################################################################
     # memory accessible properties
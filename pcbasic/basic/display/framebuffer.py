@@ -10,7 +10,7 @@ import struct
 import functools
 import operator
 
-from ...compat import xrange, int2byte, zip, iterbytes, PY2
+from ...compat import iterbytes, iterchar, PY2
 
 from ..base import bytematrix
 
@@ -246,42 +246,42 @@ class TextMemoryMapper(_MemoryMapper):
         self._text_height = text_height
         self._text_width = text_width
 
+    def _walk_rows(self, display, addr, num_bytes):
+        """Iterate over the text rows in a memory range, as (page, row, row_offset, length, offset)."""
+        row_size = self._text_width * 2
+        start, stop = addr, addr + num_bytes
+        while addr < stop:
+            page, offset = divmod(addr, self._page_size)
+            row, row_offset = divmod(offset, row_size)
+            length = min(row_size - row_offset, self._page_size - offset, stop - addr)
+            if page < len(display.pages) and row < self._text_height:
+                yield display.pages[page], 1 + row, row_offset, length, addr - start
+            addr += length
+
+    def _get_cells(self, page, row, row_offset, length):
+        """Retrieve interleaved characters and attributes of the cells in a row range."""
+        col0, col1 = 1 + row_offset // 2, 1 + (row_offset + length - 1) // 2
+        cells = bytearray(2 * (col1 - col0 + 1))
+        cells[0::2] = page.get_bytes(row, col0, col1)
+        cells[1::2] = page.get_attrs(row, col0, col1)
+        return col0, cells
+
     def get_memory(self, display, addr, num_bytes):
         """Retrieve bytes from textmode video memory."""
         addr -= self._video_segment * 0x10
         mem_bytes = bytearray(num_bytes)
-        for i in xrange(num_bytes):
-            page, offset = divmod(addr+i, self._page_size)
-            row, row_offset = divmod(offset, self._text_width*2)
-            col = row_offset // 2
-            try:
-                if (addr+i) % 2:
-                    mem_bytes[i] = display.pages[page].get_attr(1 + row, 1 + col)
-                else:
-                    mem_bytes[i] = display.pages[page].get_byte(1 + row, 1 + col)
-            except IndexError:
-                pass
+        for page, row, row_offset, length, ofs in self._walk_rows(display, addr, num_bytes):
+            _, cells = self._get_cells(page, row, row_offset, length)
+            mem_bytes[ofs:ofs+length] = cells[row_offset % 2 : row_offset % 2 + length]
         return mem_bytes
 
     def set_memory(self, display, addr, mem_bytes):
         """Set bytes in textmode video memory."""
         addr -= self._video_segment*0x10
-        last_row = 0
-        for i in xrange(len(mem_bytes)):
-            page, offset = divmod(addr+i, self._page_size)
-            row, row_offset = divmod(offset, self._text_width*2)
-            col = row_offset // 2
-            try:
-                if (addr+i) % 2:
-                    c = display.pages[page].get_byte(1+row, 1+col)
-                    a = mem_bytes[i]
-                else:
-                    c = mem_bytes[i]
-                    a = display.pages[page].get_attr(1+row, 1+col)
-                display.pages[page].put_char_attr(1+row, 1+col, int2byte(c), a)
-            except IndexError:
-                pass
-            last_row = 1 + row
+        for page, row, row_offset, length, ofs in self._walk_rows(display, addr, len(mem_bytes)):
+            col, cells = self._get_cells(page, row, row_offset, length)
+            cells[row_offset % 2 : row_offset % 2 + length] = mem_bytes[ofs:ofs+length]
+            page.put_chars_attrs(row, col, list(iterchar(bytes(cells[0::2]))), list(cells[1::2]))
 
 
 class GraphicsMemoryMapper(_MemoryMapper):
@@ -329,35 +329,28 @@ class GraphicsMemoryMapper(_MemoryMapper):
         # factor supports tandy-6 mode, which has 8 pixels per 2 bytes
         # with alternating planes in even and odd bytes (i.e. ppb==8)
         ppb = factor * self._ppb
-        page_size = self._page_size // factor
-        bank_size = self._bank_size // factor
         row_size = self._bytes_per_row // factor
-        # first row
-        page, x, y = self._get_coords(addr)
-        offset = min(row_size - x//ppb, num_bytes)
-        if self._coord_ok(page, x, y):
-            yield page, x, y, 0, offset
-        # full rows
-        bank_offset, page_offset, start_y = 0, 0, y
-        while page_offset + bank_offset + offset < num_bytes:
-            y += self._interleave_times
-            # not an integer number of rows in a bank
-            if offset >= bank_size:
-                bank_offset += bank_size
-                start_y += 1
-                offset, y = 0, start_y
-                if bank_offset >= page_size:
-                    page_offset += page_size
-                    page += 1
-                    bank_offset, offset = 0, 0
-                    y, start_y = 0, 0
-            if self._coord_ok(page, 0, y):
-                ofs = page_offset + bank_offset + offset
-                if ofs + row_size > num_bytes:
-                    yield page, 0, y, ofs, num_bytes - ofs
-                else:
-                    yield page, 0, y, ofs, row_size
-            offset += row_size
+        ofs = 0
+        while ofs < num_bytes:
+            # locate each row segment from its own address, as the gaps at the end of
+            # interleaved banks need not be aligned with rows or with the start of the range
+            bank_offset = (addr + ofs * factor - self._video_segment * 0x10) % self._bank_size
+            page, x, y = self._get_coords(addr + ofs * factor)
+            length = min(
+                row_size - x // ppb, (self._bank_size - bank_offset + factor - 1) // factor,
+                num_bytes - ofs
+            )
+            if self._coord_ok(page, x, y):
+                yield page, x, y, ofs, length
+            ofs += length
+
+    def _put_rows(self, display, rows):
+        """Write (page, x, y, pixel row) to the page buffers, submitting once per page."""
+        placed = {}
+        for page, x, y, pixarray in rows:
+            placed.setdefault(page, []).append((x, y, pixarray))
+        for page, page_placed in placed.items():
+            display.pages[page].pixels.put_matrices(page_placed)
 
 
 class CGAMemoryMapper(GraphicsMemoryMapper):
@@ -388,12 +381,12 @@ class CGAMemoryMapper(GraphicsMemoryMapper):
 
     def set_memory(self, display, addr, byte_array):
         """Set bytes in CGA memory."""
-        for page, x, y, ofs, length in self._walk_memory(addr, len(byte_array)):
-            #bytes_to_interval
-            pixarray = bytematrix.ByteMatrix.frompacked(
+        self._put_rows(display, (
+            (page, x, y, bytematrix.ByteMatrix.frompacked(
                 byte_array[ofs:ofs+length], height=1, items_per_byte=self._ppb
-            )
-            display.pages[page].pixels[y, x:x+pixarray.width] = pixarray
+            ))
+            for page, x, y, ofs, length in self._walk_memory(addr, len(byte_array))
+        ))
 
     def get_memory(self, display, addr, num_bytes):
         """Retrieve bytes from CGA memory."""
@@ -474,15 +467,16 @@ class EGAMemoryMapper(GraphicsMemoryMapper):
         # return immediately for unused colour planes
         if mask == 0:
             return
+        rows = []
         for page, x, y, ofs, length in self._walk_memory(addr, len(byte_array)):
             pixarray = (
                 bytematrix.ByteMatrix.frompacked(
                     byte_array[ofs:ofs+length], height=1, items_per_byte=8
                 ).render(0, mask)
             )
-            width = pixarray.width
-            substrate = display.pages[page].pixels[y, x:x+width] & ~mask
-            display.pages[page].pixels[y, x:x+width] = (pixarray & mask) | substrate
+            substrate = display.pages[page].pixels[y, x:x+pixarray.width] & ~mask
+            rows.append((page, x, y, pixarray | substrate))
+        self._put_rows(display, rows)
 
 
 class Tandy6MemoryMapper(GraphicsMemoryMapper):
@@ -517,33 +511,31 @@ class Tandy6MemoryMapper(GraphicsMemoryMapper):
         """Retrieve bytes from Tandy 640x200x4 """
         # 8 pixels per 2 bytes
         # low attribute bits stored in even bytes, high bits in odd bytes.
-        half_len = (num_bytes+1) // 2
-        hbytes = bytearray(half_len), bytearray(half_len)
-        for parity, byte_array in enumerate(hbytes):
-            plane = parity ^ (addr % 2)
-            for page, x, y, ofs, length in self._walk_memory(addr, num_bytes, 2):
+        byte_array = bytearray(num_bytes)
+        for parity in (0, 1):
+            plane = (addr + parity) % 2
+            half = bytearray(len(byte_array[parity::2]))
+            for page, x, y, ofs, length in self._walk_memory(addr + parity, len(half), 2):
                 pixarray = display.pages[page].pixels[y, x : x + length*self._ppb*2]
-                #hbytes[parity][ofs:ofs+length] = interval_to_bytes(pixarray, self._ppb*2, plane)
-                byte_array[ofs:ofs+length] = (pixarray >> plane).packed(self._ppb * 2)
-        # resulting array may be too long by one byte, so cut to size
-        return [_item for _pair in zip(*hbytes) for _item in _pair] [:num_bytes]
+                half[ofs:ofs+length] = (pixarray >> plane).packed(self._ppb * 2)
+            byte_array[parity::2] = half
+        return byte_array
 
     def set_memory(self, display, addr, byte_array):
         """Set bytes in Tandy 640x200x4 memory."""
-        hbytes = byte_array[0::2], byte_array[1::2]
         # Tandy-6 encodes 8 pixels per byte, alternating colour planes.
         # I.e. even addresses are 'colour plane 0', odd ones are 'plane 1'
-        for parity, half in enumerate(hbytes):
-            plane = parity ^ (addr % 2)
+        for parity in (0, 1):
+            plane = (addr + parity) % 2
             mask = 2 ** plane
-            for page, x, y, ofs, length in self._walk_memory(addr, len(byte_array), 2):
-                #pixarray = bytes_to_interval(hbytes[parity][ofs:ofs+length], 2*self._ppb, mask)
+            half = byte_array[parity::2]
+            rows = []
+            for page, x, y, ofs, length in self._walk_memory(addr + parity, len(half), 2):
                 pixarray = (
                     bytematrix.ByteMatrix.frompacked(
-                        # what's the deal with the empty bytearrays here in some of the tests?
                         half[ofs:ofs+length], height=1, items_per_byte=2*self._ppb
                     ) << plane
                 )
-                width = pixarray.width
-                substrate = display.pages[page].pixels[y, x:x+width] & ~mask
-                display.pages[page].pixels[y, x:x+width] = (pixarray & mask) | substrate
+                substrate = display.pages[page].pixels[y, x:x+pixarray.width] & ~mask
+                rows.append((page, x, y, (pixarray & mask) | substrate))
+            self._put_rows(display, rows)
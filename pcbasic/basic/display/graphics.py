@@ -7,6 +7,7 @@ This file is released under the GNU GPL version 3 or later.
 """
 
 import math
+import bisect
 import operator
 
 from itertools import islice
@@ -21,6 +22,9 @@ from .. import mlparser
 
 ZERO_TILE = bytematrix.ByteMatrix(1, 8)
 
+# maximum number of compiled DRAW strings to keep
+DRAW_CACHE_SIZE = 256
+
 
 class GraphicsViewPort(object):
     """Graphics viewport (clip area) functions."""
@@ -82,6 +86,20 @@ class GraphicsViewPort(object):
             return self._pixels[y, x]
         return self._pixels[self._convert_slice(index)]
 
+    def fill_rects(self, rects, attr):
+        """Fill rectangles (x0, y0, x1, y1 inclusive, viewport coordinates), clipped to the viewport."""
+        # clip once for the whole primitive rather than for each pixel
+        xmin, ymin, xmax, ymax = self.get_bounds()
+        offset_x, offset_y = self._convert_coords(0, 0)
+        clipped = []
+        for x0, y0, x1, y1 in rects:
+            x0, y0 = max(x0, xmin), max(y0, ymin)
+            x1, y1 = min(x1, xmax), min(y1, ymax)
+            if x0 <= x1 and y0 <= y1:
+                clipped.append((x0+offset_x, y0+offset_y, x1+offset_x, y1+offset_y))
+        if clipped:
+            self._pixels.fill_rects(clipped, attr)
+
     def get_bounds(self):
         """Return the graphics viewport bounds, in viewport coordinates."""
         if self._absolute:
@@ -181,6 +199,10 @@ class Graphics(object):
         self._last_attr = None
         self._draw_scale = None
         self._draw_angle = None
+        # compiled DRAW strings
+        self._draw_cache = {}
+        # unpacked sprites, by array name
+        self._sprite_cache = {}
         # screen aspect ratio: used to determine pixel aspect ratio, which is used by CIRCLE
         self._screen_aspect = aspect
 
@@ -189,6 +211,8 @@ class Graphics(object):
         self._mode = mode
         self._pages = pages
         self._num_attr = num_attr
+        self._draw_cache.clear()
+        self._sprite_cache.clear()
         # set graphics viewport
         self.graph_view = GraphicsViewPort(self._pages[0].pixels)
         self._unset_window()
@@ -436,37 +460,17 @@ class Graphics(object):
 
     def _draw_line(self, x0, y0, x1, y1, c, pattern=0xffff):
         """Draw a line between the given physical points."""
+        self.graph_view.fill_rects(self._line_rects(x0, y0, x1, y1, pattern), c)
+
+    def _line_rects(self, x0, y0, x1, y1, pattern=0xffff):
+        """Get the pixel runs for a line between the given physical points."""
         # cut off any out-of-bound coordinates
         x0, y0 = self.graph_view.cutoff_coord(x0, y0)
         x1, y1 = self.graph_view.cutoff_coord(x1, y1)
         if y1 <= y0:
             # work from top to bottom, or from x1,y1 if at the same height. this matters for mask.
             x1, y1, x0, y0 = x0, y0, x1, y1
-        # Bresenham algorithm
-        dx, dy = abs(x1-x0), abs(y1-y0)
-        steep = dy > dx
-        if steep:
-            x0, y0, x1, y1 = y0, x0, y1, x1
-            dx, dy = dy, dx
-        sx = 1 if x1 > x0 else -1
-        sy = 1 if y1 > y0 else -1
-        mask = 0x8000
-        line_error = dx // 2
-        x, y = x0, y0
-        for x in range(x0, x1+sx, sx):
-            if pattern & mask != 0:
-                if steep:
-                    # set point (y, x)
-                    self.graph_view[x, y] = c
-                else:
-                    self.graph_view[y, x] = c
-            mask >>= 1
-            if mask == 0:
-                mask = 0x8000
-            line_error -= dy
-            if line_error < 0:
-                y += sy
-                line_error += dx
+        return _line_runs(x0, y0, x1, y1, _pattern_segments(pattern))
 
     def _draw_box_filled(self, x0, y0, x1, y1, c):
         """Draw a filled box between the given corner points."""
@@ -482,32 +486,17 @@ class Graphics(object):
         """Draw an empty box between the given corner points."""
         x0, y0 = self.graph_view.cutoff_coord(x0, y0)
         x1, y1 = self.graph_view.cutoff_coord(x1, y1)
-        mask = 0x8000
-        mask = self._draw_straight(x1, y1, x0, y1, c, pattern, mask)
-        mask = self._draw_straight(x1, y0, x0, y0, c, pattern, mask)
+        segments = _pattern_segments(pattern)
+        rects = []
+        # the pattern phase carries over from one side to the next
+        phase = _straight_runs(rects, x1, y1, x0, y1, segments, 0)
+        phase = _straight_runs(rects, x1, y0, x0, y0, segments, phase)
         # verticals always drawn top to bottom
         if y0 < y1:
             y0, y1 = y1, y0
-        mask = self._draw_straight(x1, y1, x1, y0, c, pattern, mask)
-        mask = self._draw_straight(x0, y1, x0, y0, c, pattern, mask)
-
-    def _draw_straight(self, x0, y0, x1, y1, c, pattern, mask):
-        """Draw a horizontal or vertical line."""
-        if x0 == x1:
-            p0, p1, q, direction = y0, y1, x0, 'y'
-        else:
-            p0, p1, q, direction = x0, x1, y0, 'x'
-        sp = 1 if p1 > p0 else -1
-        for p in range(p0, p1+sp, sp):
-            if pattern & mask != 0:
-                if direction == 'x':
-                    self.graph_view[q, p] = c
-                else:
-                    self.graph_view[p, q] = c
-            mask >>= 1
-            if mask == 0:
-                mask = 0x8000
-        return mask
+        phase = _straight_runs(rects, x1, y1, x1, y0, segments, phase)
+        phase = _straight_runs(rects, x0, y1, x0, y0, segments, phase)
+        self.graph_view.fill_rects(rects, c)
 
     ### CIRCLE: circle, ellipse, sectors
 
@@ -636,47 +625,24 @@ class Graphics(object):
         # if oct1==oct0:
         # ----|.....|--- : coo1 lt coo0 : print if y in [0,coo1] or in [coo0, r]
         # ....|-----|... ; coo1 gte coo0: print if y in [coo0,coo1]
-        x, y = r, 0
-        bres_error = 1-r
-        while x >= y:
-            for octant in range(0, 8):
-                if octant in hide_oct:
-                    continue
-                elif oct0 != oct1 and octant == oct0 and _octant_gt(oct0, coo0, y):
-                    continue
-                elif oct0 != oct1 and octant == oct1 and _octant_gt(oct1, y, coo1):
-                    continue
-                elif oct0 == oct1 and octant == oct0:
-                    # if coo1 >= coo0
-                    if _octant_gte(oct0, coo1, coo0):
-                        # if y > coo1 or y < coo0
-                        # (don't draw if y is outside coo's)
-                        if _octant_gt(oct0, y, coo1) or _octant_gt(oct0, coo0,y):
-                            continue
-                    else:
-                        # if coo0 > y > c001
-                        # (don't draw if y is between coo's)
-                        if _octant_gt(oct0, y, coo1) and _octant_gt(oct0, coo0, y):
-                            continue
-                oct_x, oct_y = _octant_coord(octant, x0, y0, x, y)
-                self.graph_view[oct_y, oct_x] = c
-            # remember endpoints for pie sectors
-            if y == coo0:
-                coo0x = x
-            if y == coo1:
-                coo1x = x
-            # bresenham error step
-            y += 1
-            if bres_error < 0:
-                bres_error += 2*y+1
-            else:
-                x -= 1
-                bres_error += 2*(y-x+1)
+        offsets, keys = _circle_offsets(r)
+        points = []
+        for octant in range(0, 8):
+            if octant in hide_oct:
+                continue
+            for first, last in _arc_ranges(octant, oct0, coo0, oct1, coo1, keys):
+                points.extend(
+                    _octant_coord(octant, x0, y0, _x, _y) for _x, _y in offsets[first:last]
+                )
+        rects = _row_runs(points)
         # draw pie-slice lines
         if line0:
-            self._draw_line(x0, y0, *_octant_coord(oct0, x0, y0, coo0x, coo0), c=c)
+            coo0x = offsets[min(coo0, len(offsets)-1)][0]
+            rects.extend(self._line_rects(x0, y0, *_octant_coord(oct0, x0, y0, coo0x, coo0)))
         if line1:
-            self._draw_line(x0, y0, *_octant_coord(oct1, x0, y0, coo1x, coo1), c=c)
+            coo1x = offsets[min(coo1, len(offsets)-1)][0]
+            rects.extend(self._line_rects(x0, y0, *_octant_coord(oct1, x0, y0, coo1x, coo1)))
+        self.graph_view.fill_rects(rects, c)
 
     def _draw_ellipse(
             self, cx, cy, rx, ry, c,
@@ -692,56 +658,28 @@ class Graphics(object):
             hide_qua = list(range(0, qua0)) + list(range(qua1+1, 4))
         else:
             hide_qua = list(range(qua1+1, qua0))
-        # error increment
-        dx = 16 * (1-2*rx) * ry * ry
-        dy = 16 * rx * rx
-        ddy = 32 * rx * rx
-        ddx = 32 * ry * ry
-        # error for first step
-        err = dx + dy
-        x, y = rx, 0
-        while True:
-            for quadrant in range(0,4):
-                # skip invisible arc sectors
-                if quadrant in hide_qua:
-                    continue
-                elif qua0 != qua1 and quadrant == qua0 and _quadrant_gt(qua0, x0, y0, x, y):
-                    continue
-                elif qua0 != qua1 and quadrant == qua1 and _quadrant_gt(qua1, x, y, x1, y1):
-                    continue
-                elif qua0 == qua1 and quadrant == qua0:
-                    if _quadrant_gte(qua0, x1, y1, x0, y0):
-                        if _quadrant_gt(qua0, x, y, x1, y1) or _quadrant_gt(qua0, x0, y0, x, y):
-                            continue
-                    else:
-                        if _quadrant_gt(qua0, x, y, x1, y1) and _quadrant_gt(qua0, x0, y0, x, y):
-                            continue
-                quad_x, quad_y = _quadrant_coord(quadrant, cx, cy, x, y)
-                self.graph_view[quad_y, quad_x] = c
-            # bresenham error step
-            e2 = 2 * err
-            if (e2 <= dy):
-                y += 1
-                dy += ddy
-                err += dy
-            if (e2 >= dx or e2 > dy):
-                x -= 1
-                dx += ddx
-                err += dx
-            # NOTE - err changes sign at the change from y increase to x increase
-            if (x < 0):
-                break
+        offsets, keys, tip = _ellipse_offsets(rx, ry)
+        points = []
+        for quadrant in range(0, 4):
+            # skip invisible arc sectors
+            if quadrant in hide_qua:
+                continue
+            for first, last in _arc_ranges(quadrant, qua0, (y0, -x0), qua1, (y1, -x1), keys):
+                points.extend(
+                    _quadrant_coord(quadrant, cx, cy, _x, _y) for _x, _y in offsets[first:last]
+                )
         # too early stop of flat vertical ellipses
         # finish tip of ellipse
-        while (y < ry):
-            self.graph_view[cy+y, cx] = c
-            self.graph_view[cy-y, cx] = c
-            y += 1
+        for y in tip:
+            points.append((cx, cy+y))
+            points.append((cx, cy-y))
+        rects = _row_runs(points)
         # draw pie-slice lines
         if line0:
-            self._draw_line(cx, cy, *_quadrant_coord(qua0, cx, cy, x0, y0), c=c)
+            rects.extend(self._line_rects(cx, cy, *_quadrant_coord(qua0, cx, cy, x0, y0)))
         if line1:
-            self._draw_line(cx, cy, *_quadrant_coord(qua1, cx, cy, x1, y1), c=c)
+            rects.extend(self._line_rects(cx, cy, *_quadrant_coord(qua1, cx, cy, x1, y1)))
+        self.graph_view.fill_rects(rects, c)
 
     ### PAINT: Flood fill
 
@@ -935,8 +873,7 @@ class Graphics(object):
             raise error.BASICError(error.TYPE_MISMATCH)
         x0, y0 = self._get_window_physical(x0, y0)
         self._last_point = x0, y0
-        packed_sprite = self._memory.arrays.view_full_buffer(array_name)
-        sprite = self._mode.sprite_builder.unpack(packed_sprite)
+        sprite = self._get_sprite(array_name)
         x1, y1 = x0 + sprite.width - 1, y0 + sprite.height - 1
         # the whole sprite must fit or it's IFC
         error.throw_if(not self.graph_view.contains(x0, y0))
@@ -955,6 +892,20 @@ class Graphics(object):
             rect = operator.ixor(self.graph_view[y0:y1+1, x0:x1+1], sprite)
         self.graph_view[y0:y1+1, x0:x1+1] = rect
 
+    def _get_sprite(self, array_name):
+        """Unpack a sprite from an array buffer, unless the array is unchanged since last time."""
+        arrays = self._memory.arrays
+        try:
+            version, sprite = self._sprite_cache[array_name]
+        except KeyError:
+            pass
+        else:
+            if version == arrays.version(array_name):
+                return sprite
+        sprite = self._mode.sprite_builder.unpack(arrays.view_full_buffer(array_name))
+        self._sprite_cache[array_name] = arrays.version(array_name), sprite
+        return sprite
+
     def get_(self, args):
         """GET: Read a sprite from the screen."""
         if self._mode.is_text_mode:
@@ -1002,6 +953,28 @@ class Graphics(object):
 
     def _draw(self, gml):
         """Execute a Graphics Macro Language string."""
+        try:
+            ops = self._draw_cache[gml]
+        except KeyError:
+            # strings referring to variables (=var; or VARPTR$, also through X) can't be cached
+            if b'=' in gml or b'X' in gml.upper():
+                for op in self._parse_gml(gml):
+                    self._draw_op(*op)
+                return
+            ops = []
+            for op in self._parse_gml(gml):
+                ops.append(op)
+                self._draw_op(*op)
+            # only store the operations if the whole string parsed and executed correctly
+            if len(self._draw_cache) >= DRAW_CACHE_SIZE:
+                self._draw_cache.clear()
+            self._draw_cache[gml] = ops
+        else:
+            for op in ops:
+                self._draw_op(*op)
+
+    def _parse_gml(self, gml):
+        """Parse a Graphics Macro Language string, generating operations."""
         # don't convert to uppercase as VARPTR$ elements are case sensitive
         gmls = mlparser.MLParser(gml, self._memory, self._values)
         plot, goback = True, False
@@ -1019,49 +992,47 @@ class Graphics(object):
                 goback = True
             elif c == b'X':
                 # execute substring
-                sub = gmls.parse_string()
-                self._draw(sub)
+                yield b'X', gmls.parse_string()
             elif c == b'C':
                 # set foreground colour
                 # allow empty spec (default 0), but only if followed by a semicolon
                 if gmls.skip_blank() == b';':
-                    self._last_attr = 0
+                    yield b'C', 0
                 else:
                     attr = gmls.parse_number()
                     # 100000 seems to be GW's limit
                     error.range_check(-99999, 99999, attr)
-                    self._last_attr = attr
+                    yield b'C', attr
             elif c == b'S':
                 # set scale
                 scale = gmls.parse_number()
                 error.range_check(1, 255, scale)
-                self._draw_scale = scale
+                yield b'S', scale
             elif c == b'A':
                 # set angle
                 # allow empty spec (default 0), but only if followed by a semicolon
                 if gmls.skip_blank() == b';':
-                    self._draw_angle = 0
+                    yield b'A', 0
                 else:
                     angle = gmls.parse_number()
                     error.range_check(0, 3, angle)
-                    self._draw_angle = 90 * angle
+                    yield b'A', 90 * angle
             elif c == b'T':
                 # 'turn angle' - set (don't turn) the angle to any value
                 if gmls.read(1).upper() != b'A':
                     raise error.BASICError(error.IFC)
                 # allow empty spec (default 0), but only if followed by a semicolon
                 if gmls.skip_blank() == b';':
-                    self._draw_angle = 0
+                    yield b'A', 0
                 else:
                     angle = gmls.parse_number()
                     error.range_check(-360, 360, angle)
-                    self._draw_angle = angle
+                    yield b'A', angle
             # one-variable movement commands:
             elif c in (b'U', b'D', b'L', b'R', b'E', b'F', b'G', b'H'):
                 step = gmls.parse_number(default=1)
                 # 100000 seems to be GW's limit
                 error.range_check(-99999, 99999, step)
-                x0, y0 = self._last_point
                 x1, y1 = 0, 0
                 if c in (b'U', b'E', b'H'):
                     y1 -= step
@@ -1071,7 +1042,7 @@ class Graphics(object):
                     x1 -= step
                 elif c in (b'R', b'E', b'F'):
                     x1 += step
-                self._draw_step(x0, y0, x1, y1, plot, goback)
+                yield b'+', x1, y1, plot, goback
                 plot = True
                 goback = False
             # two-variable movement command
@@ -1085,15 +1056,7 @@ class Graphics(object):
                     gmls.read(1)
                 y = gmls.parse_number()
                 error.range_check(-9999, 9999, y)
-                x0, y0 = self._last_point
-                if relative:
-                    self._draw_step(x0, y0, x, y, plot, goback)
-                else:
-                    if plot:
-                        self._draw_line(x0, y0, x, y, self._last_attr)
-                    self._last_point = x, y
-                    if goback:
-                        self._last_point = x0, y0
+                yield b'+' if relative else b'M', x, y, plot, goback
                 plot = True
                 goback = False
             elif c == b'P':
@@ -1104,11 +1067,38 @@ class Graphics(object):
                     raise error.BASICError(error.IFC)
                 bound = gmls.parse_number()
                 error.range_check(0, 9999, bound)
-                x, y = self._get_window_logical(*self._last_point)
-                self._flood_fill((x, y, False), colour, None, bound, None)
+                yield b'P', colour, bound
             else:
                 raise error.BASICError(error.IFC)
 
+    def _draw_op(self, command, *args):
+        """Execute a parsed Graphics Macro Language operation."""
+        if command == b'+':
+            # relative movement
+            x0, y0 = self._last_point
+            self._draw_step(x0, y0, *args)
+        elif command == b'M':
+            # absolute movement
+            x, y, plot, goback = args
+            x0, y0 = self._last_point
+            if plot:
+                self._draw_line(x0, y0, x, y, self._last_attr)
+            self._last_point = x, y
+            if goback:
+                self._last_point = x0, y0
+        elif command == b'C':
+            self._last_attr, = args
+        elif command == b'S':
+            self._draw_scale, = args
+        elif command == b'A':
+            self._draw_angle, = args
+        elif command == b'X':
+            self._draw(*args)
+        elif command == b'P':
+            colour, bound = args
+            x, y = self._get_window_logical(*self._last_point)
+            self._flood_fill((x, y, False), colour, None, bound, None)
+
     def _draw_step(self, x0, y0, sx, sy, plot, goback):
         """Make a DRAW step, drawing a line and returning if requested."""
         scale = self._draw_scale
@@ -1203,6 +1193,96 @@ class Graphics(object):
 
 
 
+###############################################################################
+# run-length rasteriser for LINE
+
+# expanded line styles: runs of set bits in the 16-bit pattern
+_PATTERN_CACHE = {}
+
+def _pattern_segments(pattern):
+    """Expand a 16-bit line style into (start, stop) runs of set bits; None if solid."""
+    pattern &= 0xffff
+    if pattern == 0xffff:
+        return None
+    try:
+        return _PATTERN_CACHE[pattern]
+    except KeyError:
+        pass
+    segments = []
+    start = None
+    for phase in range(17):
+        bit = phase < 16 and (pattern & (0x8000 >> phase))
+        if bit and start is None:
+            start = phase
+        elif not bit and start is not None:
+            segments.append((start, phase))
+            start = None
+    _PATTERN_CACHE[pattern] = segments
+    return segments
+
+def _pattern_runs(start, step, length, phase, segments):
+    """
+    Split a run of pixels starting at pattern phase into the stretches where the pattern is set.
+    Yields inclusive (low, high) coordinates along the run.
+    """
+    if segments is None:
+        end = start + step * (length-1)
+        yield min(start, end), max(start, end)
+        return
+    i = 0
+    while i < length:
+        # index of the start of the current pattern period
+        base = i - (phase + i) % 16
+        for seg_start, seg_stop in segments:
+            j0, j1 = max(i, base + seg_start), min(length, base + seg_stop)
+            if j0 < j1:
+                low, high = start + step*j0, start + step*(j1-1)
+                yield min(low, high), max(low, high)
+        i = base + 16
+
+def _line_runs(x0, y0, x1, y1, segments):
+    """Get the pixel runs for a Bresenham line, as inclusive rectangles."""
+    dx, dy = abs(x1-x0), abs(y1-y0)
+    steep = dy > dx
+    if steep:
+        x0, y0, x1, y1 = y0, x0, y1, x1
+        dx, dy = dy, dx
+    sx = 1 if x1 > x0 else -1
+    sy = 1 if y1 > y0 else -1
+    rects = []
+    length = dx + 1
+    line_error = dx // 2
+    # position along the line, major and minor coordinates
+    i, x, y = 0, x0, y0
+    while i < length:
+        # number of pixels until the error changes sign and the minor coordinate steps
+        run = min(length - i, line_error // dy + 1 if dy else length)
+        for low, high in _pattern_runs(x, sx, run, i, segments):
+            if steep:
+                rects.append((y, low, y, high))
+            else:
+                rects.append((low, y, high, y))
+        i += run
+        x += sx * run
+        y += sy
+        line_error += dx - dy * run
+    return rects
+
+def _straight_runs(rects, x0, y0, x1, y1, segments, phase):
+    """Append the runs for a horizontal or vertical line; return the pattern phase at its end."""
+    if x0 == x1:
+        length = abs(y1 - y0) + 1
+        step = 1 if y1 > y0 else -1
+        for low, high in _pattern_runs(y0, step, length, phase, segments):
+            rects.append((x0, low, x0, high))
+    else:
+        length = abs(x1 - x0) + 1
+        step = 1 if x1 > x0 else -1
+        for low, high in _pattern_runs(x0, step, length, phase, segments):
+            rects.append((low, y0, high, y0))
+    return (phase + length) % 16
+
+
 ###############################################################################
 # octant logic for CIRCLE
 
@@ -1225,6 +1305,120 @@ def _get_octant(f, rx, ry):
         coord = abs(int(round(rx * math.cos(f))))
     return octant, coord, neg
 
+# cached midpoint offsets per radius; bounded to keep memory use in check
+_CIRCLE_CACHE_SIZE = 64
+_CIRCLE_CACHE = {}
+
+def _circle_offsets(r):
+    """Get the first-octant midpoint offsets for a circle, with their positions along the arc."""
+    try:
+        return _CIRCLE_CACHE[r]
+    except KeyError:
+        pass
+    offsets = []
+    x, y = r, 0
+    bres_error = 1-r
+    while x >= y:
+        offsets.append((x, y))
+        # bresenham error step
+        y += 1
+        if bres_error < 0:
+            bres_error += 2*y+1
+        else:
+            x -= 1
+            bres_error += 2*(y-x+1)
+    # the running coordinate y increases by one at each step
+    keys = [_y for _, _y in offsets]
+    if len(_CIRCLE_CACHE) >= _CIRCLE_CACHE_SIZE:
+        _CIRCLE_CACHE.clear()
+    _CIRCLE_CACHE[r] = offsets, keys
+    return offsets, keys
+
+def _ellipse_offsets(rx, ry):
+    """Get the first-quadrant midpoint offsets for an ellipse, their positions and the tip."""
+    try:
+        return _CIRCLE_CACHE[rx, ry]
+    except KeyError:
+        pass
+    offsets = []
+    # error increment
+    dx = 16 * (1-2*rx) * ry * ry
+    dy = 16 * rx * rx
+    ddy = 32 * rx * rx
+    ddx = 32 * ry * ry
+    # error for first step
+    err = dx + dy
+    x, y = rx, 0
+    while True:
+        offsets.append((x, y))
+        # bresenham error step
+        e2 = 2 * err
+        if (e2 <= dy):
+            y += 1
+            dy += ddy
+            err += dy
+        if (e2 >= dx or e2 > dy):
+            x -= 1
+            dx += ddx
+            err += dx
+        # NOTE - err changes sign at the change from y increase to x increase
+        if (x < 0):
+            break
+    # each step increases y or decreases x, so positions along the arc are strictly increasing
+    keys = [(_y, -_x) for _x, _y in offsets]
+    tip = list(range(y, ry))
+    if len(_CIRCLE_CACHE) >= _CIRCLE_CACHE_SIZE:
+        _CIRCLE_CACHE.clear()
+    _CIRCLE_CACHE[rx, ry] = offsets, keys, tip
+    return offsets, keys, tip
+
+def _arc_ranges(sector, sec0, key0, sec1, key1, keys):
+    """
+    Get the index ranges of the offsets visible in a given octant or quadrant.
+    Odd sectors run against the direction of the offsets.
+    """
+    count = len(keys)
+    if sector not in (sec0, sec1):
+        return [(0, count)]
+    odd = sector % 2
+    if sector == sec0:
+        # hide points before the start
+        if odd:
+            after_start = (0, bisect.bisect_right(keys, key0))
+        else:
+            after_start = (bisect.bisect_left(keys, key0), count)
+        if sec0 != sec1:
+            return [after_start]
+    # hide points after the stop
+    if odd:
+        before_stop = (bisect.bisect_left(keys, key1), count)
+    else:
+        before_stop = (0, bisect.bisect_right(keys, key1))
+    if sec0 != sec1:
+        return [before_stop]
+    if (key1 <= key0) if odd else (key1 >= key0):
+        # start before stop: show points in between
+        return [(max(after_start[0], before_stop[0]), min(after_start[1], before_stop[1]))]
+    # stop before start: show points outside
+    return [after_start, before_stop]
+
+def _row_runs(points):
+    """Group points by row and merge them into horizontal runs, as inclusive rectangles."""
+    rows = {}
+    for x, y in points:
+        rows.setdefault(y, set()).add(x)
+    rects = []
+    for y, xs in rows.items():
+        xs = sorted(xs)
+        start = prev = xs[0]
+        for x in xs[1:]:
+            if x != prev + 1:
+                rects.append((start, y, prev, y))
+                start = x
+            prev = x
+        rects.append((start, y, prev, y))
+    return rects
+
 def _octant_coord(octant, x0, y0, x, y):
     """Return symmetrically reflected coordinates for a given pair."""
     if octant == 7:
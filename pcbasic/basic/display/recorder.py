@@ -0,0 +1,242 @@
+"""
+PC-BASIC - display.recorder
+Screen capture to PNG and animated PNG
+
+(c) 2020 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+import io
+import time
+import zlib
+import struct
+import logging
+import threading
+
+from ...compat import queue, text_type
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# a palette image can hold this many colours
+MAX_COLOURS = 256
+
+
+def png_chunk(chunk_type, data):
+    """Build a PNG chunk with length and checksum."""
+    return b''.join((
+        struct.pack('>I', len(data)), chunk_type, data,
+        struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff)
+    ))
+
+
+def _png_header(width, height):
+    """Build the header chunk for an 8-bit palette image."""
+    return png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0))
+
+
+def _png_palette(rgb_list):
+    """Build the palette chunk."""
+    return png_chunk(b'PLTE', b''.join(struct.pack('>BBB', *_rgb) for _rgb in rgb_list))
+
+
+def _compress_rows(data, left, top, right, bottom, pitch):
+    """Compress an area of an 8-bit image, with inclusive bounds, as PNG image data."""
+    # each scanline starts with filter type 0, no filter
+    return zlib.compress(b''.join(
+        b'\0' + data[_offset+left : _offset+right+1]
+        for _offset in range(top*pitch, (bottom+1)*pitch, pitch)
+    ))
+
+
+def encode_png(height, width, pixels, rgb_table):
+    """Encode attribute pixels (bytes, row-major) as a PNG image, using an RGB per attribute."""
+    palette = _Palette()
+    data = palette.translate(pixels, rgb_table)
+    return b''.join((
+        PNG_SIGNATURE,
+        _png_header(width, height),
+        _png_palette(palette.colours),
+        png_chunk(b'IDAT', _compress_rows(data, 0, 0, width-1, height-1, width)),
+        png_chunk(b'IEND', b''),
+    ))
+
+
+def _common_length(old, new, step):
+    """Length of the common prefix (step 1) or suffix (step -1) of two equal-length rows."""
+    if step < 0:
+        old, new = old[::-1], new[::-1]
+    # binary search on slice comparisons, which are much faster than comparing bytes in Python
+    low, high = 0, len(old)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old[:mid] == new[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _changed_area(old, new, width, height):
+    """Inclusive bounds (left, top, right, bottom) of pixels that differ, or None."""
+    rows = [
+        _y for _y in range(height)
+        if old[_y*width : (_y+1)*width] != new[_y*width : (_y+1)*width]
+    ]
+    if not rows:
+        return None
+    left, right = width, 0
+    for y in rows:
+        old_row, new_row = old[y*width : (y+1)*width], new[y*width : (y+1)*width]
+        left = min(left, _common_length(old_row, new_row, 1))
+        right = max(right, width - 1 - _common_length(old_row, new_row, -1))
+    return left, rows[0], right, rows[-1]
+
+
+def _fit(pixels, height, width, canvas_height, canvas_width):
+    """Crop or pad pixels to the size of the canvas."""
+    if (height, width) == (canvas_height, canvas_width):
+        return pixels
+    rows = [pixels[_offset : _offset+width] for _offset in range(0, height*width, width)]
+    rows = [
+        _row[:canvas_width] + b'\0' * (canvas_width - len(_row))
+        for _row in rows[:canvas_height]
+    ]
+    rows += [b'\0' * canvas_width] * (canvas_height - len(rows))
+    return b''.join(rows)
+
+
+class _Palette(object):
+    """Colours used in an image, gathered across palette changes."""
+
+    def __init__(self):
+        """Start with no colours."""
+        self.colours = []
+        self._index = {}
+
+    def translate(self, pixels, rgb_table):
+        """Convert attribute pixels to indices in the palette."""
+        table = bytearray(256)
+        for attr, (fore, _, _, _) in enumerate(rgb_table[:256]):
+            # blinking attributes are shown in their lit-up state
+            table[attr] = self._get_index(tuple(fore))
+        return pixels.translate(bytes(table))
+
+    def _get_index(self, rgb):
+        """Get the palette index of a colour, adding it if there's room."""
+        try:
+            return self._index[rgb]
+        except KeyError:
+            pass
+        if len(self.colours) < MAX_COLOURS:
+            self._index[rgb] = len(self.colours)
+            self.colours.append(rgb)
+        else:
+            # out of room: use the nearest colour we have
+            self._index[rgb] = min(
+                range(MAX_COLOURS),
+                key=lambda _i: sum((_a-_b)**2 for _a, _b in zip(self.colours[_i], rgb))
+            )
+        return self._index[rgb]
+
+
+class ScreenRecorder(object):
+    """Record the visible page to an animated PNG; encoding runs in a background thread."""
+
+    def __init__(self, display, file_name_or_object, frame_rate=10):
+        """Start recording."""
+        self._display = display
+        self._interval = 1. / frame_rate
+        self._next_capture = 0.
+        # generation and palette at the last capture
+        self._last = None
+        if isinstance(file_name_or_object, (bytes, text_type)):
+            self._stream = io.open(file_name_or_object, 'wb')
+            self._close_stream = True
+        else:
+            self._stream = file_name_or_object
+            self._close_stream = False
+        # captured frames to encode, with a snapshot of None to finish
+        self._frames = queue.Queue()
+        self._thread = threading.Thread(target=self._encode_frames)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def flush(self):
+        """Capture the screen if it changed and a frame interval has passed."""
+        now = time.time()
+        if now < self._next_capture:
+            return
+        self._next_capture = now + self._interval
+        generation = self._display.get_generation()
+        rgb_table = self._display.get_rgb_table()
+        if self._last == (generation, rgb_table):
+            return
+        self._last = generation, rgb_table
+        self._frames.put((now, self._display.get_pixel_snapshot(), rgb_table))
+
+    def close(self):
+        """Capture the last frame, finish encoding and write the recording."""
+        self._next_capture = 0.
+        self.flush()
+        self._frames.put((time.time(), None, None))
+        self._thread.join()
+
+    def _encode_frames(self):
+        """Encode frames as they come in; write the file at the end."""
+        palette = _Palette()
+        # changed area, compressed image data and start time of each frame
+        frames = []
+        canvas, height, width = None, 0, 0
+        while True:
+            timestamp, snapshot, rgb_table = self._frames.get()
+            if snapshot is None:
+                break
+            if canvas is None:
+                height, width = snapshot.height, snapshot.width
+            pixels = _fit(
+                palette.translate(snapshot.pixels.tobytes(), rgb_table),
+                snapshot.height, snapshot.width, height, width
+            )
+            if canvas is None:
+                area = 0, 0, width-1, height-1
+            else:
+                area = _changed_area(canvas, pixels, width, height)
+            # if nothing changed in appearance, the previous frame is shown for longer
+            if area is not None:
+                canvas = pixels
+                frames.append((area, _compress_rows(pixels, *(area + (width,))), timestamp))
+        try:
+            self._write(frames, timestamp, palette, height, width)
+        except EnvironmentError as e:
+            logging.error('Could not write screen recording: %s', e)
+        finally:
+            if self._close_stream:
+                self._stream.close()
+
+    def _write(self, frames, end_time, palette, height, width):
+        """Write the recorded frames as an animated PNG."""
+        if not frames:
+            return
+        write = self._stream.write
+        write(PNG_SIGNATURE)
+        write(_png_header(width, height))
+        # number of frames, loop forever
+        write(png_chunk(b'acTL', struct.pack('>II', len(frames), 0)))
+        write(_png_palette(palette.colours))
+        sequence = 0
+        stop_times = [_frame[2] for _frame in frames[1:]] + [end_time]
+        for i, (frame, stop) in enumerate(zip(frames, stop_times)):
+            (left, top, right, bottom), data, start = frame
+            # frame control: area, delay in ms, keep previous frame, overwrite area
+            write(png_chunk(b'fcTL', struct.pack(
+                '>IIIIIHHBB', sequence, right-left+1, bottom-top+1, left, top,
+                min(0xffff, int((stop - start) * 1000)), 1000, 0, 0
+            )))
+            sequence += 1
+            if i == 0:
+                write(png_chunk(b'IDAT', data))
+            else:
+                write(png_chunk(b'fdAT', struct.pack('>I', sequence) + data))
+                sequence += 1
+        write(png_chunk(b'IEND', b''))
@@ -85,11 +85,19 @@ class EventQueues(object):
     max_video_qsize = 500
     max_audio_qsize = 20
 
-    def __init__(self, values, ctrl_c_is_break, inputs=None, video=None, audio=None):
+    def __init__(
+            self, values, ctrl_c_is_break, frame_rate=60, inputs=None, video=None, audio=None
+        ):
         """Initialise; default is NullQueues."""
         self._values = values
         # input signal handlers
         self._handlers = []
+        # output handlers to flush once per frame
+        self._frame_handlers = []
+        self._frame_interval = 1. / frame_rate if frame_rate else 0.
+        self._next_frame = 0.
+        # if not frame paced, output is sent on as soon as it is produced
+        self.frame_paced = bool(frame_rate)
         # pause-key halts everything until another keypress
         self._pause = False
         # treat ctrl+c as break interrupt
@@ -121,8 +129,27 @@ class EventQueues(object):
         """Add an input handler."""
         self._handlers.append(handler)
 
+    def set_frame_paced(self, frame_paced):
+        """Collect output per frame, if a frame rate is set; otherwise send it immediately."""
+        self.frame_paced = frame_paced and bool(self._frame_interval)
+
+    def add_frame_handler(self, handler):
+        """Add an output handler to be flushed once per frame and when waiting."""
+        self._frame_handlers.append(handler)
+
+    def remove_frame_handler(self, handler):
+        """Remove an output handler."""
+        self._frame_handlers.remove(handler)
+
+    def flush(self):
+        """Flush output handlers and start a new frame."""
+        self._next_frame = time.time() + self._frame_interval
+        for handler in self._frame_handlers:
+            handler.flush()
+
     def wait(self):
         """Wait and check events."""
+        self.flush()
         time.sleep(self.tick)
         self.check_events()
 
@@ -132,6 +159,8 @@ class EventQueues(object):
         # i.e. 100 goto 100 with event traps active)
         # it does slow the interpreter down by about 20% in FOR loops
         time.sleep(0)
+        if time.time() >= self._next_frame:
+            self.flush()
         self._check_input(event_check_input)
 
     def _check_input(self, event_check_input):
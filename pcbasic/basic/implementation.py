@@ -62,7 +62,7 @@ class Implementation(object):
             peek_values=None, allow_code_poke=False, rebuild_offsets=True,
             max_memory=65534, reserved_memory=3429, video_memory=262144,
             serial_buffer_size=128, max_reclen=128, max_files=3,
-            extension=()
+            extension=(), frame_rate=60, audio_file=None
         ):
         """Initialise the interpreter session."""
         ######################################################################
@@ -111,14 +111,14 @@ class Implementation(object):
         # set up input event handler
         # no interface yet; use dummy queues
         self.queues = eventcycle.EventQueues(
-            self.values, ctrl_c_is_break, inputs=queue.Queue()
+            self.values, ctrl_c_is_break, frame_rate, inputs=queue.Queue()
         )
         # prepare I/O streams
         self.io_streams = iostreams.IOStreams(
             self.queues, self.codepage, input_streams, output_streams,
         )
         # initialise sound queue
-        self.sound = sound.Sound(self.queues, self.values, self.memory, syntax)
+        self.sound = sound.Sound(self.queues, self.values, self.memory, syntax, audio_file)
         # initialise video
         self.display = display.Display(
             self.queues, self.values, self.queues,
@@ -183,6 +183,8 @@ class Implementation(object):
         self.queues.add_handler(self.keyboard)
         self.queues.add_handler(self.pen)
         self.queues.add_handler(self.stick)
+        # screen updates are sent to the interface once per frame
+        self.queues.add_frame_handler(self.display)
         # set up BASIC event handlers
         self.basic_events = basicevents.BasicEvents(
             self.values, self.sound, self.clock, self.files, self.program, num_fn_keys
@@ -236,6 +238,12 @@ class Implementation(object):
         """Attach interface to interpreter session."""
         if interface:
             self.queues.set(*interface.get_queues())
+            # text interfaces have no use for rendered text pixels
+            self.display.set_text_only(interface.is_text_only())
+            # the command-line interface needs its updates in order of output
+            self.queues.set_frame_paced(interface.is_frame_paced())
+            # graphical interfaces can take pixels from a shared frame
+            self.display.set_shared_frame(interface.is_frame_shared())
             # rebuild the screen
             self.display.rebuild()
             # rebuild audio queues
@@ -244,6 +252,9 @@ class Implementation(object):
             # use dummy video & audio queues if not provided
             # but an input queue should be operational for I/O streams
             self.queues.set(inputs=queue.Queue())
+            # nothing is shown, so render pixels only if they are asked for
+            self.display.set_text_only(True)
+            self.display.set_shared_frame(False)
 
     def execute(self, command):
         """Execute a BASIC statement."""
@@ -328,6 +339,8 @@ class Implementation(object):
         self.files.close_devices()
         # kill the iostreams threads so windows doesn't run out
         self.io_streams.close()
+        # finish rendering sound to file
+        self.sound.close()
 
     def _show_prompt(self):
         """Show the Ok or EDIT prompt, unless suppressed."""
@@ -410,6 +423,9 @@ class Implementation(object):
             self._prompt = True
         except error.Exit:
             raise
+        finally:
+            # show everything that has been output
+            self.queues.flush()
 
     def _handle_error(self, e):
         """Handle a BASIC error through error message."""
@@ -8,8 +8,9 @@ This file is released under the GNU GPL version 3 or later.
 
 import struct
 import logging
+from itertools import chain
 
-from ..compat import iteritems, int2byte
+from ..compat import iteritems, int2byte, xrange
 
 from .data import NAME, VERSION, COPYRIGHT
 from .base import error
@@ -308,7 +309,7 @@ class Memory(object):
         # initial DEF SEG
         self.segment = self._memory.data_segment
         # pre-defined PEEK outputs
-        self._peek_values = peek_values
+        self._peek_values = peek_values or {}
         # tandy syntax
         self._syntax = syntax
 
@@ -449,29 +450,37 @@ class Memory(object):
         elif addr >= 0:
             self._set_low_memory(addr, val)
 
+    def _split_video_block(self, addr, length):
+        """Split a block into its video memory range and the addresses outside it."""
+        video_start = self.video_segment * 0x10
+        # video memory runs up to the ram font segment
+        start = max(addr, video_start)
+        stop = min(addr + length, video_start + 0x20000)
+        if start >= stop:
+            return None, xrange(addr, addr + length)
+        return (start, stop), chain(xrange(addr, start), xrange(stop, addr + length))
+
     def _get_memory_block(self, addr, length):
         """Retrieve a contiguous block of bytes from memory."""
-        block = bytearray()
-        if addr >= self.video_segment*0x10:
-            video_len = 0x20000 - (addr - self.video_segment*0x10)
+        block = bytearray(length)
+        video_range, others = self._split_video_block(addr, length)
+        if video_range:
             # graphics and text memory - specialised call
-            block += self._get_video_memory_block(addr, min(length, video_len))
-            addr += video_len
-            length -= video_len
-        for a in range(addr, addr+length):
-            block.append(max(0, self._get_memory(a)))
+            start, stop = video_range
+            block[start-addr:stop-addr] = self._get_video_memory_block(start, stop - start)
+        for a in others:
+            block[a-addr] = max(0, self._get_memory(a))
         return block
 
     def _set_memory_block(self, addr, buf):
         """Set a contiguous block of bytes in memory."""
-        if addr >= self.video_segment*0x10:
-            video_len = 0x20000 - (addr - self.video_segment*0x10)
+        video_range, others = self._split_video_block(addr, len(buf))
+        if video_range:
             # graphics and text memory - specialised call
-            self._set_video_memory_block(addr, buf[:video_len])
-            addr += video_len
-            buf = buf[video_len:]
-        for a in range(len(buf)):
-            self._set_memory(addr + a, buf[a])
+            start, stop = video_range
+            self._set_video_memory_block(start, buf[start-addr:stop-addr])
+        for a in others:
+            self._set_memory(a, buf[a-addr])
 
 
     ###############################################################
@@ -483,7 +492,7 @@ class Memory(object):
 
     def _set_video_memory(self, addr, val):
         """Set a byte in video memory."""
-        return self._display.mode.memorymap.set_memory(self._display, addr, [val])
+        return self._display.mode.memorymap.set_memory(self._display, addr, bytearray((val,)))
 
     def _get_video_memory_block(self, addr, length):
         """Retrieve a contiguous block of bytes from video memory."""
@@ -22,6 +22,9 @@ class Arrays(object):
         """Initialise arrays."""
         self._memory = memory
         self._values = values
+        # write counter, used to track changes to array buffers
+        # not reset on clear so that versions stay unique
+        self._writes = 0
         self.clear()
         # OPTION BASE is unset
         self._base = None
@@ -46,6 +49,7 @@ class Arrays(object):
         self._dims = {}
         self._buffers = {}
         self._array_memory = {}
+        self._versions = {}
         self.current = 0
 
     def erase_(self, args):
@@ -63,6 +67,7 @@ class Arrays(object):
             del self._dims[name]
             del self._buffers[name]
             del self._array_memory[name]
+            del self._versions[name]
             # update memory model
             for name in self._array_memory:
                 name_ptr, array_ptr = self._array_memory[name]
@@ -94,8 +99,19 @@ class Arrays(object):
 
     def view_full_buffer(self, name):
         """Return a memoryview to a full array."""
+        # the caller may write to the buffer
+        self._touch(name)
         return memoryview(self._buffers[name])
 
+    def version(self, name):
+        """Return a number that changes whenever the array buffer may have been changed."""
+        return self._versions[name]
+
+    def _touch(self, name):
+        """Mark the array buffer as changed."""
+        self._writes += 1
+        self._versions[name] = self._writes
+
     def dimensions(self, name):
         """Return the dimensions of an array."""
         return self._dims[name]
@@ -148,6 +164,7 @@ class Arrays(object):
         self._array_memory[name] = (name_ptr, array_ptr)
         self._buffers[name] = bytearray(array_bytes)
         self._dims[name] = dimensions
+        self._touch(name)
 
     def check_dim(self, name, index):
         """
@@ -187,6 +204,13 @@ class Arrays(object):
 
     def view_buffer(self, name, index):
         """Return a memoryview to an array element."""
+        view = self._view_element(name, index)
+        # the caller may write to the element
+        self._touch(name)
+        return view
+
+    def _view_element(self, name, index):
+        """Return a memoryview to an array element, without marking it as changed."""
         dimensions, lst = self.check_dim(name, index)
         bigindex = self.index(index, dimensions)
         bytesize = values.size_bytes(name)
@@ -196,7 +220,7 @@ class Arrays(object):
         """Retrieve a view of the value of an array element."""
         # do not make a copy - we may end up with stale string pointers
         # due to garbage collection
-        return self._values.create(self.view_buffer(name, index))
+        return self._values.create(self._view_element(name, index))
 
     def set(self, name, index, value):
         """Assign a value to an array element."""
@@ -204,7 +228,6 @@ class Arrays(object):
             self._memory.strings.fix_temporaries()
         # copy value into array
         self.view_buffer(name, index)[:] = values.to_type(name[-1:], value).to_bytes()
-        # drop cache here
 
     def varptr(self, name, indices):
         """Retrieve the address of an array."""
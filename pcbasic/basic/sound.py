@@ -7,14 +7,15 @@ This file is released under the GNU GPL version 3 or later.
 """
 
 from collections import deque
-import datetime
+import copy
 
-from ..compat import iterchar, zip
+from ..compat import iterchar, zip, monotonic
 from .base import error
 from .base import signals
 from .base import tokens as tk
 from .base.tokens import DIGITS
 from . import mlparser
+from . import soundfile
 from . import values
 
 
@@ -43,17 +44,30 @@ NOTES = {
 # in BASIC, 1/44 = 0.02272727248 which is '\x8c\x2e\x3a\x7b'
 LOOP_THRESHOLD = 0.02272727248
 
+# maximum number of parsed PLAY strings to keep
+PLAY_CACHE_SIZE = 256
+
 # length of a clock tick ("PIT tick", see Joel Yliluoma's noise.bas)
 TICK_LENGTH = 0x1234DC / 65536.
 
+# simulated time in seconds taken by polling the sound queue when rendering to a file
+POLL_TIME = 0.006
+
 
 class Sound(object):
     """Sound queue manipulations."""
 
-    def __init__(self, queues, values, memory, syntax):
+    def __init__(self, queues, values, memory, syntax, audio_file=None):
         """Initialise sound queue."""
         # for wait() and queues
         self._queues = queues
+        # render to a file in simulated time, or play in real time through the interface
+        if audio_file:
+            self._clock = VirtualClock()
+            self._renderer = soundfile.WaveRenderer(audio_file, self._clock)
+        else:
+            self._clock = WallClock()
+            self._renderer = None
         self._values = values
         self._memory = memory
         # Tandy/PCjr noise generator
@@ -67,12 +81,24 @@ class Sound(object):
         # pc-speaker on/off; (not implemented; not sure whether should be on)
         self._beep_on = True
         # timed queues for each voice (including gaps, for background counting & rebuilding)
-        self._voice_queue = [TimedQueue(), TimedQueue(), TimedQueue(), TimedQueue()]
+        self._voice_queue = [TimedQueue(self._clock) for _ in range(4)]
         self._foreground = True
         self._synch = False
+        # parsed PLAY strings, by string and starting state
+        self._play_cache = {}
         # initialise PLAY state
         self.reset_play()
 
+    def __getstate__(self):
+        """Pickle the sound state; rendering to file is not resumed."""
+        pickle_dict = self.__dict__.copy()
+        pickle_dict['_renderer'] = None
+        return pickle_dict
+
+    def __setstate__(self, pickle_dict):
+        """Unpickle the sound state."""
+        self.__dict__.update(pickle_dict)
+
     @property
     def multivoice(self):
         """We have multivoice capability."""
@@ -107,12 +133,12 @@ class Sound(object):
         if not (self._beep_on or self._sound_on):
             volume = 0
         tone = signals.Event(signals.AUDIO_TONE, (voice, frequency, fill*duration, loop, volume))
-        self._queues.audio.put(tone)
+        self._emit(tone)
         self._voice_queue[voice].put(tone, None if loop else fill*duration, True)
         # separate gap event, except for legato (fill==1)
         if fill != 1 and not loop:
             gap = signals.Event(signals.AUDIO_TONE, (voice, 0, (1-fill) * duration, 0, 0))
-            self._queues.audio.put(gap)
+            self._emit(gap)
             self._voice_queue[voice].put(gap, (1-fill) * duration, False)
         if voice == 2 and frequency != 0:
             # reset linked noise frequencies
@@ -127,7 +153,7 @@ class Sound(object):
         if not (self._beep_on or self._sound_on):
             volume = 0
         noise = signals.Event(signals.AUDIO_NOISE, (source > 3, frequency, duration, loop, volume))
-        self._queues.audio.put(noise)
+        self._emit(noise)
         self._voice_queue[3].put(noise, None if loop else duration, True)
 
     def sound_(self, args):
@@ -209,26 +235,43 @@ class Sound(object):
         """Wait until queue is shorter than or equal to given length."""
         # top of queue is the currently playing tone or gap
         while max(len(queue) for queue in self._voice_queue) > wait_length:
-            self._queues.wait()
+            self._clock.wait(self._queues, self._voice_queue)
+
+    def _emit(self, signal):
+        """Send an audio signal to the interface, or to the file renderer."""
+        if self._renderer:
+            self._renderer.put(signal)
+        else:
+            self._queues.audio.put(signal)
+
+    def close(self):
+        """Let queued sound play out and finish rendering, if rendering to a file."""
+        if self._renderer:
+            self._clock.advance_to(max(q.expiry() for q in self._voice_queue))
+            self._renderer.close()
+            self._renderer = None
 
     def stop_all_sound(self):
         """Terminate all sounds immediately."""
         for q in self._voice_queue:
             q.clear()
-        self._queues.audio.put(signals.Event(signals.AUDIO_STOP))
+        self._emit(signals.Event(signals.AUDIO_STOP))
 
     def persist(self, flag):
         """Set mixer persistence flag (runmode)."""
-        self._queues.audio.put(signals.Event(signals.AUDIO_PERSIST, (flag,)))
+        self._emit(signals.Event(signals.AUDIO_PERSIST, (flag,)))
 
     def rebuild(self):
         """Rebuild tone queues."""
+        if self._renderer:
+            # sound goes to the file, not to the interface
+            return
         # should we pop one at a time from each voice queue to equalise timings?
         for voice, q in enumerate(self._voice_queue):
             for item, duration in q.items():
                 item.params = list(item.params)
                 item.params[2] = duration
-                self._queues.audio.put(item)
+                self._emit(item)
 
     def play_fn_(self, args):
         """PLAY function: get length of music queue."""
@@ -237,8 +280,14 @@ class Sound(object):
         error.range_check(0, 255, voice)
         if not(self._multivoice and voice in (1, 2)):
             voice = 0
+        # in simulated time, polling loops must move time forward
+        self.poll()
         return self._values.new_integer().from_int(self._voice_queue[voice].tones_waiting())
 
+    def poll(self):
+        """Let time pass while the sound queue is polled, if in simulated time."""
+        self._clock.poll()
+
     def tones_waiting(self):
         """Return max number of tones waiting in queues."""
         return max(self._voice_queue[voice].tones_waiting() for voice in range(3))
@@ -249,12 +298,12 @@ class Sound(object):
         if self._multivoice:
             max_time = max(q.expiry() for q in self._voice_queue[:3])
             for voice, q in enumerate(self._voice_queue[:3]):
-                duration = (max_time - q.expiry()).total_seconds()
+                duration = max_time - q.expiry()
                 # fill up the queue with the necessary amount of silence
                 # this takes up one spot in the buffer and thus affects timings
                 # which is intentional
                 balloon = signals.Event(signals.AUDIO_TONE, (voice, 0, duration, False, 0))
-                self._queues.audio.put(balloon)
+                self._emit(balloon)
                 self._voice_queue[voice].put(balloon, duration, None)
         self._synch = False
 
@@ -280,124 +329,18 @@ class Sound(object):
         # this takes up one spot in the buffer and thus affects timings
         self._synch = True
         mml_list += [b''] * (3 - len(mml_list))
-        ml_parser_list = [mlparser.MLParser(mml, self._memory, self._values) for mml in mml_list]
-        next_oct = 0
+        op_iters = [self._get_mml_ops(_voice, _mml) for _voice, _mml in enumerate(mml_list)]
+        # voices take turns to execute a command
         voices = list(range(3))
         while True:
             if not voices:
                 break
             for voice in voices:
-                vstate = self._state[voice]
-                mmls = ml_parser_list[voice]
-                c = mmls.skip_blank_read().upper()
-                if c == b'':
+                op = next(op_iters[voice], None)
+                if op is None:
                     voices.remove(voice)
                     continue
-                elif c == b';':
-                    continue
-                elif c == b'X':
-                    # insert substring
-                    sub = mmls.parse_string()
-                    pos = mmls.tell()
-                    rest = mmls.read()
-                    mmls.seek(pos)
-                    mmls.truncate()
-                    mmls.write(sub)
-                    mmls.write(rest)
-                    mmls.seek(pos)
-                elif c == b'N':
-                    note = mmls.parse_number()
-                    error.range_check(0, 84, note)
-                    dur = vstate.length
-                    while mmls.skip_blank_read_if((b'.',)):
-                        dur *= 1.5
-                    if note == 0:
-                        # pause
-                        self.emit_tone(0, dur*vstate.tempo, 1, False, voice, vstate.volume)
-                    else:
-                        self.emit_tone(
-                                NOTE_FREQ[note-1], dur*vstate.tempo,
-                                vstate.fill, False, voice, vstate.volume)
-                elif c == b'L':
-                    recip = mmls.parse_number()
-                    error.range_check(1, 64, recip)
-                    vstate.length = 1. / recip
-                elif c == b'T':
-                    recip = mmls.parse_number()
-                    error.range_check(32, 255, recip)
-                    vstate.tempo = 240. / recip
-                elif c == b'O':
-                    octave = mmls.parse_number()
-                    error.range_check(0, 6, octave)
-                    vstate.octave = octave
-                elif c == b'>':
-                    vstate.octave += 1
-                    if vstate.octave > 6:
-                        vstate.octave = 6
-                elif c == b'<':
-                    vstate.octave -= 1
-                    if vstate.octave < 0:
-                        vstate.octave = 0
-                elif c in (b'A', b'B', b'C', b'D', b'E', b'F', b'G', b'P'):
-                    note = c
-                    dur = vstate.length
-                    length = None
-                    if mmls.skip_blank_read_if((b'#', b'+')):
-                        note += b'#'
-                    elif mmls.skip_blank_read_if((b'-',)):
-                        note += b'-'
-                    c = mmls.skip_blank_read_if(DIGITS)
-                    if c is not None:
-                        numstr = [c]
-                        while mmls.skip_blank() in set(iterchar(DIGITS)):
-                            numstr.append(mmls.read(1))
-                        # NOT ml_parse_number, only literals allowed here!
-                        length = int(b''.join(numstr))
-                        error.range_check(0, 64, length)
-                        if length > 0:
-                            dur = 1. / float(length)
-                    while mmls.skip_blank_read_if((b'.',)):
-                        error.throw_if(note == b'P' and length == 0)
-                        dur *= 1.5
-                    if note == b'P':
-                        # length must be specified
-                        if length is None:
-                            raise error.BASICError(error.IFC)
-                        # don't do anything for length 0
-                        elif length > 0:
-                            self.emit_tone(0, dur * vstate.tempo, 1, False, voice, vstate.volume)
-                    else:
-                        # use default length for length 0
-                        try:
-                            self.emit_tone(
-                                NOTE_FREQ[(vstate.octave + next_oct) * 12 + NOTES[note]],
-                                dur * vstate.tempo, vstate.fill, False, voice, vstate.volume)
-                        except KeyError:
-                            raise error.BASICError(error.IFC)
-                    next_oct = 0
-                elif c == b'M':
-                    c = mmls.skip_blank_read().upper()
-                    if c == b'N':
-                        vstate.fill = 7./8.
-                    elif c == b'L':
-                        vstate.fill = 1.
-                    elif c == b'S':
-                        vstate.fill = 3./4.
-                    elif c == b'F':
-                        self._foreground = True
-                    elif c == b'B':
-                        self._foreground = False
-                    else:
-                        raise error.BASICError(error.IFC)
-                elif c == b'V' and self._multivoice and self._sound_on:
-                    vol = mmls.parse_number()
-                    error.range_check(-1, 15, vol)
-                    if vol == -1:
-                        vstate.volume = 15
-                    else:
-                        vstate.volume = vol
-                else:
-                    raise error.BASICError(error.IFC)
+                self._play_op(voice, *op)
         self._synch = False
         if self._foreground:
             # wait until fully done on Tandy/PCjr, continue early on GW
@@ -405,6 +348,169 @@ class Sound(object):
         else:
             self._wait_background()
 
+    def _get_mml_ops(self, voice, mml):
+        """Get an iterator over the operations of a voice, from the cache if possible."""
+        # strings referring to variables (=var; or VARPTR$, also through X) can't be cached
+        if not mml or b'=' in mml or b'X' in mml.upper():
+            return self._parse_mml(voice, mml)
+        vstate = self._state[voice]
+        key = (
+            mml, vstate.octave, vstate.fill, vstate.tempo, vstate.length, vstate.volume,
+            self._multivoice and self._sound_on
+        )
+        try:
+            return iter(self._play_cache[key])
+        except KeyError:
+            return self._record_mml_ops(key, self._parse_mml(voice, mml))
+
+    def _record_mml_ops(self, key, op_iter):
+        """Pass on operations and store them in the cache once the whole string has parsed."""
+        ops = []
+        for op in op_iter:
+            ops.append(op)
+            yield op
+        if len(self._play_cache) >= PLAY_CACHE_SIZE:
+            self._play_cache.clear()
+        self._play_cache[key] = ops
+
+    def _parse_mml(self, voice, mml):
+        """Parse a Music Macro Language string, generating one operation per command."""
+        # keep track of state changes separately; they take effect when the operations execute
+        vstate = copy.copy(self._state[voice])
+        mmls = mlparser.MLParser(mml, self._memory, self._values)
+        while True:
+            c = mmls.skip_blank_read().upper()
+            if c == b'':
+                break
+            elif c == b';':
+                yield b';',
+            elif c == b'X':
+                # insert substring
+                sub = mmls.parse_string()
+                pos = mmls.tell()
+                rest = mmls.read()
+                mmls.seek(pos)
+                mmls.truncate()
+                mmls.write(sub)
+                mmls.write(rest)
+                mmls.seek(pos)
+                yield b';',
+            elif c == b'N':
+                note = mmls.parse_number()
+                error.range_check(0, 84, note)
+                dur = vstate.length
+                while mmls.skip_blank_read_if((b'.',)):
+                    dur *= 1.5
+                if note == 0:
+                    # pause
+                    yield b'N', 0, dur*vstate.tempo, 1, vstate.volume
+                else:
+                    yield b'N', NOTE_FREQ[note-1], dur*vstate.tempo, vstate.fill, vstate.volume
+            elif c == b'L':
+                recip = mmls.parse_number()
+                error.range_check(1, 64, recip)
+                vstate.length = 1. / recip
+                yield b'L', vstate.length
+            elif c == b'T':
+                recip = mmls.parse_number()
+                error.range_check(32, 255, recip)
+                vstate.tempo = 240. / recip
+                yield b'T', vstate.tempo
+            elif c == b'O':
+                octave = mmls.parse_number()
+                error.range_check(0, 6, octave)
+                vstate.octave = octave
+                yield b'O', vstate.octave
+            elif c == b'>':
+                vstate.octave = min(6, vstate.octave + 1)
+                yield b'O', vstate.octave
+            elif c == b'<':
+                vstate.octave = max(0, vstate.octave - 1)
+                yield b'O', vstate.octave
+            elif c in (b'A', b'B', b'C', b'D', b'E', b'F', b'G', b'P'):
+                note = c
+                dur = vstate.length
+                length = None
+                if mmls.skip_blank_read_if((b'#', b'+')):
+                    note += b'#'
+                elif mmls.skip_blank_read_if((b'-',)):
+                    note += b'-'
+                c = mmls.skip_blank_read_if(DIGITS)
+                if c is not None:
+                    numstr = [c]
+                    while mmls.skip_blank() in set(iterchar(DIGITS)):
+                        numstr.append(mmls.read(1))
+                    # NOT ml_parse_number, only literals allowed here!
+                    length = int(b''.join(numstr))
+                    error.range_check(0, 64, length)
+                    if length > 0:
+                        dur = 1. / float(length)
+                while mmls.skip_blank_read_if((b'.',)):
+                    error.throw_if(note == b'P' and length == 0)
+                    dur *= 1.5
+                if note == b'P':
+                    # length must be specified
+                    if length is None:
+                        raise error.BASICError(error.IFC)
+                    # don't do anything for length 0
+                    elif length > 0:
+                        yield b'N', 0, dur * vstate.tempo, 1, vstate.volume
+                    else:
+                        yield b';',
+                else:
+                    # use default length for length 0
+                    try:
+                        frequency = NOTE_FREQ[vstate.octave * 12 + NOTES[note]]
+                    except KeyError:
+                        raise error.BASICError(error.IFC)
+                    yield b'N', frequency, dur * vstate.tempo, vstate.fill, vstate.volume
+            elif c == b'M':
+                c = mmls.skip_blank_read().upper()
+                if c == b'N':
+                    vstate.fill = 7./8.
+                    yield b'M', vstate.fill
+                elif c == b'L':
+                    vstate.fill = 1.
+                    yield b'M', vstate.fill
+                elif c == b'S':
+                    vstate.fill = 3./4.
+                    yield b'M', vstate.fill
+                elif c == b'F':
+                    yield b'F', True
+                elif c == b'B':
+                    yield b'F', False
+                else:
+                    raise error.BASICError(error.IFC)
+            elif c == b'V' and self._multivoice and self._sound_on:
+                vol = mmls.parse_number()
+                error.range_check(-1, 15, vol)
+                if vol == -1:
+                    vstate.volume = 15
+                else:
+                    vstate.volume = vol
+                yield b'V', vstate.volume
+            else:
+                raise error.BASICError(error.IFC)
+
+    def _play_op(self, voice, command, *args):
+        """Execute a parsed Music Macro Language operation."""
+        vstate = self._state[voice]
+        if command == b'N':
+            frequency, duration, fill, volume = args
+            self.emit_tone(frequency, duration, fill, False, voice, volume)
+        elif command == b'L':
+            vstate.length, = args
+        elif command == b'T':
+            vstate.tempo, = args
+        elif command == b'O':
+            vstate.octave, = args
+        elif command == b'M':
+            vstate.fill, = args
+        elif command == b'V':
+            vstate.volume, = args
+        elif command == b'F':
+            self._foreground, = args
+
 
 class PlayState(object):
     """State variables of the PLAY command."""
@@ -419,15 +525,69 @@ class PlayState(object):
         self.volume = 15
 
 
+###############################################################################
+# clocks
+
+class WallClock(object):
+    """Real time, for playing sound through the interface."""
+
+    def now(self):
+        """Current time in seconds."""
+        return monotonic()
+
+    def wait(self, queues, voice_queues):
+        """Wait a tick while sound plays."""
+        queues.wait()
+
+    def poll(self):
+        """Sound queue is polled; time passes by itself."""
+
+
+class VirtualClock(object):
+    """Simulated time, for rendering sound faster than real time."""
+
+    def __init__(self):
+        """Start at zero, so that rendering is reproducible."""
+        self._now = 0.
+
+    def now(self):
+        """Current simulated time in seconds."""
+        return self._now
+
+    def advance_to(self, time):
+        """Move time forward."""
+        self._now = max(self._now, time)
+
+    def wait(self, queues, voice_queues):
+        """Skip ahead to when the next tone or gap ends."""
+        expiries = [_q.next_expiry() for _q in voice_queues]
+        expiries = [_e for _e in expiries if _e is not None]
+        if not expiries:
+            # only looping sound left, which does not end by itself
+            queues.wait()
+            return
+        self.advance_to(min(expiries))
+        # keep handling input, e.g. to allow a break
+        queues.check_events()
+
+    def poll(self):
+        """Sound queue is polled; let some time pass."""
+        self._now += POLL_TIME
+
+
 ###############################################################################
 # sound queue
 
 class TimedQueue(object):
     """Queue with expiring elements."""
 
-    def __init__(self):
+    def __init__(self, clock):
         """Initialise timed queue."""
+        self._clock = clock
+        # elements are (item, expiry, count_for_size)
         self._deque = deque()
+        # number of elements that count for size
+        self._count = 0
         # hack to reproduce queue lengths
         self._balloon_popped = False
 
@@ -435,23 +595,36 @@ class TimedQueue(object):
         """Get pickling dict for queue."""
         self._check_expired()
         return {
+            'clock': self._clock,
             'deque': self._deque,
-            'now': datetime.datetime.now()}
+            'now': self._clock.now()}
 
     def __setstate__(self, st):
         """Initialise queue from pickling dict."""
-        offset = datetime.datetime.now() - st['now']
-        self._deque = deque((item, expiry+offset, counts) for (item, expiry, counts) in st['deque'])
+        self._clock = st['clock']
+        self._balloon_popped = False
+        # clock readings do not carry over between processes
+        offset = self._clock.now() - st['now']
+        self._deque = deque(
+            (item, None if expiry is None else expiry+offset, counts)
+            for (item, expiry, counts) in st['deque']
+        )
+        self._count = sum(1 for _, _, counts in self._deque if counts)
 
     def _check_expired(self):
         """Drop expired items from queue."""
-        counts = 0
-        try:
-            while self._deque[0][1] <= datetime.datetime.now():
-                popped = self._deque.popleft()
-                self._balloon_popped = (popped[2] is None)
-        except (IndexError, TypeError):
-            pass
+        if not self._deque:
+            return
+        now = self._clock.now()
+        while self._deque:
+            expiry = self._deque[0][1]
+            # looping items do not expire
+            if expiry is None or expiry > now:
+                break
+            _, _, counts = self._deque.popleft()
+            if counts:
+                self._count -= 1
+            self._balloon_popped = (counts is None)
 
     def put(self, item, duration, count_for_size):
         """
@@ -460,21 +633,24 @@ class TimedQueue(object):
         """
         self._check_expired()
         # drop looping elements
-        try:
-            if self._deque[-1][1] is None:
-                self._deque.pop()
-        except IndexError:
-            pass
+        if self._deque and self._deque[-1][1] is None:
+            _, _, counts = self._deque.pop()
+            if counts:
+                self._count -= 1
         if duration is None:
             expiry = None
         else:
-            last = self._deque[-1][1] if self._deque else datetime.datetime.now()
-            expiry = max(last, datetime.datetime.now()) + datetime.timedelta(seconds=duration)
+            now = self._clock.now()
+            expiry = max(self._deque[-1][1], now) if self._deque else now
+            expiry += duration
         self._deque.append((item, expiry, count_for_size))
+        if count_for_size:
+            self._count += 1
 
     def clear(self):
         """Clear the queue."""
         self._deque.clear()
+        self._count = 0
 
     def __len__(self):
         """Number of elements in queue."""
@@ -485,7 +661,9 @@ class TimedQueue(object):
         """Number of tones (not gaps) waiting in queue."""
         self._check_expired()
         # count number of notes waiting, exclude the top of queue ("now playing")
-        waiting = len([item for i, item in enumerate(self._deque) if item[2] and i])
+        waiting = self._count
+        if self._deque and self._deque[0][2]:
+            waiting -= 1
         # hack: if the most recent item popped was a balloon
         # (i.e. we've just started a PLAY and the first note has not finished)
         # include the first note in the waiting queue length
@@ -496,20 +674,26 @@ class TimedQueue(object):
     def expiry(self):
         """Last expiry in queue, return now() for looping sound."""
         self._check_expired()
-        try:
-            return self._deque[-1][1] or datetime.datetime.now()
-        except IndexError:
-            return datetime.datetime.now()
+        if not self._deque or self._deque[-1][1] is None:
+            return self._clock.now()
+        return self._deque[-1][1]
+
+    def next_expiry(self):
+        """Expiry of the element at the top of the queue, None if empty or looping."""
+        self._check_expired()
+        if not self._deque:
+            return None
+        return self._deque[0][1]
 
     def items(self):
         """Iterate over each item and its duration."""
         self._check_expired()
-        last_expiry = datetime.datetime.now()
+        last_expiry = self._clock.now()
         for item, expiry, _ in self._deque:
             if expiry is None:
                 duration = None
             else:
                 # adjust duration
-                duration = (expiry - last_expiry).total_seconds()
+                duration = expiry - last_expiry
                 last_expiry = expiry
             yield item, duration
@@ -0,0 +1,79 @@
+"""
+PC-BASIC - soundfile.py
+Render sound to a WAV file in simulated time
+
+(c) 2020 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+import io
+import wave
+
+from ..compat import text_type
+from .base import signals
+
+
+# number of samples to mix at a time
+_MIX_LENGTH = 1024
+# WAV stores 8-bit samples as unsigned
+_TO_UNSIGNED = bytes(bytearray((_b + 0x80) & 0xff for _b in range(256)))
+
+
+class WaveRenderer(object):
+    """
+    Receive audio signals in place of the interface and render them to a WAV file.
+    Samples are rendered up to the time given by the clock whenever a signal comes in.
+    """
+
+    def __init__(self, file_name_or_object, clock):
+        """Start rendering."""
+        # import the interface package only when rendering; it loads all the plugin modules
+        from ..interface import synthesiser
+        from ..interface.mixer import Mixer
+        self._sample_rate = synthesiser.SAMPLE_RATE
+        self._clock = clock
+        self._start = clock.now()
+        # samples rendered so far
+        self._rendered = 0
+        self._mixer = Mixer(_MIX_LENGTH, _MIX_LENGTH)
+        if isinstance(file_name_or_object, (bytes, text_type)):
+            self._stream = io.open(file_name_or_object, 'wb')
+            self._close_stream = True
+        else:
+            self._stream = file_name_or_object
+            self._close_stream = False
+        self._wave = wave.open(self._stream, 'wb')
+        self._wave.setnchannels(1)
+        self._wave.setsampwidth(synthesiser.SAMPLE_BITS // 8)
+        self._wave.setframerate(self._sample_rate)
+
+    def put(self, signal):
+        """Handle an audio signal, as the audio queue would."""
+        # whatever played up to now is not affected by the signal
+        self.advance()
+        if signal.event_type == signals.AUDIO_STOP:
+            self._mixer.hush()
+            # there is no reading thread to drop the buffered samples, so do it now
+            self._mixer.skip()
+        elif signal.event_type == signals.AUDIO_TONE:
+            self._mixer.tone(*signal.params)
+        elif signal.event_type == signals.AUDIO_NOISE:
+            self._mixer.noise(*signal.params)
+
+    def advance(self):
+        """Render samples up to the current time."""
+        elapsed = self._clock.now() - self._start
+        count = int(elapsed * self._sample_rate) - self._rendered
+        while count > 0:
+            length = min(count, _MIX_LENGTH)
+            self._mixer.fill()
+            self._wave.writeframesraw(self._mixer.mix(length).translate(_TO_UNSIGNED))
+            self._rendered += length
+            count -= length
+
+    def close(self):
+        """Render up to the current time and finish the file."""
+        self.advance()
+        self._wave.close()
+        if self._close_stream:
+            self._stream.close()
@@ -21,7 +21,7 @@ if PY2:
     from .python2 import xrange, zip, iteritems, itervalues, iterkeys, iterbytes
     from .python2 import getcwdu, getenvu, setenvu, iterenvu
     from .python2 import configparser, queue, copyreg, which
-    from .python2 import SimpleNamespace, TemporaryDirectory
+    from .python2 import SimpleNamespace, TemporaryDirectory, monotonic
     unichr, int2byte, text_type = unichr, chr, unicode
 
     if WIN32:
@@ -36,7 +36,7 @@ else:
     from tempfile import TemporaryDirectory
     from .python3 import int2byte, add_str, iterchar, iterbytes
     from .python3 import xrange, zip, iteritems, itervalues, iterkeys
-    from .python3 import getcwdu, getenvu, setenvu, iterenvu
+    from .python3 import getcwdu, getenvu, setenvu, iterenvu, monotonic
     unichr, text_type = chr, str
     argv = sys.argv
 
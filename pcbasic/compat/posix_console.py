@@ -416,9 +416,9 @@ class PosixConsole(object):
     ##########################################################################
     # input
 
-    def key_pressed(self):
-        """Return whether a character is ready to be read from the keyboard."""
-        return select.select([sys.stdin], [], [], 0)[0] != []
+    def key_pressed(self, timeout=0):
+        """Wait up to timeout seconds for keyboard input; return whether a character is ready."""
+        return select.select([sys.stdin], [], [], timeout)[0] != []
 
     def read_key(self):
         """
@@ -20,6 +20,7 @@ import itertools
 import tempfile
 import sys
 import os
+import time
 
 import ConfigParser as configparser
 import Queue as queue
@@ -86,6 +87,13 @@ def itervalues(d, **kw):
 def iterkeys(d, **kw):
     return d.iterkeys(**kw)
 
+
+# time
+
+# there is no monotonic clock in the Python 2 standard library
+monotonic = time.time
+
+
 # utilities
 
 # from Python3.3 shutil module source
@@ -9,6 +9,7 @@ and released under an MIT licence https://opensource.org/licenses/MIT
 
 import sys
 import os
+import time
 import struct
 
 
@@ -53,3 +54,8 @@ def itervalues(d, **kw):
 
 def iterkeys(d, **kw):
     return iter(d.keys(**kw))
+
+
+# time
+
+monotonic = time.monotonic
@@ -173,6 +173,10 @@ _ReadConsoleInputW.argtypes = (
 _GetNumberOfConsoleInputEvents = windll.kernel32.GetNumberOfConsoleInputEvents
 _GetNumberOfConsoleInputEvents.argtypes = (wintypes.HANDLE, POINTER(wintypes.DWORD))
 
+_WaitForSingleObject = windll.kernel32.WaitForSingleObject
+_WaitForSingleObject.argtypes = (wintypes.HANDLE, wintypes.DWORD)
+_WaitForSingleObject.restype = wintypes.DWORD
+
 _GetConsoleScreenBufferInfo = windll.kernel32.GetConsoleScreenBufferInfo
 _GetConsoleScreenBufferInfo.argtypes = (wintypes.HANDLE, POINTER(CONSOLE_SCREEN_BUFFER_INFO))
 
@@ -438,8 +442,11 @@ class Win32Console(object):
         self._hstdout = self._save_stdout
         _SetConsoleActiveScreenBuffer(self._hstdout)
 
-    def key_pressed(self):
-        """key pressed on keyboard."""
+    def key_pressed(self, timeout=0):
+        """key pressed on keyboard; wait for input up to timeout seconds."""
+        if timeout and not msvcrt.kbhit():
+            # console input handle is signalled when input events are waiting
+            _WaitForSingleObject(self._hstdin, int(timeout * 1000))
         return msvcrt.kbhit()
 
     def set_caption(self, caption):
@@ -7,7 +7,6 @@ This file is released under the GNU GPL version 3 or later.
 """
 
 import sys
-from collections import deque
 
 
 if False:
@@ -18,11 +17,10 @@ if False:
 from ..basic.base import signals
 from .audio import AudioPlugin
 from .base import audio_plugins, InitFailed
+from .mixer import Mixer, CHUNK_LENGTH
 from . import synthesiser
 
 
-# one wavelength at 37 Hz is 1192 samples at 44100 Hz
-CHUNK_LENGTH = 1192 * 4
 # quit sound server after quiet period of QUIET_QUIT ticks
 # to avoid high-ish cpu load from the sound server.
 QUIET_QUIT = 10000
@@ -53,10 +51,9 @@ class AudioPygame(AudioPlugin):
         mixer.pre_init(
             synthesiser.SAMPLE_RATE, -16, channels=1, buffer=BUFSIZE
         )
-        # synthesisers
-        self.signal_sources = synthesiser.get_signal_sources()
-        # sound generators for each voice
-        self.generators = [deque(), deque(), deque(), deque()]
+        # sound generators for each voice, mixed into a single channel
+        # keep more than a chunk buffered on every busy voice, so that none runs dry while mixing
+        self._mixer = Mixer(CHUNK_LENGTH, CHUNK_LENGTH)
         # do not quit mixer if true
         self._persist = False
         # keep track of quiet time to shut down mixer after a while
@@ -74,63 +71,46 @@ class AudioPygame(AudioPlugin):
         """Allow or disallow mixer to quit."""
         self._persist = do_persist
 
+    @property
+    def busy(self):
+        """Something is playing."""
+        return self._mixer.busy
+
     def tone(self, voice, frequency, duration, loop, volume):
         """Enqueue a tone."""
-        self.generators[voice].append(synthesiser.SoundGenerator(
-            self.signal_sources[voice], synthesiser.FEEDBACK_TONE,
-            frequency, duration, loop, volume
-        ))
+        self._mixer.tone(voice, frequency, duration, loop, volume)
 
     def noise(self, source, frequency, duration, loop, volume):
         """Enqueue a noise."""
-        feedback = synthesiser.FEEDBACK_NOISE if source else synthesiser.FEEDBACK_PERIODIC
-        self.generators[3].append(synthesiser.SoundGenerator(
-            self.signal_sources[3], feedback,
-            frequency, duration, loop, volume
-        ))
+        self._mixer.noise(source, frequency, duration, loop, volume)
 
     def hush(self):
         """Stop sound."""
-        for voice in range(4):
-            self._stop_channel(voice)
-            self._next_tone[voice] = None
-            while self.generators[voice]:
-                self.generators[voice].popleft()
+        self._stop_channel(0)
+        # we read the buffers from this thread, too
+        self._mixer.hush()
+        self._mixer.skip()
 
     def _work(self):
         """Replenish sample buffer."""
-        if (
-                sum(len(q) for q in self.generators) == 0 and
-                self._next_tone == [None, None, None, None]
-            ):
+        if not self._mixer.busy and not self._mixer.has_queued():
             # check if mixer can be quit
             self._check_quit()
             return
         self._check_init_mixer()
-        for voice in range(4):
-            if mixer.Channel(voice).get_queue() is not None:
-                # nothing to do
-                continue
-            while True:
-                if self._next_tone[voice] is None or self._next_tone[voice].loop:
-                    try:
-                        self._next_tone[voice] = self.generators[voice].popleft()
-                    except IndexError:
-                        if self._next_tone[voice] is None:
-                            current_chunk = None
-                            break
-                current_chunk = self._next_tone[voice].build_chunk(CHUNK_LENGTH)
-                if current_chunk is not None:
-                    break
-                self._next_tone[voice] = None
-            if current_chunk is not None:
-                # enqueue chunk in mixer
-                snd = pygame.sndarray.make_sound(current_chunk)
-                mixer.Channel(voice).queue(snd)
+        self._mixer.fill()
+        if mixer.Channel(0).get_queue() is not None:
+            # nothing to do
+            return
+        length = min(CHUNK_LENGTH, self._mixer.available())
+        if length:
+            # enqueue mixed chunk as signed 16-bit samples
+            snd = mixer.Sound(buffer=self._mixer.mix_16(length).tobytes())
+            mixer.Channel(0).queue(snd)
 
     def _check_quit(self):
         """Quit the mixer if not running a program and sound quiet for a while."""
-        if self._next_tone != [None, None, None, None]:
+        if self._mixer.busy:
             self.quiet_ticks = 0
         else:
             self.quiet_ticks += 1
@@ -10,11 +10,10 @@ This file is released under the GNU GPL version 3 or later.
 
 import logging
 import ctypes
-from collections import deque
 
-from ..compat import zip
 from .audio import AudioPlugin
 from .base import audio_plugins, InitFailed
+from .mixer import Mixer
 from . import synthesiser
 
 # sdl2 module is imported only at plugin initialisation
@@ -28,9 +27,6 @@ def _import_sdl2():
     global sdl2
     from . import sdl2
 
-# approximate generator chunk length
-# one wavelength at 37 Hz is 1192 samples at 44100 Hz
-_CHUNK_LENGTH = 1192 * 4
 # length of chunks to be consumed by callback
 _CALLBACK_CHUNK_LENGTH = 2048
 # number of samples below which to replenish the buffer
@@ -49,13 +45,10 @@ class AudioSDL2(AudioPlugin):
             _import_sdl2()
         except ImportError:
             raise InitFailed('Module `sdl2` not found')
-        # synthesisers
-        self._signal_sources = synthesiser.get_signal_sources()
-        # sound generators for each voice
-        self._generators = [deque() for _ in synthesiser.VOICES]
-        # buffer of samples; drained by callback, replenished by _play_sound
-        self._samples = [bytearray() for _ in synthesiser.VOICES]
-        self._next_tone = [None for _ in synthesiser.VOICES]
+        # sound generators and sample buffers; drained by callback, replenished by _work
+        self._mixer = Mixer(_MIN_SAMPLES_BUFFER, _CALLBACK_CHUNK_LENGTH)
+        # ctypes view on the mixer's preallocated 16-bit output, to copy from in the callback
+        self._samples = (ctypes.c_char * len(self._mixer.output)).from_buffer(self._mixer.output)
         self._device = None
         self._audiospec = None
         self._quiet_ticks = 0
@@ -78,33 +71,26 @@ class AudioSDL2(AudioPlugin):
         self._audiospec = audiospec
         return AudioPlugin.__enter__(self)
 
+    @property
+    def busy(self):
+        """Something is playing."""
+        return self._mixer.busy
+
     def tone(self, voice, frequency, duration, loop, volume):
         """Enqueue a tone."""
-        self._generators[voice].append(synthesiser.SoundGenerator(
-            self._signal_sources[voice], synthesiser.FEEDBACK_TONE,
-            frequency, duration, loop, volume
-        ))
+        self._mixer.tone(voice, frequency, duration, loop, volume)
 
     def noise(self, source, frequency, duration, loop, volume):
         """Enqueue a noise."""
-        feedback = synthesiser.FEEDBACK_NOISE if source else synthesiser.FEEDBACK_PERIODIC
-        self._generators[synthesiser.NOISE_VOICE].append(synthesiser.SoundGenerator(
-            self._signal_sources[synthesiser.NOISE_VOICE], feedback,
-            frequency, duration, loop, volume
-        ))
+        self._mixer.noise(source, frequency, duration, loop, volume)
 
     def hush(self):
         """Stop sound."""
-        self._next_tone = [None for _ in synthesiser.VOICES]
-        for gen in self._generators:
-            gen.clear()
-        sdl2.SDL_LockAudioDevice(self._device)
-        self._samples = [bytearray() for _ in synthesiser.VOICES]
-        sdl2.SDL_UnlockAudioDevice(self._device)
+        self._mixer.hush()
 
     def _work(self):
         """Replenish sample buffer."""
-        if not any(self._generators) and not any(self._next_tone):
+        if not self._mixer.busy and not self._mixer.has_queued():
             if self._quiet_ticks >= _QUIET_QUIT:
                 sdl2.SDL_PauseAudioDevice(self._device, 1)
             self._quiet_ticks += 1
@@ -112,47 +98,9 @@ class AudioSDL2(AudioPlugin):
         else:
             self._quiet_ticks = 0
             sdl2.SDL_PauseAudioDevice(self._device, 0)
-        for voice in synthesiser.VOICES:
-            if len(self._samples[voice]) > _MIN_SAMPLES_BUFFER:
-                # nothing to do
-                continue
-            while True:
-                if self._next_tone[voice] is None or self._next_tone[voice].loop:
-                    try:
-                        # looping tone will be interrupted
-                        # by any new tone appearing in the generator queue
-                        self._next_tone[voice] = self._generators[voice].popleft()
-                    except IndexError:
-                        if self._next_tone[voice] is None:
-                            current_chunk = None
-                            break
-                current_chunk = self._next_tone[voice].build_chunk(_CHUNK_LENGTH)
-                if current_chunk is not None:
-                    break
-                self._next_tone[voice] = None
-            if current_chunk is not None:
-                # append chunk to samples list
-                # lock to ensure callback doesn't try to access the list too
-                sdl2.SDL_LockAudioDevice(self._device)
-                self._samples[voice] = bytearray().join((self._samples[voice], current_chunk))
-                sdl2.SDL_UnlockAudioDevice(self._device)
+        self._mixer.fill()
 
     def _get_next_chunk(self, notused, stream, length_bytes):
         """Callback function to generate the next chunk to be played."""
-        # this assumes 8-bit samples
-        length = length_bytes // 2
-        # if samples have run out, add silence
-        samples = (
-            _samp.ljust(length, b'\0') if len(_samp) < length else _samp[:length]
-            for _samp in self._samples
-        )
-        # mix the samples
-        mixed = bytearray(sum(_b) & 0xff for _b in zip(*samples))
-        # convert from S8 to S16 (little-endian)
-        # interlace with leading zeros to multiply by 256
-        mixed_16 = bytearray(length_bytes)
-        mixed_16[1::2] = mixed
-        self._samples = [_samp[length:] for _samp in self._samples]
-        ctypes.memmove(
-            stream, (ctypes.c_char * length_bytes).from_buffer(mixed_16), length_bytes
-        )
+        self._mixer.mix_16(length_bytes // 2)
+        ctypes.memmove(stream, self._samples, length_bytes)
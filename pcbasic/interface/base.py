@@ -7,6 +7,10 @@ This file is released under the GNU GPL version 3 or later.
 """
 
 import os
+import time
+import threading
+
+from ..compat import queue
 
 
 # message displayed when wiating to close
@@ -27,6 +31,62 @@ class InitFailed(Exception):
         return self._message
 
 
+class Wakeup(object):
+    """Wake the interface loop when there is something to do."""
+
+    def __init__(self):
+        """Set up the wakeup."""
+        self._condition = threading.Condition()
+        # time of the first notification since last cleared, None if none
+        self._notified = None
+        # called on first notification, to interrupt a plugin waiting on its own events
+        self._hook = None
+
+    def set_hook(self, hook):
+        """Set callable to interrupt a plugin's own wait, or None."""
+        with self._condition:
+            self._hook = hook
+
+    def notify(self):
+        """Wake the interface loop; may be called from any thread."""
+        with self._condition:
+            if self._notified is None:
+                self._notified = time.time()
+                if self._hook:
+                    self._hook()
+            self._condition.notify()
+
+    def is_set(self):
+        """There have been notifications since last cleared."""
+        return self._notified is not None
+
+    def clear(self):
+        """Clear notifications; return time of the first since last cleared, or None."""
+        with self._condition:
+            notified, self._notified = self._notified, None
+        return notified
+
+    def wait(self, timeout=None):
+        """Wait for notification, or until timeout in ms has passed if not None."""
+        with self._condition:
+            if self._notified is None:
+                self._condition.wait(None if timeout is None else timeout / 1000.)
+
+
+class WakeupQueue(queue.Queue):
+    """Queue that wakes the interface loop when an item is put on it."""
+
+    def __init__(self, wakeup):
+        """Initialise queue."""
+        queue.Queue.__init__(self)
+        self._wakeup = wakeup
+
+    def put(self, item, block=True, timeout=None):
+        """Put an item on the queue and wake the interface loop."""
+        queue.Queue.put(self, item, block, timeout)
+        self._wakeup.notify()
+
+
 class PluginRegister(object):
     """Plugin register."""
 
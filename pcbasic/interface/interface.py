@@ -7,6 +7,7 @@ This file is released under the GNU GPL version 3 or later.
 """
 
 import sys
+import time
 import threading
 import logging
 import traceback
@@ -15,21 +16,29 @@ from ..compat import queue
 
 from ..basic.base import signals
 from .base import InitFailed, video_plugins, audio_plugins, WAIT_MESSAGE
+from .base import Wakeup, WakeupQueue
 from .audio import AudioPlugin
 
 
-# millisecond delay
-DELAY = 12
-
-
 class Interface(object):
     """User interface for PC-BASIC session."""
 
     def __init__(self, guard=None, try_interfaces=(), audio_override=None, wait=False, **kwargs):
         """Initialise interface."""
         self._input_queue = queue.Queue()
-        self._video_queue = queue.Queue()
-        self._audio_queue = queue.Queue()
+        # the interface loop sleeps until signals come in on the output queues
+        self._wakeup = Wakeup()
+        self._video_queue = WakeupQueue(self._wakeup)
+        self._audio_queue = WakeupQueue(self._wakeup)
+        # event loop instrumentation
+        self._stats = {
+            # loop cycles, and those started by signals
+            'cycles': 0, 'wakeups': 0,
+            # seconds spent waiting
+            'idle_time': 0.,
+            # seconds from the first signal to the end of the cycle handling it
+            'latency': 0., 'max_latency': 0.,
+        }
         self._wait = wait
         self._guard = guard
         self._video, self._audio = None, None
@@ -62,6 +71,22 @@ class Interface(object):
         """Retrieve interface queues."""
         return self._input_queue, self._video_queue, self._audio_queue
 
+    def is_text_only(self):
+        """The video plugin only shows text, so text need not be rendered to pixels."""
+        return self._video.text_only
+
+    def is_frame_paced(self):
+        """The video plugin accepts screen updates collected once per frame."""
+        return self._video.frame_paced
+
+    def is_frame_shared(self):
+        """The video plugin takes pixels from a frame shared with the interpreter."""
+        return self._video.frame_shared
+
+    def get_stats(self):
+        """Retrieve event loop instrumentation counters."""
+        return dict(self._stats)
+
     def launch(self, target, **kwargs):
         """Start an interactive interpreter session."""
         thread = threading.Thread(target=self._thread_runner, args=(target,), kwargs=kwargs)
@@ -90,13 +115,32 @@ class Interface(object):
         """Start the main interface event loop."""
         with self._audio:
             with self._video:
-                while self._audio.alive or self._video.alive:
-                    # ensure both queues are drained
-                    self._video.cycle()
-                    self._audio.cycle()
-                    if not self._audio.busy and not self._video.busy:
-                        # nothing to do, come back later
-                        self._video.sleep(DELAY)
+                self._wakeup.set_hook(self._video.wake)
+                try:
+                    while self._audio.alive or self._video.alive:
+                        # clear before draining, so that no signal goes unnoticed
+                        notified = self._wakeup.clear()
+                        # ensure both queues are drained
+                        self._video.cycle()
+                        self._audio.cycle()
+                        self._count_cycle(notified)
+                        if not self._audio.busy and (self._audio.alive or self._video.alive):
+                            # nothing to do, wait for signals, input or the next blink cycle
+                            start = time.time()
+                            self._video.wait(self._wakeup)
+                            self._stats['idle_time'] += time.time() - start
+                finally:
+                    self._wakeup.set_hook(None)
+        logging.debug('Interface event loop: %s', self._stats)
+
+    def _count_cycle(self, notified):
+        """Update instrumentation counters after a loop cycle."""
+        self._stats['cycles'] += 1
+        if notified is not None:
+            latency = time.time() - notified
+            self._stats['wakeups'] += 1
+            self._stats['latency'] += latency
+            self._stats['max_latency'] = max(self._stats['max_latency'], latency)
 
     def pause(self, message):
         """Pause and wait for a key."""
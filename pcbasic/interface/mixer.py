@@ -0,0 +1,225 @@
+"""
+PC-BASIC - mixer.py
+Sample buffers and mixing for audio plugins
+
+(c) 2020 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+from binascii import hexlify, unhexlify
+from collections import deque
+
+from . import synthesiser
+
+
+# approximate generator chunk length
+# one wavelength at 37 Hz is 1192 samples at 44100 Hz
+CHUNK_LENGTH = 1192 * 4
+# a chunk overshoots by less than one wavelength at the lowest frequency
+_MAX_CHUNK_LENGTH = CHUNK_LENGTH + 1192
+# fixed ring buffer size in samples; the buffer does not grow
+# it must hold the minimum buffer plus the longest chunk, so min_samples_buffer is bounded by
+# _BUFFER_LENGTH - _MAX_CHUNK_LENGTH
+_BUFFER_LENGTH = 16384
+
+
+class _RingBuffer(object):
+    """
+    Samples for one voice, written by one thread and read by another.
+    Each thread only changes its own counter, so that no lock is needed.
+    """
+
+    def __init__(self, length):
+        """Allocate the buffer."""
+        self._buffer = bytearray(length)
+        # total samples written and read
+        self._written = 0
+        self._read = 0
+
+    def available(self):
+        """Number of samples that can be read."""
+        return self._written - self._read
+
+    def write(self, samples):
+        """Append samples; call from the producing thread."""
+        length = len(self._buffer)
+        if self.available() + len(samples) > length:
+            # this would overwrite unread samples
+            raise ValueError('Ring buffer overflow.')
+        start = self._written % length
+        first = min(len(samples), length - start)
+        self._buffer[start:start+first] = samples[:first]
+        self._buffer[:len(samples)-first] = samples[first:]
+        self._written += len(samples)
+
+    def read_into(self, target, start, step, count):
+        """Copy up to count samples into an extended slice of target; return number copied."""
+        count = min(count, self.available())
+        length = len(self._buffer)
+        offset = self._read % length
+        first = min(count, length - offset)
+        view = memoryview(self._buffer)
+        # empty slice assignments would fail while target has exported views
+        if first:
+            target[start : start + first*step : step] = view[offset:offset+first]
+        if count > first:
+            start += first*step
+            target[start : start + (count-first)*step : step] = view[:count-first]
+        self._read += count
+        return count
+
+    def skip(self):
+        """Drop all samples that can be read; call from the reading thread."""
+        self._read = self._written
+
+
+class Mixer(object):
+    """Sound generators and sample buffers for each voice, mixed to a single stream."""
+
+    def __init__(self, min_samples_buffer, max_mix_length):
+        """Set up generators and preallocate buffers."""
+        if min_samples_buffer + _MAX_CHUNK_LENGTH > _BUFFER_LENGTH:
+            raise ValueError('Minimum buffer of %d samples does not fit ring buffer.' % min_samples_buffer)
+        # number of samples below which to replenish a voice buffer
+        self._min_samples_buffer = min_samples_buffer
+        # synthesisers
+        self._signal_sources = synthesiser.get_signal_sources()
+        # sound generators for each voice
+        self._generators = [deque() for _ in synthesiser.VOICES]
+        # generators playing; if not None, something is playing
+        self.next_tone = [None for _ in synthesiser.VOICES]
+        # samples for each voice; drained by mix, replenished by fill
+        self._buffers = [_RingBuffer(_BUFFER_LENGTH) for _ in synthesiser.VOICES]
+        # the buffers are cleared by the reading thread, up to a number of hushes
+        self._hushes = 0
+        self._hushes_done = 0
+        # mixing workspace: samples in the odd bytes, which are the low bytes of big-endian 16-bit
+        # lanes, so that voices can be summed as big integers without carrying between samples
+        # the even bytes are zero between mixes, so that the same buffer reads as
+        # mixed signed 16-bit little-endian samples
+        self._lanes = bytearray(2 * max_mix_length)
+        self._lanes_view = memoryview(self._lanes)
+        self._zeros = memoryview(bytes(bytearray(max_mix_length)))
+
+    @property
+    def busy(self):
+        """Something is playing."""
+        return self.next_tone != [None for _ in synthesiser.VOICES]
+
+    def has_queued(self):
+        """Tones are waiting to be played."""
+        return any(self._generators)
+
+    def tone(self, voice, frequency, duration, loop, volume):
+        """Enqueue a tone."""
+        self._generators[voice].append(synthesiser.SoundGenerator(
+            self._signal_sources[voice], synthesiser.FEEDBACK_TONE,
+            frequency, duration, loop, volume
+        ))
+
+    def noise(self, source, frequency, duration, loop, volume):
+        """Enqueue a noise."""
+        feedback = synthesiser.FEEDBACK_NOISE if source else synthesiser.FEEDBACK_PERIODIC
+        self._generators[synthesiser.NOISE_VOICE].append(synthesiser.SoundGenerator(
+            self._signal_sources[synthesiser.NOISE_VOICE], feedback,
+            frequency, duration, loop, volume
+        ))
+
+    def hush(self):
+        """Stop sound; buffered samples are dropped at the next mix."""
+        self.next_tone = [None for _ in synthesiser.VOICES]
+        for gen in self._generators:
+            gen.clear()
+        self._hushes += 1
+
+    def available(self):
+        """Number of samples buffered in the fullest voice."""
+        return max(_buf.available() for _buf in self._buffers)
+
+    def fill(self):
+        """Replenish sample buffers."""
+        if self._hushes != self._hushes_done:
+            # wait for the reading thread to drop the old samples
+            return
+        for voice in synthesiser.VOICES:
+            # top up across the ends of tones, so that no gaps are left between them
+            while self._buffers[voice].available() <= self._min_samples_buffer:
+                current_chunk = self._next_chunk(voice)
+                if not current_chunk:
+                    break
+                self._buffers[voice].write(current_chunk)
+
+    def _next_chunk(self, voice):
+        """Build the next chunk of samples for a voice, or None if nothing is playing."""
+        while True:
+            if self.next_tone[voice] is None or self.next_tone[voice].loop:
+                try:
+                    # looping tone will be interrupted
+                    # by any new tone appearing in the generator queue
+                    self.next_tone[voice] = self._generators[voice].popleft()
+                except IndexError:
+                    if self.next_tone[voice] is None:
+                        return None
+            current_chunk = self.next_tone[voice].build_chunk(CHUNK_LENGTH)
+            if current_chunk is not None:
+                return current_chunk
+            self.next_tone[voice] = None
+
+    def skip(self):
+        """Drop samples buffered before a hush; call from the reading thread."""
+        hushes = self._hushes
+        if hushes != self._hushes_done:
+            for buf in self._buffers:
+                buf.skip()
+            self._hushes_done = hushes
+
+    def _mix(self, length):
+        """Mix samples of all voices into the odd bytes of the lanes, padding with silence."""
+        self.skip()
+        if not length:
+            return
+        lanes, zeros = self._lanes, self._zeros
+        playing = 0
+        for buf in self._buffers:
+            if buf.available():
+                playing += 1
+        if not playing:
+            lanes[1 : 2*length : 2] = zeros[:length]
+        elif playing == 1:
+            for buf in self._buffers:
+                if buf.available():
+                    self._read_voice(buf, length)
+                    break
+        else:
+            # the big integers are the only per-mix allocations left; without numpy,
+            # this is the only way to sum the voices without a loop over samples in Python
+            active = self._lanes_view[:2*length]
+            total = 0
+            for buf in self._buffers:
+                if buf.available():
+                    self._read_voice(buf, length)
+                    total += int(hexlify(active), 16)
+            # sums of signed bytes wrap around in the low byte of each lane
+            lanes[:2*length] = unhexlify(b'%0*x' % (4*length, total))
+            lanes[0 : 2*length : 2] = zeros[:length]
+
+    def _read_voice(self, buf, length):
+        """Read samples of a voice into the low bytes of the lanes, padding with silence."""
+        count = buf.read_into(self._lanes, 1, 2, length)
+        if count < length:
+            self._lanes[2*count+1 : 2*length : 2] = self._zeros[:length-count]
+
+    @property
+    def output(self):
+        """Preallocated buffer that mix_16 writes to."""
+        return self._lanes
+
+    def mix(self, length):
+        """Mix the next samples, as signed 8-bit samples."""
+        self._mix(length)
+        return self._lanes[1 : 2*length : 2]
+
+    def mix_16(self, length):
+        """Mix the next samples, as a view on signed 16-bit little-endian samples."""
+        self._mix(length)
+        return self._lanes_view[:2*length]
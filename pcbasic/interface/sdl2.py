@@ -915,6 +915,7 @@ SDL_MOUSEBUTTONUP = 0x402
 SDL_JOYAXISMOTION = 0x600
 SDL_JOYBUTTONDOWN = 0x603
 SDL_JOYBUTTONUP = 0x604
+SDL_USEREVENT = 0x8000
 
 class SDL_WindowEvent(Structure):
     _fields_ = [("type", Uint32),
@@ -1025,6 +1026,9 @@ class SDL_Event(Union):
                 ]
 
 SDL_PollEvent = _bind("SDL_PollEvent", [POINTER(SDL_Event)], c_int)
+SDL_WaitEvent = _bind("SDL_WaitEvent", [POINTER(SDL_Event)], c_int)
+SDL_WaitEventTimeout = _bind("SDL_WaitEventTimeout", [POINTER(SDL_Event), c_int], c_int)
+SDL_PushEvent = _bind("SDL_PushEvent", [POINTER(SDL_Event)], c_int)
 
 
 # __init__.py
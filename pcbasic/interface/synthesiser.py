@@ -7,6 +7,7 @@ This file is released under the GNU GPL version 3 or later.
 """
 
 from math import ceil
+from collections import OrderedDict
 
 from ..compat import xrange
 
@@ -44,6 +45,86 @@ _AMPLITUDE = [0] + [int(_MAX_AMPLITUDE * _STEP_FACTOR**_power) for _power in ran
 # resolution for averaging, should be even
 _RESOLUTION = 20
 
+# number of tone waveform cycles to keep
+_MAX_CYCLES = 64
+
+
+def _gcd(a, b):
+    """Greatest common divisor."""
+    while b:
+        a, b = b, a % b
+    return a
+
+
+def _get_levels(amplitude):
+    """Translation table from a sum of high sub-samples to a signed sample byte."""
+    half_res = _RESOLUTION // 2
+    averages = ((_s - half_res) * amplitude // _RESOLUTION for _s in range(_RESOLUTION + 1))
+    # pack signed bytes into bytearray
+    levels = bytearray(_sb if _sb >= 0 else 0xff + _sb for _sb in averages)
+    return bytes(levels + bytearray(256 - len(levels)))
+
+
+# sample bytes per amplitude
+_LEVELS = {_amplitude: _get_levels(_amplitude) for _amplitude in set(_AMPLITUDE)}
+
+# bits for each byte value, least significant first
+_BYTE_BITS = [bytes(bytearray((_byte >> _bit) & 1 for _bit in range(8))) for _byte in range(256)]
+
+
+def _get_block_table(feedback):
+    """Shift register change after 8 steps, for each value of the 8 bits shifted out."""
+    table = []
+    for low in range(256):
+        change = 0
+        for step in range(8):
+            if (low >> step) & 1:
+                change ^= feedback >> (7 - step)
+        table.append(change)
+    return table
+
+
+class _ToneCycles(object):
+    """
+    Sampled square waves, one cycle of samples for each half-wave length and amplitude.
+    The sample positions of a cycle fall in one of several classes of offsets within the wave.
+    """
+
+    def __init__(self):
+        """Set up the cache."""
+        self._cycles = OrderedDict()
+
+    def get(self, stretch, amplitude, offset):
+        """Get samples of the wave from a given offset, cycle and rotation index."""
+        period = 2 * stretch
+        key = stretch, amplitude, offset % _gcd(period, _RESOLUTION)
+        try:
+            cycle, index = self._cycles.pop(key)
+        except KeyError:
+            cycle, index = self._build(stretch, amplitude, key[2])
+            if len(self._cycles) >= _MAX_CYCLES:
+                # drop least recently used
+                self._cycles.popitem(last=False)
+        self._cycles[key] = cycle, index
+        return cycle, index[offset]
+
+    def _build(self, stretch, amplitude, start):
+        """Sample the wave, starting with a high half-wave, from an offset until it repeats."""
+        period = 2 * stretch
+        wave = (b'\1' * stretch + b'\0' * stretch) * (_RESOLUTION // period + 2)
+        sums, index = bytearray(), {}
+        offset = start
+        while True:
+            index[offset] = len(sums)
+            sums.append(wave.count(b'\1', offset, offset + _RESOLUTION))
+            offset = (offset + _RESOLUTION) % period
+            if offset == start:
+                break
+        return bytes(sums.translate(_LEVELS[amplitude])), index
+
+
+_tone_cycles = _ToneCycles()
+
 
 class SignalSource(object):
     """Linear Feedback Shift Register to generate noise or tone."""
@@ -52,6 +133,11 @@ class SignalSource(object):
         """Initialise the signal source."""
         self._lfsr = init
         self._feedback = feedback
+        # feedback only reaches the low byte after 8 steps, so we can step a byte at a time
+        if not feedback & 0xff:
+            self._block_table = _get_block_table(feedback)
+        else:
+            self._block_table = None
         # "remaining phase"/pi, i.e. runs 0 to 1 or 0 to -1 on half wavelength
         self.phase = 0.
         self.bit = 0
@@ -65,6 +151,38 @@ class SignalSource(object):
         self.bit = bit
         return bit
 
+    def is_square_wave(self):
+        """The source alternates between high and low."""
+        return self._feedback == FEEDBACK_TONE and self._lfsr in (1, 2)
+
+    def next_bits(self, count):
+        """Get a number of sample bits, as bytes of 0 or 1."""
+        if not count:
+            return b''
+        if self.is_square_wave():
+            # the register toggles between 1 and 2
+            first = self._lfsr & 1
+            bits = (b'\1\0' if first else b'\0\1') * (count // 2 + 1)
+            if count % 2:
+                self._lfsr = 3 - self._lfsr
+            bits = bits[:count]
+            self.bit = ord(bits[-1:])
+            return bits
+        blocks = []
+        if self._block_table:
+            table = self._block_table
+            lfsr = self._lfsr
+            for _ in xrange(count // 8):
+                low = lfsr & 0xff
+                blocks.append(_BYTE_BITS[low])
+                lfsr = (lfsr >> 8) ^ table[low]
+            self._lfsr = lfsr
+            count %= 8
+        blocks.append(bytes(bytearray(self.next() for _ in xrange(count))))
+        bits = b''.join(blocks)
+        self.bit = ord(bits[-1:])
+        return bits
+
 
 class SoundGenerator(object):
     """Sound sample chunk generator."""
@@ -98,40 +216,28 @@ class SoundGenerator(object):
             chunk = bytearray(length)
         else:
             half_wavelength = SAMPLE_RATE / (2.*self._frequency)
-            # generate first half-wave so as to complete the last one played
+            # the signal is sampled by averaging over bins of _RESOLUTION sub-samples
+            # start with the rest of the last half-wave played, in sub-samples
+            last_bit = self._signal_source.bit
             if self._signal_source.phase:
                 first_length = int(half_wavelength * self._signal_source.phase)
-                first_half_wave = bytearray([self._signal_source.bit]) * first_length * _RESOLUTION
                 length -= first_length
+                first_length *= _RESOLUTION
                 self._signal_source.phase = 0.
             else:
-                first_half_wave = bytearray()
+                first_length = 0
             num_half_waves = int(ceil(length / half_wavelength))
-            # generate bits
-            bits = (
-                self._signal_source.next()
-                for _ in range(num_half_waves)
-            )
-            # do sampling by averaging the signal over bins of given resolution
-            # this allows to use vectors all the way
-            # which is *much* faster than looping over an array
-            # stretch array by half_wavelength * _RESOLUTION
             stretch = int(half_wavelength * _RESOLUTION)
-            waves = bytearray().join(bytearray([_b]) * stretch for _b in bits)
-            matrix = bytearray().join((first_half_wave, waves))
             # cut off on round number of resolution blocks
-            use_length = len(matrix) - (len(matrix) % _RESOLUTION)
-            # average over blocks
-            # sums are between 0 and RESOLUTION, inclusive
-            sums = (
-                sum(matrix[_i:_i+_RESOLUTION])
-                for _i in xrange(0, use_length, _RESOLUTION)
-            )
-            # scale to signed amplitude
-            half_res = _RESOLUTION // 2
-            averages = ((_s - half_res) * self._amplitude // _RESOLUTION for _s in sums)
-            # pack signed bytes into bytearray
-            chunk = bytearray(_sb if _sb >= 0 else 0xff + _sb for _sb in averages)
+            num_samples = (first_length + num_half_waves * stretch) // _RESOLUTION
+            if self._signal_source.is_square_wave():
+                first_bit = self._signal_source.next_bits(num_half_waves)[:1]
+                chunk = self._sample_square_wave(
+                    last_bit, first_length, ord(first_bit or b'\0'), stretch, num_samples
+                )
+            else:
+                bits = self._signal_source.next_bits(num_half_waves)
+                chunk = self._sample_bits(last_bit, first_length, bits, stretch, num_samples)
         if not self.loop:
             # last chunk is shorter
             if self._count_samples + len(chunk) < self._num_samples:
@@ -150,6 +256,46 @@ class SoundGenerator(object):
         # if loop, attach one chunk to loop, do not increment count
         return chunk
 
+    def _sample_bits(self, last_bit, first_length, bits, stretch, num_samples):
+        """Sample a run of the last bit followed by half-waves for each new bit."""
+        # stretch each bit to a half-wave of sub-samples
+        waves = bits.replace(b'\0', b'\2').replace(b'\1', b'\1' * stretch)
+        matrix = b''.join((
+            (b'\1' if last_bit else b'\0') * first_length, waves.replace(b'\2', b'\0' * stretch)
+        ))
+        # sums are between 0 and RESOLUTION, inclusive
+        sums = bytearray(
+            matrix.count(b'\1', _i, _i+_RESOLUTION)
+            for _i in xrange(0, num_samples * _RESOLUTION, _RESOLUTION)
+        )
+        return sums.translate(_LEVELS[self._amplitude])
+
+    def _sample_square_wave(self, last_bit, first_length, first_bit, stretch, num_samples):
+        """Sample a run of the last bit followed by a square wave, from cached cycles."""
+        levels = _LEVELS[self._amplitude]
+        # whole samples in the first run
+        num_first = min(first_length // _RESOLUTION, num_samples)
+        chunk = bytearray(levels[last_bit * _RESOLUTION : last_bit * _RESOLUTION + 1]) * num_first
+        num_samples -= num_first
+        rest = first_length - num_first * _RESOLUTION
+        if not num_samples:
+            return chunk
+        if rest:
+            # one sample straddles the first run and the square wave
+            chunk += self._sample_bits(
+                last_bit, rest, bytes(bytearray((first_bit, 1 - first_bit))), stretch, 1
+            )
+            num_samples -= 1
+            offset = _RESOLUTION - rest
+        else:
+            offset = 0
+        # the cached waves start high
+        if not first_bit:
+            offset += stretch
+        cycle, start = _tone_cycles.get(stretch, self._amplitude, offset % (2 * stretch))
+        repeats = (start + num_samples) // len(cycle) + 1
+        return chunk + (cycle * repeats)[start : start + num_samples]
+
 
 def get_signal_sources():
     """Return three tone voices plus a noise source."""
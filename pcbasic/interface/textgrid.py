@@ -0,0 +1,110 @@
+"""
+PC-BASIC - textgrid.py
+Shadow grid of text cells for terminal interfaces
+
+(c) 2020 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+from ..compat import iter_chunks
+
+
+# content of a cell that is not known, such as just after clearing; matches nothing put
+UNKNOWN = None
+
+# runs of unchanged cells up to this length are rewritten rather than moved over,
+# as rewriting them costs no more than a cursor movement would
+MAX_GAP = 4
+
+
+class TextGrid(object):
+    """Cells shown on the terminal and cells to be shown on the next flush."""
+
+    def __init__(self, height, width):
+        """Create grid of unknown cells."""
+        self.resize(height, width)
+
+    def resize(self, height, width):
+        """Change the size of the grid; all cells become unknown."""
+        self._height, self._width = height, width
+        self._shown = [[UNKNOWN] * width for _ in range(height)]
+        self._wanted = [[UNKNOWN] * width for _ in range(height)]
+        # rows with cells put since last flush
+        self._dirty = set()
+
+    def invalidate(self):
+        """Forget what the terminal shows, so that all cells put are written."""
+        self._shown = [[UNKNOWN] * self._width for _ in range(self._height)]
+
+    def put(self, row, col, chars, attrs):
+        """Set the characters and attributes to show from a given position on a row."""
+        if not 1 <= row <= self._height:
+            return
+        length = min(len(chars), self._width - col + 1)
+        self._wanted[row-1][col-1:col-1+length] = zip(chars[:length], attrs[:length])
+        self._dirty.add(row)
+
+    def clear_rows(self, start, stop):
+        """Register that the terminal has cleared a range of rows."""
+        for row in range(start, stop+1):
+            self._shown[row-1] = [UNKNOWN] * self._width
+            self._wanted[row-1] = [UNKNOWN] * self._width
+            self._dirty.discard(row)
+
+    def scroll(self, direction, from_line, scroll_height):
+        """Register that the terminal has scrolled a range of rows by one."""
+        for grid in (self._shown, self._wanted):
+            if direction == -1:
+                grid[from_line-1:scroll_height] = (
+                    grid[from_line:scroll_height] + [[UNKNOWN] * self._width]
+                )
+            else:
+                grid[from_line-1:scroll_height] = (
+                    [[UNKNOWN] * self._width] + grid[from_line-1:scroll_height-1]
+                )
+        self._dirty = set(
+            _row + direction if from_line <= _row <= scroll_height else _row
+            for _row in self._dirty
+        )
+        self._dirty.discard(from_line-1 if direction == -1 else scroll_height+1)
+
+    def flush(self):
+        """Iterate over changed runs of cells as (row, col, chars, attr), left to right by row."""
+        dirty, self._dirty = sorted(self._dirty), set()
+        for row in dirty:
+            shown, wanted = self._shown[row-1], self._wanted[row-1]
+            for start, stop in self._spans(shown, wanted):
+                shown[start:stop] = wanted[start:stop]
+                col = start + 1
+                cells = wanted[start:stop]
+                for chars, attr in iter_chunks(
+                        [_cell[0] for _cell in cells], [_cell[1] for _cell in cells]
+                    ):
+                    yield row, col, chars, attr
+                    col += len(chars)
+
+    def _spans(self, shown, wanted):
+        """Iterate over slice bounds of changed cells on a row, with short known gaps bridged."""
+        start, stop = None, None
+        for col, (old, new) in enumerate(zip(shown, wanted)):
+            if old == new:
+                continue
+            if start is not None and (
+                    col - stop > MAX_GAP or UNKNOWN in wanted[stop:col]
+                ):
+                yield self._whole_chars(wanted, start, stop)
+                start = None
+            if start is None:
+                start = col
+            stop = col + 1
+        if start is not None:
+            yield self._whole_chars(wanted, start, stop)
+
+    def _whole_chars(self, wanted, start, stop):
+        """Widen slice bounds so as not to split double-width characters."""
+        # the trailing half of a double-width character holds an empty string
+        if start > 0 and wanted[start][0] == u'' and wanted[start-1] is not UNKNOWN:
+            start -= 1
+        if stop < len(wanted) and wanted[stop] is not UNKNOWN and wanted[stop][0] == u'':
+            stop += 1
+        return start, stop
@@ -6,8 +6,6 @@ Base class for video plugins
 This file is released under the GNU GPL version 3 or later.
 """
 
-import time
-
 from ..compat import queue
 from ..basic.base import signals
 
@@ -15,15 +13,27 @@ from ..basic.base import signals
 class VideoPlugin(object):
     """Base class for display/input interface plugins."""
 
+    # plugin shows only text and attributes and ignores the pixels in updates
+    text_only = False
+    # plugin shows the screen as a whole, so updates may be collected per frame
+    frame_paced = True
+    # plugin only needs pixels and takes them from a frame shared with the interpreter
+    frame_shared = False
+    # milliseconds between checks for input that must be polled for, None if not polling
+    poll_interval = None
+
     def __init__(self, input_queue, video_queue, **kwargs):
         """Setup the interface."""
         self.alive = True
         self.busy = False
         self._input_queue = input_queue
         self._video_queue = video_queue
+        self._shared_frame = None
         self._handlers = {
             signals.VIDEO_SET_MODE: self.set_mode,
             signals.VIDEO_UPDATE: self.update,
+            signals.VIDEO_SHARE_FRAME: self._set_shared_frame,
+            signals.VIDEO_UPDATE_FRAME: self._update_frame,
             signals.VIDEO_CLEAR_ROWS: self.clear_rows,
             signals.VIDEO_SCROLL: self.scroll,
             signals.VIDEO_SET_PALETTE: self.set_palette,
@@ -45,9 +55,13 @@ class VideoPlugin(object):
             self._work()
             self._check_input()
 
-    def sleep(self, ms):
-        """Sleep a tick"""
-        time.sleep(ms/1000.)
+    def wait(self, wakeup):
+        """Wait for signals or input, unless there is work to do."""
+        if not self.busy:
+            wakeup.wait(self.poll_interval)
+
+    def wake(self):
+        """Interrupt a wait on the plugin's own events; called from other threads."""
 
     # private methods
 
@@ -69,6 +83,15 @@ class VideoPlugin(object):
                 except KeyError:
                     pass
 
+    def _set_shared_frame(self, shared_frame):
+        """Keep a reference to the frame shared with the interpreter."""
+        self._shared_frame = shared_frame
+
+    def _update_frame(self, generation, rects):
+        """Update from the shared frame and hand it back to the interpreter."""
+        self.update_from_frame(self._shared_frame, rects)
+        self._shared_frame.release(generation)
+
     # plugin overrides
 
     def __exit__(self, type, value, traceback):
@@ -118,3 +141,9 @@ class VideoPlugin(object):
 
     def update(self, row, col, unicode_matrix, attr_matrix, y0, x0, sprite):
         """Put text or pixels at a given position."""
+
+    def update_from_frame(self, shared_frame, rects):
+        """Put pixels from rectangles (x0, y0, x1, y1 inclusive) of the shared frame."""
+        # fall back to pixel updates; no text is available
+        for x0, y0, x1, y1 in rects:
+            self.update(None, None, [], [], y0, x0, shared_frame.pixels[y0:y1+1, x0:x1+1])
@@ -11,8 +11,8 @@ import sys
 from .video import VideoPlugin
 from .base import video_plugins
 from . import video_cli
+from .textgrid import TextGrid
 from ..compat import console, zip
-from ..compat import iter_chunks
 
 
 # CGA colours: black, cyan, magenta, white
@@ -38,6 +38,8 @@ class VideoANSI(video_cli.VideoTextBase):
         self._block_cursor = False
         # current cursor position
         self._cursor_row, self._cursor_col = 1, 1
+        # position of the terminal's own cursor, if known
+        self._output_pos = None
         # last used colour attributes
         self._last_attributes = None
         self._cursor_attr = None
@@ -48,6 +50,8 @@ class VideoANSI(video_cli.VideoTextBase):
         self._border_attr = 0
         self.default_colours = range(16)
         self._attributes = []
+        # cells shown and to be shown on the terminal
+        self._grid = TextGrid(self._height, self._width)
 
     def __enter__(self):
         """Open ANSI interface."""
@@ -61,12 +65,28 @@ class VideoANSI(video_cli.VideoTextBase):
     def __exit__(self, type, value, traceback):
         """Close ANSI interface."""
         try:
+            # stop reading keys before the terminal leaves the alternate screen
+            self._input_handler.stop()
             console.close_screen()
         finally:
             video_cli.VideoTextBase.__exit__(self, type, value, traceback)
 
     def _work(self):
         """Handle screen and interface events."""
+        # write the cells changed since last time, moving the cursor only where needed
+        for row, col, chars, attr in self._grid.flush():
+            self._move_output(row, col)
+            fore, back, blink, underline = self._attributes[attr]
+            self._set_attributes(fore, back, blink, underline)
+            console.write(u''.join(chars).replace(u'\0', u' '))
+            self._output_pos = row, col + len(chars)
+        self._move_output(self._cursor_row, self._cursor_col)
+
+    def _move_output(self, row, col):
+        """Move the terminal's cursor, if it is not there yet."""
+        if self._output_pos != (row, col):
+            console.move_cursor_to(row + self._border_y, col + self._border_x)
+            self._output_pos = row, col
 
     def _redraw_border(self):
         """Redraw the border."""
@@ -87,9 +107,7 @@ class VideoANSI(video_cli.VideoTextBase):
         for row in range(self._border_y):
             console.move_cursor_to(row+1 + self._border_y + self._height, 1)
             console.clear_row(self._width + 2 * self._border_x)
-        console.move_cursor_to(
-            self._cursor_row + self._border_y, self._cursor_col + self._border_x
-        )
+        self._output_pos = None
 
     def _set_default_colours(self, num_attr):
         """Set colours for default palette."""
@@ -132,6 +150,9 @@ class VideoANSI(video_cli.VideoTextBase):
         blink = tuple(_blink for _, _, _blink, _ in attributes)
         under = tuple(_under for _, _, _, _under in attributes)
         int_attributes = list(zip(fore, back, blink, under))
+        if int_attributes != self._attributes:
+            # cells shown may now need different colours
+            self._grid.invalidate()
         self._attributes = int_attributes
         for index, rgb in enumerate(rgb_table):
             console.set_palette_entry(index, *rgb)
@@ -140,14 +161,17 @@ class VideoANSI(video_cli.VideoTextBase):
         """Change screen mode."""
         self._height = text_height
         self._width = text_width
+        self._grid.resize(self._height, self._width)
         console.set_attributes(0, 0, False, False)
         console.resize(self._height + 2*self._border_y, self._width + 2*self._border_x)
         console.clear()
+        self._output_pos = None
         self._redraw_border()
         return True
 
     def clear_rows(self, back_attr, start, stop):
         """Clear screen rows."""
+        self._grid.clear_rows(start, stop)
         self._set_attributes(7, back_attr, False, False)
         for row in range(start, stop+1):
             console.move_cursor_to(row + self._border_y, 1 + self._border_x)
@@ -161,17 +185,12 @@ class VideoANSI(video_cli.VideoTextBase):
             console.write(u' ' * self._border_x)
             console.move_cursor_to(row + self._border_y, 1 + self._width + self._border_x)
             console.write(u' ' * self._border_x)
-        console.move_cursor_to(
-            self._cursor_row + self._border_y, self._cursor_col + self._border_x
-        )
+        self._output_pos = None
 
     def move_cursor(self, row, col, attr, width):
         """Move the cursor to a new position."""
-        if (row, col) != (self._cursor_row, self._cursor_col):
-            self._cursor_row, self._cursor_col = row, col
-            console.move_cursor_to(
-                self._cursor_row + self._border_y, self._cursor_col + self._border_x
-            )
+        # the terminal's cursor is moved on the next cycle
+        self._cursor_row, self._cursor_col = row, col
         # change attribute of cursor
         # cursor width is controlled by terminal
         if attr != self._cursor_attr:
@@ -195,18 +214,10 @@ class VideoANSI(video_cli.VideoTextBase):
 
     def update(self, row, col, unicode_matrix, attr_matrix, y0, x0, sprite):
         """Put text or pixels at a given position."""
-        start_col = col
-        curs_row, curs_col = self._cursor_row, self._cursor_col
+        # cells are written to the terminal on the next cycle, if they changed
         for text, attrs in zip(unicode_matrix, attr_matrix):
-            console.move_cursor_to(row + self._border_y, col + self._border_x)
-            for unicode_list, attr in iter_chunks(text, attrs):
-                fore, back, blink, underline = self._attributes[attr]
-                self._set_attributes(fore, back, blink, underline)
-                console.write(u''.join(unicode_list).replace(u'\0', u' '))
-                col += len(unicode_list)
+            self._grid.put(row, col, text, attrs)
             row += 1
-            col = start_col
-        console.move_cursor_to(self._cursor_row + self._border_y, self._cursor_col + self._border_x)
 
     def scroll(self, direction, from_line, scroll_height, back_attr):
         """Scroll the screen between from_line and scroll_height."""
@@ -214,6 +225,7 @@ class VideoANSI(video_cli.VideoTextBase):
         # as some (not all) consoles use the background color when inserting/deleting
         # and if they can't resize this leads to glitches outside the window
         self._set_attributes(7, 0, False, False)
+        self._grid.scroll(direction, from_line, scroll_height)
         if direction == -1:
             self._scroll_up(from_line, scroll_height, back_attr)
         else:
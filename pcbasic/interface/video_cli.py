@@ -8,6 +8,7 @@ This file is released under the GNU GPL version 3 or later.
 
 import sys
 import time
+import threading
 
 from .video import VideoPlugin
 from .base import video_plugins, InitFailed
@@ -17,6 +18,9 @@ from ..basic.base.eascii import as_unicode as uea
 from ..compat import EOF, console
 
 
+# seconds the keyboard reader waits for input before checking if it should stop
+READ_TIMEOUT = 0.1
+
 # escape sequence to scancode
 KEY_TO_SCAN = {
     'F1': scancode.F1,  'F2': scancode.F2,  'F3': scancode.F3,  'F4': scancode.F4,
@@ -154,23 +158,37 @@ ALT_KEY_TO_EASCII = {
 class VideoTextBase(VideoPlugin):
     """Text-based interface."""
 
+    text_only = True
+
     def __init__(self, input_queue, video_queue, **kwargs):
         """Initialise text-based interface."""
         if not console:
             raise InitFailed('This interface requires a console terminal (tty).')
         VideoPlugin.__init__(self, input_queue, video_queue)
-        # start the stdin thread for non-blocking reads
+        # stdin thread for non-blocking reads
         self._input_handler = InputHandlerCLI(input_queue)
 
-    def _check_input(self):
-        """Handle keyboard events."""
-        self._input_handler.drain_queue()
+    def __enter__(self):
+        """Start reading the keyboard."""
+        VideoPlugin.__enter__(self)
+        self._input_handler.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        """Stop reading the keyboard."""
+        try:
+            self._input_handler.stop()
+        finally:
+            VideoPlugin.__exit__(self, type, value, traceback)
 
 
 @video_plugins.register('cli')
 class VideoCLI(VideoTextBase):
     """Command-line interface."""
 
+    # rows are written out as the cursor leaves them, so updates must arrive in order
+    frame_paced = False
+
     def __init__(self, input_queue, video_queue, **kwargs):
         """Initialise command-line interface."""
         VideoTextBase.__init__(self, input_queue, video_queue)
@@ -184,21 +202,37 @@ class VideoCLI(VideoTextBase):
         self._last_row = 1
         # text buffer
         self._text = [[u' '] * 80 for _ in range(25)]
+        # output not yet written to the terminal
+        self._output = []
+        # cells on the current terminal line, as far as written
+        self._line = []
+        # index of the terminal's cursor on the current line, None if unknown
+        self._line_pos = None
+        # cells and cursor index the current terminal line should have on next flush
+        self._wanted = []
+        self._wanted_pos = 0
 
     def __enter__(self):
         """Open command-line interface."""
-        VideoTextBase.__enter__(self)
         console.set_raw()
+        VideoTextBase.__enter__(self)
 
     def __exit__(self, type, value, traceback):
         """Close command-line interface."""
         try:
+            # stop reading keys before the terminal leaves raw mode
+            self._input_handler.stop()
+            self._sync_line()
             if self._col != 1:
-                console.write(u'\r\n')
+                self._output.append(u'\r\n')
+            self._flush_output()
             console.unset_raw()
         finally:
             VideoTextBase.__exit__(self, type, value, traceback)
 
+    def _work(self):
+        """Write out buffered output."""
+        self._flush_output()
 
     ###############################################################################
 
@@ -281,8 +315,12 @@ class VideoCLI(VideoTextBase):
         """Redraw text for a range of rows."""
         for update_row in range(start_row, stop_row):
             self._redraw_row(update_row)
-            # go one row down
-            console.write(u'\n')
+            # go one row down; the line is complete
+            self._sync_line()
+            self._output.append(u'\n')
+            self._flush_output()
+            self._line, self._line_pos = [], None
+            self._wanted, self._wanted_pos = [], 0
         self._redraw_row(stop_row)
 
     def _redraw_row(self, row, col=None):
@@ -292,9 +330,55 @@ class VideoCLI(VideoTextBase):
         # as double-width characters come through as pairs c, u''
         if col is not None:
             rowtext = rowtext[:col-1]
+        else:
+            # trailing blanks only need writing over text that was written there before
+            rowtext = rowtext[:max(_text_length(rowtext), _text_length(self._wanted))]
+        # the terminal line is brought up to date when output is flushed
+        self._wanted[:len(rowtext)] = rowtext
+        self._wanted_pos = len(rowtext)
+
+    def _sync_line(self):
+        """Write what is needed to bring the terminal line up to date."""
+        line, wanted = self._line, self._wanted
+        changed = [
+            _i for _i, _cell in enumerate(wanted) if _i >= len(line) or line[_i] != _cell
+        ]
+        pos = self._line_pos
+        if changed:
+            start, stop = changed[0], changed[-1] + 1
+            # don't start halfway a double-width character, which comes through as pair c, u''
+            if start and wanted[start] == u'':
+                start -= 1
+            self._output.append(self._move_to(pos, start) + u''.join(wanted[start:stop]))
+            pos = stop
+        self._output.append(self._move_to(pos, self._wanted_pos))
+        self._line, self._line_pos = list(wanted), self._wanted_pos
+
+    def _move_to(self, pos, new_pos):
+        """Output to move the terminal's cursor along the current line."""
+        if pos == new_pos:
+            return u''
+        if pos is not None and pos < new_pos and self._wanted[pos] != u'':
+            # write over what is there, or should be there anyway
+            return u''.join(self._wanted[pos:new_pos])
         # go to column 1
-        console.write(u'\r')
-        console.write(u''.join(rowtext))
+        return u'\r' + u''.join(self._wanted[:new_pos])
+
+    def _flush_output(self):
+        """Write buffered output to the terminal."""
+        self._sync_line()
+        output = u''.join(self._output)
+        if output:
+            console.write(output)
+        self._output = []
+
+
+def _text_length(cells):
+    """Length of a row of cells without trailing blanks."""
+    length = len(cells)
+    while length and cells[length-1] == u' ':
+        length -= 1
+    return length
 
 
 ###############################################################################
@@ -303,18 +387,45 @@ class InputHandlerCLI(object):
     """Keyboard reader thread."""
 
     def __init__(self, queue):
-        """Start the keyboard reader."""
+        """Set up the keyboard reader."""
         self._input_queue = queue
         self._f12_active = False
         self.quit_on_eof = True
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the keyboard reader thread."""
+        self._thread = threading.Thread(target=self._read_keys)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the keyboard reader thread."""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _read_keys(self):
+        """Read keys as they come in, until stopped."""
+        while not self._stop.is_set():
+            console.key_pressed(READ_TIMEOUT)
+            # drain even if no character is ready, to clear out other console events
+            if self.drain_queue():
+                # don't spin on a closed stream
+                self._stop.wait(READ_TIMEOUT)
 
     def drain_queue(self):
-        """Handle keyboard events."""
+        """Handle keyboard events; return True if end of input was read."""
+        eof = False
         while True:
             # s is one unicode char or one scancode
             uc, sc, mods = self._get_key()
             if not uc and not sc:
-                break
+                return eof
+            if uc == EOF:
+                eof = True
             if uc == EOF and self.quit_on_eof:
                 # ctrl-D (unix) / ctrl-Z (windows)
                 self._input_queue.put(signals.Event(signals.QUIT))
@@ -19,10 +19,10 @@ from ..basic.base import scancode
 from ..basic.base.eascii import as_unicode as uea
 from ..basic.base import signals
 from ..compat import MACOS, PY2, console
-from ..compat import iter_chunks
 
 from .video import VideoPlugin
 from .base import video_plugins, InitFailed
+from .textgrid import TextGrid
 
 if PY2:
     # curses works with bytes in Python 2
@@ -87,6 +87,10 @@ if curses:
 class VideoCurses(VideoPlugin):
     """Curses-based text interface."""
 
+    text_only = True
+    # keyboard input is polled for through the curses window
+    poll_interval = 12
+
     def __init__(self, input_queue, video_queue, caption=u'', border_width=0, **kwargs):
         """Initialise the text interface."""
         logging.warning('The `curses` interface is deprecated, please use the `text` interface instead.')
@@ -121,6 +125,8 @@ class VideoCurses(VideoPlugin):
         self.window = None
         self.can_change_palette = None
         self._attributes = []
+        # cells shown and to be shown in the window
+        self._grid = TextGrid(self.height, self.width)
 
     def __enter__(self):
         """Open ANSI interface."""
@@ -177,6 +183,21 @@ class VideoCurses(VideoPlugin):
 
     def _work(self):
         """Handle screen and interface events."""
+        # put the cells changed since last time
+        for row, col, unicode_list, attr in self._grid.flush():
+            fore, back, blink, underline = self._attributes[attr]
+            unicode_list = [_c if _c != u'\0' else u' ' for _c in unicode_list]
+            colour = self._curses_colour(fore, back, blink)
+            if colour != self.last_colour:
+                self.last_colour = colour
+                self.window.bkgdset(32, colour)
+            try:
+                self.window.addstr(
+                    self.border_y+row-1, self.border_x+col-1,
+                    _to_str(u''.join(unicode_list)), colour
+                )
+            except curses.error:
+                pass
         if self.cursor_visible:
             self.window.move(self.border_y+self.cursor_row-1, self.border_x+self.cursor_col-1)
         self.window.refresh()
@@ -298,6 +319,7 @@ class VideoCurses(VideoPlugin):
         """Change screen mode."""
         self.height = text_height
         self.width = text_width
+        self._grid.resize(self.height, self.width)
         bgcolor = self._curses_colour(7, 0, False)
         self._resize(self.height, self.width)
         self._set_curses_palette()
@@ -307,7 +329,9 @@ class VideoCurses(VideoPlugin):
 
     def clear_rows(self, back_attr, start, stop):
         """Clear screen rows."""
+        self._grid.clear_rows(start, stop)
         bgcolor = self._curses_colour(7, back_attr, False)
+        self.last_colour = bgcolor
         self.window.bkgdset(32, bgcolor)
         for r in range(start, stop+1):
             try:
@@ -335,6 +359,9 @@ class VideoCurses(VideoPlugin):
         blink = tuple(_blink for _, _, _blink, _ in attributes)
         under = tuple(_under for _, _, _, _under in attributes)
         int_attributes = zip(fore, back, blink, under)
+        if int_attributes != self._attributes:
+            # cells shown may now need different colours
+            self._grid.invalidate()
         self._attributes = int_attributes
         if self.can_change_palette:
             for i, rgb in enumerate(rgb_table):
@@ -377,28 +404,14 @@ class VideoCurses(VideoPlugin):
 
     def update(self, row, col, unicode_matrix, attr_matrix, y0, x0, sprite):
         """Put text or pixels at a given position."""
-        start_col = col
+        # cells are put in the window on the next cycle, if they changed
         for text, attrs in zip(unicode_matrix, attr_matrix):
-            for unicode_list, attr in iter_chunks(text, attrs):
-                fore, back, blink, underline = self._attributes[attr]
-                unicode_list = [_c if _c != u'\0' else u' ' for _c in unicode_list]
-                colour = self._curses_colour(fore, back, blink)
-                #if colour != self.last_colour:
-                self.last_colour = colour
-                self.window.bkgdset(32, colour)
-                try:
-                    self.window.addstr(
-                        self.border_y+row-1, self.border_x+col-1,
-                        _to_str(u''.join(unicode_list)), colour
-                    )
-                except curses.error:
-                    pass
-                col += len(unicode_list)
+            self._grid.put(row, col, text, attrs)
             row += 1
-            col = start_col
 
     def scroll(self, direction, from_line, scroll_height, back_attr):
         """Scroll the screen between from_line and scroll_height."""
+        self._grid.scroll(direction, from_line, scroll_height)
         if direction == -1:
             self._scroll_up(from_line, scroll_height, back_attr)
         else:
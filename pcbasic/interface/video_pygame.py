@@ -33,12 +33,19 @@ BLINK_CYCLES = 5
 # ms duration of a blink
 BLINK_TIME = 120
 CYCLE_TIME = BLINK_TIME // BLINK_CYCLES
+# ms between polls of the pygame event queue
+POLL_TIME = 12
 
 
 @video_plugins.register('pygame')
 class VideoPygame(VideoPlugin):
     """Pygame-based graphical interface."""
 
+    # only pixels are shown, so these can be taken from the shared frame
+    frame_shared = True
+    # pygame events can't wake the interface loop, so they are polled for
+    poll_interval = POLL_TIME
+
     def __init__(
             self, input_queue, video_queue,
             caption=u'', icon=ICON,
@@ -344,10 +351,6 @@ class VideoPygame(VideoPlugin):
     ###########################################################################
     # screen drawing cycle
 
-    def sleep(self, ms):
-        """Sleep a tick to avoid hogging the cpu."""
-        pygame.time.wait(ms)
-
     def _work(self):
         """Check screen and blink events; update screen if necessary."""
         if not self._has_window:
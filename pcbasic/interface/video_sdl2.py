@@ -42,6 +42,8 @@ N_BLINK_STATES = 4
 # ms duration of a blink
 BLINK_TIME = 120
 CYCLE_TIME = BLINK_TIME // BLINK_CYCLES
+# above this number of changed areas in a cycle, flip the whole screen
+MAX_DIRTY_RECTS = 32
 
 
 
@@ -327,6 +329,9 @@ def _pixels2d(surface_ptr):
 class VideoSDL2(VideoPlugin):
     """SDL2-based graphical interface."""
 
+    # pixels are copied straight from the shared frame onto the window surface
+    frame_shared = True
+
     def __init__(
             self, input_queue, video_queue,
             caption=u'', icon=ICON,
@@ -396,6 +401,12 @@ class VideoSDL2(VideoPlugin):
         self._window_surface = None
         # pixel views of canvases
         self._canvas_pixels = None
+        # work surface converted to display pixel format
+        self._conv_surface = None
+        # areas of the work surface changed since last flip, as (x, y, w, h)
+        self._dirty_rects = []
+        # blink state currently on the display
+        self._shown_blink_state = None
         # main window object
         self._display = None
         self._display_surface = None
@@ -483,6 +494,8 @@ class VideoSDL2(VideoPlugin):
         # free surfaces
         if self._window_surface:
             sdl2.SDL_FreeSurface(self._window_surface)
+        if self._conv_surface:
+            sdl2.SDL_FreeSurface(self._conv_surface)
         # free palettes
         for palette in self._palette:
             sdl2.SDL_FreePalette(palette)
@@ -539,6 +552,17 @@ class VideoSDL2(VideoPlugin):
             for _ in range(N_BLINK_STATES)
         ]
         self._has_display_cache = [False] * N_BLINK_STATES
+        self._reset_conv_surface()
+
+    def _reset_conv_surface(self):
+        """Create the converted work surface in the current display pixel format."""
+        if self._conv_surface:
+            sdl2.SDL_FreeSurface(self._conv_surface)
+            self._conv_surface = None
+        if self._window_surface and self._display_surface:
+            self._conv_surface = sdl2.SDL_ConvertSurface(
+                self._window_surface, self._display_surface.contents.format, 0
+            )
 
 
     ###########################################################################
@@ -801,9 +825,24 @@ class VideoSDL2(VideoPlugin):
     ###########################################################################
     # screen drawing cycle
 
-    def sleep(self, ms):
-        """Sleep a tick to avoid hogging the cpu."""
-        sdl2.SDL_Delay(ms)
+    def wait(self, wakeup):
+        """Wait for SDL events or signals, or until the next cycle is due."""
+        # a notification after this check pushes an event, so that the wait returns
+        if wakeup.is_set():
+            return
+        if self.busy or self._dirty_rects or self._palette_blinks or self._text_cursor:
+            timeout = CYCLE_TIME - (sdl2.SDL_GetTicks() - self._last_tick)
+            if timeout > 0:
+                sdl2.SDL_WaitEventTimeout(None, timeout)
+        else:
+            # nothing changes on screen until something happens
+            sdl2.SDL_WaitEvent(None)
+
+    def wake(self):
+        """Interrupt a wait on SDL events; called from other threads."""
+        event = sdl2.SDL_Event()
+        event.type = sdl2.SDL_USEREVENT
+        sdl2.SDL_PushEvent(ctypes.byref(event))
 
     def _work(self):
         """Check screen and blink events; update screen if necessary."""
@@ -829,13 +868,33 @@ class VideoSDL2(VideoPlugin):
             if not self._palette_blinks and not self._text_cursor:
                 blink_state = 1
             # flip display fully if changed, use cache if just blinking
-            if self.busy:
+            if self.busy or (self._dirty_rects and not self._can_flip_dirty(blink_state)):
                 self._clear_display_cache()
                 self._flip_busy(blink_state)
                 self.busy = False
+            elif self._dirty_rects:
+                self._flip_dirty(blink_state)
             elif (self._palette_blinks or self._text_cursor) and blink_tock == 0:
                 self._flip_lazy(blink_state)
 
+    def _mark_dirty(self, x, y, width, height):
+        """Record a changed area of the canvas, to be flipped on the next cycle."""
+        if self.busy or width <= 0 or height <= 0:
+            return
+        if len(self._dirty_rects) >= MAX_DIRTY_RECTS:
+            self.busy = True
+            return
+        border_x, border_y = self._window_sizer.border_shift
+        self._dirty_rects.append((x + border_x, y + border_y, width, height))
+
+    def _can_flip_dirty(self, blink_state):
+        """Changed areas can be flipped by themselves, without redrawing the rest."""
+        return (
+            self._conv_surface and not self._pixel_packing
+            and blink_state == self._shown_blink_state
+            and not self._clipboard_interface.active()
+        )
+
     def _clear_display_cache(self):
         """Clear cursor cache on busy flip."""
         # one cache per blink state
@@ -848,6 +907,7 @@ class VideoSDL2(VideoPlugin):
                 self._display_cache[blink_state], None, self._display_surface, None
             )
             sdl2.SDL_UpdateWindowSurface(self._display)
+            self._shown_blink_state = blink_state
         else:
             # if we don't have a cache for this state, build it
             self._flip_busy(blink_state)
@@ -858,12 +918,14 @@ class VideoSDL2(VideoPlugin):
             work_surface = self._create_composite_surface()
         else:
             work_surface = self._window_surface
-        pixelformat = self._display_surface.contents.format
+        if not self._conv_surface:
+            self._reset_conv_surface()
+        conv = self._conv_surface
         # apply cursor to work surface
         with self._show_cursor((blink_state % 2) or not self._text_cursor):
             # convert 8-bit work surface to (usually) 32-bit display surface format
             sdl2.SDL_SetSurfacePalette(work_surface, self._palette[blink_state // 2])
-            conv = sdl2.SDL_ConvertSurface(work_surface, pixelformat, 0)
+            sdl2.SDL_BlitSurface(work_surface, None, conv, None)
         if self._pixel_packing:
             sdl2.SDL_FreeSurface(work_surface)
         # create clipboard feedback
@@ -871,8 +933,80 @@ class VideoSDL2(VideoPlugin):
             self._show_clipboard(conv)
         # scale surface to final dimensions and flip
         self._scale_and_flip(conv, blink_state)
-        # destroy the temporary surface
-        sdl2.SDL_FreeSurface(conv)
+        self._shown_blink_state = blink_state
+        self._dirty_rects = []
+
+    def _flip_dirty(self, blink_state):
+        """Convert, scale and flip only the changed areas of the canvas."""
+        conv = self._conv_surface
+        # apply cursor to work surface
+        with self._show_cursor((blink_state % 2) or not self._text_cursor):
+            sdl2.SDL_SetSurfacePalette(self._window_surface, self._palette[blink_state // 2])
+            for rect in self._dirty_rects:
+                # blitting changes the destination rect, so use separate ones
+                sdl2.SDL_BlitSurface(
+                    self._window_surface, sdl2.SDL_Rect(*rect), conv, sdl2.SDL_Rect(*rect)
+                )
+        targets = [self._scale_rect(conv, _rect) for _rect in self._dirty_rects]
+        self._dirty_rects = []
+        # the caches for other blink states no longer match the display
+        has_cache = self._has_display_cache[blink_state]
+        self._clear_display_cache()
+        if has_cache:
+            for target in targets:
+                sdl2.SDL_BlitSurface(
+                    self._display_surface, sdl2.SDL_Rect(*target),
+                    self._display_cache[blink_state], sdl2.SDL_Rect(*target)
+                )
+            self._has_display_cache[blink_state] = True
+        # flip the changed areas only
+        sdl2.SDL_UpdateWindowSurfaceRects(
+            self._display,
+            (sdl2.SDL_Rect * len(targets))(*(sdl2.SDL_Rect(*_t) for _t in targets)),
+            len(targets)
+        )
+
+    def _scale_rect(self, conv, rect):
+        """Scale an area of the converted surface onto the display; return the area on display."""
+        x, y, width, height = rect
+        xshift, yshift = self._window_sizer.letterbox_shift
+        scalex, scaley = self._window_sizer.scale
+        # round the edges the same way for neighbouring areas, so that they meet
+        left, top = int(x * scalex), int(y * scaley)
+        right, bottom = int((x + width) * scalex), int((y + height) * scaley)
+        target = xshift + left, yshift + top, right - left, bottom - top
+        if not self._smooth:
+            sdl2.SDL_BlitScaled(
+                conv, sdl2.SDL_Rect(x, y, width, height), self._display_surface,
+                sdl2.SDL_Rect(*target)
+            )
+            return target
+        # smooth-scale the area with a margin, so that its edges blend with their surroundings
+        work_w, work_h = self._window_sizer.window_size_logical
+        margin_x, margin_y = max(0, x-1), max(0, y-1)
+        margin_w = min(work_w, x + width + 1) - margin_x
+        margin_h = min(work_h, y + height + 1) - margin_y
+        pixelformat = conv.contents.format.contents
+        area = sdl2.SDL_CreateRGBSurface(
+            0, margin_w, margin_h, pixelformat.BitsPerPixel,
+            pixelformat.Rmask, pixelformat.Gmask, pixelformat.Bmask, pixelformat.Amask
+        )
+        sdl2.SDL_BlitSurface(
+            conv, sdl2.SDL_Rect(margin_x, margin_y, margin_w, margin_h), area, None
+        )
+        # SMOOTHING_ON = 1
+        zoomed = _smooth_zoom(area, scalex, scaley, 1)
+        sdl2.SDL_BlitSurface(
+            zoomed,
+            sdl2.SDL_Rect(
+                left - int(margin_x * scalex), top - int(margin_y * scaley),
+                right - left, bottom - top
+            ),
+            self._display_surface, sdl2.SDL_Rect(*target)
+        )
+        sdl2.SDL_FreeSurface(zoomed)
+        sdl2.SDL_FreeSurface(area)
+        return target
 
     def _scale_and_flip(self, conv, blink_state):
         """Scale converted surface and flip onto display."""
@@ -997,6 +1131,7 @@ class VideoSDL2(VideoPlugin):
         self._canvas_pixels = _pixels2d(self._window_surface)[
             border_y : work_height - border_y, border_x : work_width - border_x
         ]
+        self._reset_conv_surface()
         # initialise clipboard
         self._clipboard_interface = clipboard.ClipboardInterface(
             self._clipboard_handler, self._input_queue,
@@ -1055,7 +1190,11 @@ class VideoSDL2(VideoPlugin):
             (start-1)*self._font_height : stop*self._font_height,
             0 : self._window_sizer.width
         ] = back_attr
-        self.busy = True
+        top = (start-1) * self._font_height
+        self._mark_dirty(
+            0, top, self._window_sizer.width,
+            min(stop*self._font_height, self._window_sizer.height) - top
+        )
 
     def show_cursor(self, cursor_on, cursor_blinks):
         """Change visibility of cursor."""
@@ -1098,7 +1237,7 @@ class VideoSDL2(VideoPlugin):
             pixels[lo_y0:lo_y1, :] = pixels[hi_y0:hi_y1, :].copy()
             # clear the new empty line
             pixels[hi_y0:lo_y0, :] = back_attr
-        self.busy = True
+        self._mark_dirty(0, hi_y0, pixels.width, min(lo_y1, pixels.height) - hi_y0)
 
     def update(self, row, col, unicode_matrix, attr_matrix, y0, x0, sprite):
         """Put text or pixels at a given position."""
@@ -1110,4 +1249,13 @@ class VideoSDL2(VideoPlugin):
         if y0 + sprite.height > pixels.height or x0 + sprite.width > pixels.width:
             sprite = sprite[:pixels.height-y0, :pixels.width-x0]
         pixels[y0:y0+sprite.height, x0:x0+sprite.width] = sprite
-        self.busy = True
+        self._mark_dirty(x0, y0, sprite.width, sprite.height)
+
+    def update_from_frame(self, shared_frame, rects):
+        """Copy pixels from rectangles of the shared frame."""
+        pixels = self._canvas_pixels
+        shared_frame.copy_to(pixels, rects)
+        for x0, y0, x1, y1 in rects:
+            self._mark_dirty(
+                x0, y0, min(x1+1, pixels.width) - x0, min(y1+1, pixels.height) - y0
+            )
@@ -8,8 +8,12 @@ This file is released under the GNU GPL version 3 or later.
 
 import os
 import shutil
+import random
+import struct
+import wave
 
 from pcbasic import Session
+from pcbasic.basic.devices.cassette import CASBitStream, WAVBitStream, EndOfTape
 from tests.unit.utils import TestCase, run_tests
 
 
@@ -24,6 +28,27 @@ def _output_file(name):
     """Test output file."""
     return os.path.join(HERE, 'output', 'cassette', name)
 
+def _reference_halfpulses(frames, sampwidth, nchannels):
+    """Half-pulse lengths found sample by sample, as the WAV decoder used to."""
+    if sampwidth == 1:
+        sub_threshold, subtractor = 0, 128*nchannels
+    else:
+        sub_threshold, subtractor = 256*nchannels//2, 256*nchannels
+    msbs = bytearray(frames[sampwidth-1::sampwidth])
+    samples = [sum(msbs[_i:_i+nchannels]) for _i in range(0, len(msbs)-nchannels+1, nchannels)]
+    samples = [_x-subtractor if _x >= sub_threshold else _x for _x in samples]
+    lengths = []
+    length, frame, prezero = 0, 1, 1
+    for sample in samples:
+        length += 1
+        last, frame = frame, (sample > nchannels) + (sample >= -nchannels) - 1
+        if last != frame and (last != 0 or frame == prezero):
+            if frame == 0 and last != 0:
+                prezero = last
+            lengths.append(length)
+            length = 0
+    return lengths
+
 
 class CassetteTest(TestCase):
     """Cassette tests."""
@@ -161,6 +186,134 @@ class CassetteTest(TestCase):
             s.execute('run "cas1:"')
             assert s.get_variable('A%') == 12345
 
+    def test_wav_halfpulses(self):
+        """Half-pulses in a noisy WAV file agree with the sample-by-sample reference."""
+        rand = random.Random(0)
+        # images ending on a level and ending in silence
+        for sampwidth, nchannels, trailer in (
+                (1, 1, 0), (2, 1, 0), (1, 2, 0), (2, 2, 0),
+                (1, 1, 5), (2, 2, 5), (1, 1, 2500),
+            ):
+            amplitude = 100 if sampwidth == 1 else 25000
+            pack = struct.Struct('<B' if sampwidth == 1 else '<h').pack
+            offset = 128 if sampwidth == 1 else 0
+            frames = []
+            for i in range(3000):
+                if i % 1000 == 500:
+                    # silence longer than a block
+                    frames.append(pack(offset) * nchannels * 2500)
+                # half-pulses of random length, with noise and the occasional silence
+                level = rand.choice((-amplitude, amplitude, 0))
+                for _ in range(rand.randint(1, 20)):
+                    for _ in range(nchannels):
+                        noise = rand.randint(-amplitude//20, amplitude//20)
+                        frames.append(pack(offset + level + noise))
+            # end on a level, so that any trailing silence follows a crossing into zero
+            frames.append(pack(offset + amplitude) * nchannels * 10)
+            frames.append(pack(offset) * nchannels * trailer)
+            frames = b''.join(frames)
+            name = _output_file('noise.wav')
+            wav = wave.open(name, 'wb')
+            wav.setnchannels(nchannels)
+            wav.setsampwidth(sampwidth)
+            wav.setframerate(22050)
+            wav.writeframes(frames)
+            wav.close()
+            stream = WAVBitStream(name, 'r')
+            stream.buf_len = 1000
+            lengths = []
+            try:
+                while True:
+                    lengths.append(next(stream.read_half))
+            except EndOfTape:
+                pass
+            stream.wav.close()
+            assert lengths == _reference_halfpulses(frames, sampwidth, nchannels)
+            assert stream.wav_pos == sum(lengths)
+
+    def test_cas_bits(self):
+        """Bytes read and written off byte boundaries agree with single bits."""
+        name = _output_file('bits.cas')
+        try:
+            os.remove(name)
+        except EnvironmentError:
+            pass
+        rand = random.Random(0)
+        bits = []
+        # the intro leaves the tape off byte boundaries
+        with CASBitStream(name, 'w') as stream:
+            for _ in range(40):
+                if rand.random() < 0.5:
+                    for _ in range(rand.randint(1, 7)):
+                        bits.append(rand.randint(0, 1))
+                        stream.write_bit(bits[-1])
+                else:
+                    data = bytearray(rand.randrange(256) for _ in range(rand.randint(1, 300)))
+                    bits.extend((_b >> (7 - _i)) & 1 for _b in data for _i in range(8))
+                    stream.write_bytes(data)
+        with CASBitStream(name, 'r') as stream:
+            pos = 0
+            overwrites = 3
+            while len(bits) - pos >= 8:
+                if rand.random() < 0.5:
+                    assert stream.read_bit() == bits[pos]
+                    pos += 1
+                else:
+                    count = rand.randint(1, (len(bits) - pos) // 8)
+                    data = bytearray(stream.read_bytes(count))
+                    assert [(_b >> (7 - _i)) & 1 for _b in data for _i in range(8)] == (
+                        bits[pos:pos+8*count]
+                    )
+                    pos += 8 * count
+                    if overwrites and count > 1 and len(bits) - pos >= 16:
+                        overwrites -= 1
+                        # overwrite some bytes, keeping the bits around them
+                        stream.switch_mode('w')
+                        stream.write_bytes(b'\x0f\x0f')
+                        bits[pos:pos+16] = [0, 0, 0, 0, 1, 1, 1, 1] * 2
+                        stream.wind(0)
+                        stream.read_intro()
+                        pos = 0
+            # less than a byte is left, plus padding to the byte boundary
+            with self.assertRaises(EndOfTape):
+                stream.read_bytes(2)
+        with CASBitStream(name, 'r') as stream:
+            assert [stream.read_bit() for _ in range(len(bits))] == bits
+
+    def test_cas_index(self):
+        """Search the tape through the header index, updated after writing."""
+        for name in ('index.cas', 'index.wav'):
+            try:
+                os.remove(_output_file(name))
+            except EnvironmentError:
+                pass
+            with Session(devices={b'CAS1:': _output_file(name)}) as s:
+                for i in range(4):
+                    s.execute('10 print %d' % i)
+                    s.execute('save "cas1:p%d"' % i)
+            with Session(devices={b'CAS1:': _output_file(name)}) as s:
+                s.execute('load "cas1:p1"')
+                tape = s._impl.files.get_device(b'CAS1:').tapestream
+                headers = tape.headers()
+                assert [_h[1] for _h in headers] == [b'p2      ', b'p3      ']
+                # overwrite p2; p3 is still there
+                s.execute('10 print 5')
+                s.execute('save "cas1:q"')
+                s.execute('load "cas1:p0"')
+                s.execute('load "cas1:q"')
+                s.execute('run')
+                output = [_row.strip() for _row in self.get_text(s)]
+            assert output[:8] == [
+                b'p0      .B Skipped.',
+                b'p1      .B Found.',
+                b'p3      .B Skipped.',
+                b'Device Timeout\xff',
+                b'p0      .B Skipped.',
+                b'p1      .B Skipped.',
+                b'q       .B Found.',
+                b'5',
+            ]
+
     def test_cas_empty(self):
         """Attach empty CAS file."""
         try:
@@ -8,12 +8,52 @@ This file is released under the GNU GPL version 3 or later.
 
 import unittest
 import os
+import io
+import random
 import platform
 
 from pcbasic import Session
+from pcbasic.basic.devices.diskfiles import TextFile, Locks
 from tests.unit.utils import TestCase, run_tests
 
 
+def _read_line_by_char(text_file):
+    """Read a line character by character, as TextFile used to."""
+    s = []
+    while True:
+        c = text_file.read_one()
+        if not c or (c == b'\r' and text_file._previous != b'\n'):
+            break
+        s.append(c)
+        if len(s) == 255:
+            c = b'\r' if text_file.peek(1) == b'\r' else None
+            break
+    return b''.join(s), c
+
+def _write_by_char(stream, s, col, width):
+    """Write characters one at a time, as TextFile used to; return the new column."""
+    s_width = 0
+    newline = False
+    for c in bytearray(s):
+        if c in (0x0d, 0x0a):
+            newline = True
+            break
+        if c >= 0x20:
+            s_width += 1
+    if width != 255 and col != 1 and col-1 + s_width > width and not newline:
+        stream.write(b'\r\n')
+        col = 1
+    for c in bytearray(s):
+        stream.write(bytearray([c]))
+        if c == 0x0d:
+            col = 1
+        elif c >= 0x20:
+            col += 1
+            if col == 257:
+                col = 1
+    return col
+
+
 class DiskTest(TestCase):
     """Disk tests."""
 
@@ -194,6 +234,45 @@ class DiskTest(TestCase):
             assert s.get_variable('A$') == b' 1234 '
             assert s.get_variable('B$') == b'abcde'
 
+    def test_text_file_read_line(self):
+        """Lines read from a block agree with lines read character by character."""
+        rand = random.Random(0)
+        pieces = [b'a', b'b', b'\r', b'\n', b'\r\n', b'\n\r', b'\x1a']
+        for _ in range(100):
+            data = b''.join(
+                rand.choice(pieces[:-1] * 5 + pieces[-1:] + [b'x' * rand.randint(200, 300)])
+                for _ in range(rand.randint(0, 60))
+            )
+            text_file = TextFile(io.BytesIO(data), b'D', None, b'I', Locks())
+            reference = TextFile(io.BytesIO(data), b'D', None, b'I', Locks())
+            for _ in range(100):
+                if rand.random() < 0.8:
+                    assert text_file.read_line() == _read_line_by_char(reference)
+                else:
+                    num = rand.randint(1, 3)
+                    assert text_file.read(num) == reference.read(num)
+                assert text_file.loc() == reference.loc()
+                assert text_file.eof() == reference.eof()
+                assert text_file._previous == reference._previous
+                assert text_file._current == reference._current
+                if reference.eof():
+                    break
+
+    def test_text_file_write(self):
+        """Columns and line breaks agree with writing character by character."""
+        rand = random.Random(0)
+        pieces = [b'a', b'\r', b'\n', b'\t', b'\x01', b'\xff', b'abcdefghij', b'x' * 300]
+        for width in (1, 10, 80, 255):
+            text_file = TextFile(io.BytesIO(), b'D', None, b'O', Locks())
+            text_file.set_width(width)
+            reference, col = io.BytesIO(), 1
+            for _ in range(300):
+                s = b''.join(rand.choice(pieces) for _ in range(rand.randint(0, 40)))
+                text_file.write(s)
+                col = _write_by_char(reference, s, col, width)
+                assert text_file.col == col
+            assert text_file._fhandle.getvalue() == reference.getvalue()
+
     def test_disk_random(self):
         """Write and read data to a random access file."""
         with Session(devices={b'A': self.output_path()}) as s:
@@ -209,6 +288,54 @@ class DiskTest(TestCase):
             assert s.get_variable('A$') == b' 1234 \r\n'.ljust(20, b'\0')
             assert s.get_variable('B$') == b'abcde'.ljust(20, b' ')
 
+    def test_disk_random_shared(self):
+        """Random access file open under two numbers shares changes before they are written."""
+        path = self.output_path('SHARED')
+        with Session(devices={b'A': self.output_path()}) as s:
+            s.execute('open "a:shared" for random as 1 len = 10')
+            s.execute('open "a:shared" for random as 2 len = 4')
+            s.execute('field#1, 10 as a$: field#2, 4 as b$')
+            s.execute('lset a$ = "0123456789": put#1, 2')
+            s.execute('get#2, 5')
+            assert s.get_variable('B$') == b'6789'
+            s.execute('get#2, 2')
+            assert s.get_variable('B$') == b'\0\0\0\0'
+            s.execute('lset b$ = "abcd": put#2, 7')
+            assert s.evaluate('lof(1)') == 28
+            # records past the end read as NULL
+            s.execute('get#1, 4')
+            assert s.get_variable('A$') == b'\0' * 10
+            s.execute('get#1, 3')
+            assert s.get_variable('A$') == b'\0\0\0\0abcd\0\0'
+            assert os.path.getsize(path) == 0
+            # changes are written on locking
+            s.execute('lock#1, 1')
+            assert os.path.getsize(path) == 28
+            s.execute('unlock#1, 1')
+            s.execute('lset a$ = "ABCDEFGHIJ": put#1, 1')
+            s.execute('close#2')
+            s.execute('get#1, 1')
+            assert s.get_variable('A$') == b'ABCDEFGHIJ'
+        with open(path, 'rb') as f:
+            assert f.read() == b'ABCDEFGHIJ0123456789\0\0\0\0abcd'
+
+    def test_disk_random_mixed(self):
+        """Changes to a random access file are seen when it is opened in another mode."""
+        path = self.output_path('R.DAT')
+        with Session(devices={b'A': self.output_path()}) as s:
+            s.execute('open "r", #1, "a:r.dat", 4: field #1, 4 as a$')
+            s.execute('lset a$ = "ABCD": put #1, 1')
+            s.execute('open "i", #2, "a:r.dat": line input #2, b$: close #2')
+            assert s.get_variable('B$') == b'ABCD'
+            s.execute('lset a$ = "EFGH": put #1, 2')
+            s.execute('open "i", #2, "a:r.dat": line input #2, b$')
+            assert s.get_variable('B$') == b'ABCDEFGH'
+            s.execute('get #1, 1')
+            assert s.get_variable('A$') == b'ABCD'
+            s.execute('close')
+        with open(path, 'rb') as f:
+            assert f.read() == b'ABCDEFGH'
+
     def test_match_name(self):
         """Test case-insensitive matching of native file name."""
         # this will be case sensitive on some platforms but should be picked up correctly anyway
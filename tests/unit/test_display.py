@@ -8,12 +8,138 @@ This file is released under the GNU GPL version 3 or later.
 
 import unittest
 import os
+import io
+import time
+import zlib
+import struct
 
 from pcbasic import Session
-from pcbasic.compat import int2byte
+from pcbasic.compat import int2byte, queue
+from pcbasic.basic.base import signals
+from pcbasic.basic.base.bytematrix import ByteMatrix
+from pcbasic.basic.display import recorder
 from tests.unit.utils import TestCase, run_tests
 
 
+class _SteppingClock(object):
+    """Stand-in for the time module; the clock advances by a fixed step on each reading."""
+
+    def __init__(self, step):
+        self._now = 0.
+        self._step = step
+
+    def time(self):
+        self._now += self._step
+        return self._now
+
+
+def _read_png_chunks(data):
+    """List the (type, data) chunks of a PNG file."""
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks, offset = [], 8
+    while offset < len(data):
+        length, = struct.unpack('>I', data[offset:offset+4])
+        chunk_type, chunk = data[offset+4:offset+8], data[offset+8:offset+8+length]
+        crc, = struct.unpack('>I', data[offset+8+length:offset+12+length])
+        assert crc == zlib.crc32(chunk_type + chunk) & 0xffffffff
+        chunks.append((chunk_type, chunk))
+        offset += 12 + length
+    return chunks
+
+
+def _read_png_rows(data, width):
+    """Decompress unfiltered PNG image data to rows of palette indices."""
+    raw = bytearray(zlib.decompress(data))
+    assert not any(raw[::width+1])
+    return [bytes(raw[_offset+1 : _offset+1+width]) for _offset in range(0, len(raw), width+1)]
+
+
+class _TextRecorder(object):
+    """Interface stand-in that keeps the text screen built from video signals."""
+
+    def __init__(self):
+        self._queues = queue.Queue(), queue.Queue(), queue.Queue()
+        self.text = []
+        self.updates = 0
+
+    def get_queues(self):
+        return self._queues
+
+    def is_text_only(self):
+        return True
+
+    def is_frame_paced(self):
+        return True
+
+    def is_frame_shared(self):
+        return False
+
+    def replay(self):
+        """Apply the video signals received so far."""
+        video = self._queues[1]
+        while not video.empty():
+            signal = video.get()
+            if signal.event_type == signals.VIDEO_SET_MODE:
+                _, _, height, width = signal.params
+                self.text = [[u' '] * width for _ in range(height)]
+            elif signal.event_type == signals.VIDEO_UPDATE:
+                self.updates += 1
+                top, left, text = signal.params[:3]
+                for row, chars in enumerate(text, top):
+                    self.text[row-1][left-1:left-1+len(chars)] = chars
+            elif signal.event_type == signals.VIDEO_SCROLL:
+                direction, start, stop, _ = signal.params
+                blank = [u' '] * len(self.text[0])
+                if direction < 0:
+                    self.text[start-1:stop] = self.text[start:stop] + [blank]
+                else:
+                    self.text[start-1:stop] = [blank] + self.text[start-1:stop-1]
+            elif signal.event_type == signals.VIDEO_CLEAR_ROWS:
+                _, start, stop = signal.params
+                for row in range(start, stop+1):
+                    self.text[row-1] = [u' '] * len(self.text[0])
+
+
+class _FrameRecorder(_TextRecorder):
+    """Interface stand-in that keeps the pixels taken from the shared frame."""
+
+    def __init__(self):
+        _TextRecorder.__init__(self)
+        self.frame = None
+        self.pixels = None
+        self.pending = []
+
+    def is_text_only(self):
+        return False
+
+    def is_frame_shared(self):
+        return True
+
+    def receive(self):
+        """Take the video signals received so far, without releasing the frame."""
+        video = self._queues[1]
+        while not video.empty():
+            signal = video.get()
+            if signal.event_type == signals.VIDEO_SET_MODE:
+                height, width, rows, _ = signal.params
+                self.pixels = ByteMatrix(height, width)
+                self.font_height = height // rows
+            elif signal.event_type == signals.VIDEO_SHARE_FRAME:
+                self.frame, = signal.params
+            elif signal.event_type == signals.VIDEO_UPDATE_FRAME:
+                self.pending.append((self.frame,) + signal.params)
+            elif signal.event_type == signals.VIDEO_CLEAR_ROWS:
+                back, start, stop = signal.params
+                self.pixels[(start-1)*self.font_height:stop*self.font_height, :] = back
+
+    def release(self):
+        """Copy the pending updates from the shared frame and release it."""
+        for frame, generation, rects in self.pending:
+            frame.copy_to(self.pixels, rects)
+            frame.release(generation)
+        self.pending = []
+
+
 class DisplayTest(TestCase):
     """Unit tests for display."""
 
@@ -49,6 +175,260 @@ class DisplayTest(TestCase):
                 model_chars = model.read()
             assert bytes(bytearray(_c for _r in self.get_text(s) for _c in _r)) == model_chars
 
+    def test_line_style(self):
+        """Draw styled lines and boxes."""
+        with Session() as s:
+            s.execute(b'''
+                10 SCREEN 2
+                20 LINE (0, 0)-(39, 0), 1, , &HF0F0
+                30 LINE (39, 2)-(0, 2), 1, , &HAAAA
+                40 LINE (0, 4)-(7, 11), 1, B, &HFF00
+                RUN
+            ''')
+            pixels = s.get_pixels()
+        # lines at constant height are drawn from the second point given
+        assert pixels[0][:40] == ((0,)*4 + (1,)*4) * 5
+        assert pixels[2][:40] == (1, 0) * 20
+        # box: bottom and top sides first, right to left; then verticals top to bottom
+        assert pixels[11][:8] == (1,) * 8
+        assert pixels[4][:7] == (0,) * 7
+        assert tuple(_row[7] for _row in pixels[4:12]) == (1,) * 8
+        assert tuple(_row[0] for _row in pixels[4:11]) == (0,) * 7
+
+    def test_line_diagonal_clipped(self):
+        """Draw diagonal lines clipped by the graphics viewport."""
+        with Session() as s:
+            s.execute(b'''
+                10 SCREEN 2
+                20 VIEW SCREEN (10, 10)-(19, 19)
+                30 LINE (0, 0)-(29, 29), 1
+                40 LINE (0, 12)-(29, 12), 1
+                RUN
+            ''')
+            pixels = s.get_pixels()
+        lit = set(
+            (_x, _y) for _y, _row in enumerate(pixels) for _x, _c in enumerate(_row) if _c
+        )
+        diagonal = set((_i, _i) for _i in range(10, 20))
+        horizontal = set((_x, 12) for _x in range(10, 20))
+        assert lit == diagonal | horizontal
+
+    def test_circle_arc(self):
+        """Draw circles and arcs."""
+        with Session() as s:
+            s.execute(b'''
+                10 SCREEN 2
+                20 CIRCLE (50, 50), 20, 1, , , 1
+                30 CIRCLE (150, 50), 20, 1, 1.5708, 3.1416, 1
+                40 CIRCLE (250, 50), 20, 1, , , 1
+                RUN
+            ''')
+            pixels = s.get_pixels()
+        def lit(x0, x1):
+            return set(
+                (_x - x0, _y) for _y, _row in enumerate(pixels)
+                for _x, _c in enumerate(_row[x0:x1], x0) if _c
+            )
+        circle, arc, repeat = lit(0, 100), lit(100, 200), lit(200, 300)
+        assert repeat == circle
+        # arc from pi/2 to pi is the upper left quadrant of the circle
+        assert arc == set((_x, _y) for _x, _y in circle if _x <= 50 and _y <= 50)
+
+    def test_draw_repeat(self):
+        """Repeat DRAW strings, with and without variables."""
+        with Session() as s:
+            s.execute(b'''
+                10 SCREEN 2
+                20 FOR I = 0 TO 2
+                30   PSET (20*I, 0), 1: DRAW "R4 D4"
+                40   PSET (20*I, 10), 1: A$ = "R" + MID$(STR$(I+1), 2): DRAW "XA$;"
+                50   PSET (20*I, 20), 1: DRAW "D=I;"
+                60 NEXT
+                RUN
+            ''')
+            pixels = s.get_pixels()
+        for i in range(3):
+            assert pixels[0][20*i:20*i+6] == (1,) * 5 + (0,)
+            assert tuple(_row[20*i+4] for _row in pixels[0:6]) == (1,) * 5 + (0,)
+            assert pixels[10][20*i:20*i+i+3] == (1,) * (i+2) + (0,)
+            assert tuple(_row[20*i] for _row in pixels[20:20+i+2]) == (1,) * (i+1) + (0,)
+
+    def test_put_changed_array(self):
+        """PUT picks up changes to the sprite array."""
+        with Session() as s:
+            s.execute(b'''
+                10 SCREEN 1: DIM A%(10)
+                20 LINE (0, 0)-(3, 3), 3, BF
+                30 GET (0, 0)-(3, 3), A%
+                40 PUT (10, 0), A%, PSET
+                50 PUT (20, 0), A%, PSET
+                60 A%(2) = 0
+                70 PUT (30, 0), A%, PSET
+                RUN
+            ''')
+            pixels = s.get_pixels()
+        assert pixels[0][10:14] == (3,) * 4
+        assert pixels[3][20:24] == (3,) * 4
+        assert pixels[0][30:34] == (0,) * 4
+        assert pixels[3][30:34] == (3,) * 4
+
+    def test_text_scroll_pixels(self):
+        """Pixels of scrolled text match those of the same text loaded into a fresh screen."""
+        with Session() as s:
+            s.execute(b'''
+                10 KEY OFF: SCREEN 0: WIDTH 40: CLS
+                20 FOR I = 1 TO 30: COLOR I MOD 16, I MOD 8: PRINT I; STRING$(I, 64+I): NEXT
+                RUN
+            ''')
+            s.execute(b'DEF SEG = &HB800')
+            data = bytearray(s.evaluate(b'PEEK(%d)' % (_i,)) for _i in range(2000))
+            scrolled = s.get_pixels()
+        with open(self.output_path('TEXT.BIN'), 'wb') as f:
+            f.write(b'\xfd' + struct.pack('<HHH', 0xb800, 0, len(data)) + data)
+        with Session() as s:
+            name = s.bind_file(self.output_path('TEXT.BIN'))
+            s.execute('KEY OFF: WIDTH 40: CLS: BLOAD "{0}", 0'.format(name))
+            assert s.get_pixels() == scrolled
+            s.execute(b'SCREEN 1')
+            assert s.get_pixels()[0] == (0,) * 320
+
+    def test_frame_updates(self):
+        """Screen updates sent to the interface are collected per frame and end up complete."""
+        recorder = _TextRecorder()
+        with Session(recorder, frame_rate=1) as s:
+            s.execute(b'''
+                10 KEY OFF: CLS
+                20 FOR I = 1 TO 100: PRINT I; "abc";: PRINT "def": NEXT
+                30 VIEW PRINT 5 TO 7: LOCATE 7, 1: PRINT "up": PRINT "down";
+                RUN
+            ''')
+            recorder.replay()
+            expected = [_row.rstrip() for _row in self.get_text(s, as_type=type(u''))]
+        assert [u''.join(_row).rstrip() for _row in recorder.text] == expected
+        # PRINT does not clear the rest of the row; the view print area scrolls separately
+        assert expected[3:8] == [u' 81 abcdef', u' 83 abcdef', u'up4 abcdef', u'down', u' 85 abcdef']
+        # one update per row or less, not one per PRINT
+        assert recorder.updates <= 50
+
+    def test_shared_frame(self):
+        """Pixels sent through the shared frame end up complete, one update per release."""
+        recorder = _FrameRecorder()
+        with Session(recorder) as s:
+            s.execute(b'KEY OFF: SCREEN 2: CLS')
+            recorder.receive()
+            recorder.release()
+            s.execute(b'''
+                10 FOR I = 0 TO 20: LINE (I*30, 0)-(639-I*30, 199), 1: NEXT
+                20 LOCATE 10, 10: PRINT "shared"
+                RUN
+            ''')
+            recorder.receive()
+            # nothing more is sent until the interface releases the frame
+            assert len(recorder.pending) == 1
+            s.execute(b'CIRCLE (320, 100), 50, 1')
+            recorder.receive()
+            assert len(recorder.pending) == 1
+            recorder.release()
+            s.execute(b'PSET (0, 199), 1')
+            recorder.receive()
+            assert len(recorder.pending) == 1
+            recorder.release()
+            assert recorder.pixels.to_rows() == s.get_pixels()
+
+    def test_bload_video_memory(self):
+        """BLOAD across interlaced CGA banks and text rows, starting at odd addresses."""
+        data = bytearray(range(256)) * 64
+        with open(self.output_path('SCREEN.BIN'), 'wb') as f:
+            f.write(b'\xfd' + struct.pack('<HHH', 0xb800, 0, len(data)) + data)
+        with Session() as s:
+            name = s.bind_file(self.output_path('SCREEN.BIN'))
+            s.execute('SCREEN 1: DEF SEG = &HB800: BLOAD "{0}", 7001'.format(name))
+            # first byte of the second bank, and first byte of the second row in it
+            assert s.evaluate(b'PEEK(8192)') == data[8192-7001]
+            assert s.evaluate(b'PEEK(8272)') == data[8272-7001]
+            # the gap at the end of the first bank is not stored
+            assert s.evaluate(b'PEEK(8191)') == 0
+            # each byte holds four pixels; address 7001 is on row 2*87, halfway
+            pixels = s.get_pixels()
+            assert pixels[174][160:172] == (0, 0, 0, 0) + (0, 0, 0, 0) + (0, 0, 0, 1)
+            assert pixels[1][:4] == (2, 2, 1, 3)
+            s.execute('SCREEN 0: WIDTH 80: BLOAD "{0}", 3'.format(name))
+            assert s.evaluate(b'PEEK(3)') == 0 and s.evaluate(b'PEEK(4)') == 1
+            assert s.evaluate(b'PEEK(161)') == 158
+            chars = s.get_chars()
+        assert chars[0][2:4] == (b'\x01', b'\x03')
+        assert chars[1][0] == b'\x9d'
+
+    def test_save_screen(self):
+        """Saved PNG shows the pixels in the colours of the palette."""
+        output = io.BytesIO()
+        with Session(video='cga') as s:
+            s.execute(b'SCREEN 1: COLOR 1, 0: PSET (3, 2), 2: PSET (4, 2), 3')
+            s.save_screen(output)
+        chunks = _read_png_chunks(output.getvalue())
+        assert [_c[0] for _c in chunks] == [b'IHDR', b'PLTE', b'IDAT', b'IEND']
+        assert struct.unpack('>IIBBBBB', chunks[0][1]) == (320, 200, 8, 3, 0, 0, 0)
+        rows = _read_png_rows(chunks[2][1], 320)
+        palette = chunks[1][1]
+        colours = [palette[3*_i : 3*_i+3] for _i in bytearray(rows[2][2:5])]
+        # blue background, red and yellow in palette 0
+        assert colours == [b'\0\0\xaa', b'\xffUU', b'\xff\xffU']
+
+    def test_recording(self):
+        """Recorded animated PNG has a frame for the start and a partial frame for each change."""
+        output = io.BytesIO()
+        # each reading of the clock is 10 ms later than the last, so that every flush captures
+        recorder.time = _SteppingClock(0.01)
+        try:
+            with Session(video='cga') as s:
+                s.execute(b'SCREEN 2: CLS')
+                s.start_recording(output, frame_rate=1000)
+                s.execute(b'PSET (10, 5), 1')
+                s.execute(b'LINE (20, 7)-(30, 8), 1, BF')
+                s.stop_recording()
+        finally:
+            recorder.time = time
+        chunks = _read_png_chunks(output.getvalue())
+        types = [_c[0] for _c in chunks]
+        assert types[:4] == [b'IHDR', b'acTL', b'PLTE', b'fcTL']
+        assert types[-1] == b'IEND'
+        assert struct.unpack('>II', chunks[1][1]) == (3, 0)
+        frame_controls = [struct.unpack('>IIIIIHHBB', _c[1]) for _c in chunks if _c[0] == b'fcTL']
+        # sequence, width, height, x, y; first frame is whole screen
+        assert [_fc[:5] for _fc in frame_controls] == [
+            (0, 640, 200, 0, 0), (1, 1, 1, 10, 5), (3, 11, 2, 20, 7)
+        ]
+        # delay in milliseconds; the first change is shown until the next is captured
+        assert frame_controls[1][5] > 0 and frame_controls[1][6] == 1000
+        frame_data = [_c[1] for _c in chunks if _c[0] in (b'IDAT', b'fdAT')]
+        assert _read_png_rows(frame_data[0], 640)[5] == b'\0' * 640
+        assert struct.unpack('>I', frame_data[1][:4]) == (2,)
+        assert _read_png_rows(frame_data[2][4:], 11) == [b'\1' * 11] * 2
+
+    def test_mode_switch_reuse(self):
+        """Returning to an earlier screen mode gives blank pages, as on first entry."""
+        with Session(video='cga') as s:
+            s.execute(b'KEY OFF: SCREEN 1')
+            fresh_pixels, fresh_text = s.get_pixels(), self.get_text(s)
+            s.execute(b'COLOR 1, 0: LINE (0, 0)-(319, 199), 3, BF: LOCATE 5, 5: PRINT "x"')
+            s.execute(b'SCREEN 2: SCREEN 1')
+            assert s.get_pixels() == fresh_pixels
+            assert self.get_text(s) == fresh_text
+            s.execute(b'SCREEN 0, 0, 1, 1: WIDTH 80: PRINT "page one"')
+            s.execute(b'WIDTH 40: WIDTH 80: SCREEN 0, 0, 1, 1')
+            assert self.get_text_stripped(s) == [b''] * 25
+
+    def test_mode_switch_reuse_palette(self):
+        """Returning to an earlier screen mode restores its default palette."""
+        with Session(video='tandy') as s:
+            s.execute(b'SCREEN 5')
+            default = s._impl.display.colourmap.get_entry(1)
+            fresh_table = s._impl.display.colourmap.get_rgb_table()
+            for _ in range(2):
+                s.execute(b'PALETTE 1, 4: SCREEN 0: SCREEN 5')
+                assert s._impl.display.colourmap.get_entry(1) == default
+                assert s._impl.display.colourmap.get_rgb_table() == fresh_table
+
 
 if __name__ == '__main__':
     run_tests()
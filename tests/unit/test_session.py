@@ -8,6 +8,7 @@ This file is released under the GNU GPL version 3 or later.
 
 import os
 import io
+import wave
 
 from pcbasic import Session, run
 from tests.unit.utils import TestCase, run_tests
@@ -252,6 +253,73 @@ class SessionTest(TestCase):
         assert output[:3] == [b'0', b'Break\xff', b'Syntax error\xff']
         assert output[3:] == [b''] * 22
 
+    def test_session_snapshots(self):
+        """Test Session.get_generation, get_text_snapshot and get_pixel_snapshot."""
+        with Session(video='cga') as s:
+            s.execute(b'KEY OFF: SCREEN 1: LOCATE 2, 3: COLOR , 1: PRINT "AB": PSET (5, 100), 2')
+            generation = s.get_generation()
+            text = s.get_text_snapshot()
+            pixels = s.get_pixel_snapshot()
+            # unchanged screen gives the same generation and snapshots
+            assert s.get_generation() == generation
+            assert s.get_text_snapshot() is text
+            assert s.get_pixel_snapshot() is pixels
+            assert (text.height, text.width) == (25, 40)
+            assert text.chars.tobytes()[40:45] == b'  AB '
+            assert text.attrs.tobytes()[42:44] == b'\x03\x03'
+            assert (pixels.height, pixels.width, pixels.pitch) == (200, 320, 320)
+            offset = 100*pixels.pitch + 5
+            assert pixels.pixels[offset:offset+2].tobytes() == b'\x02\x00'
+            assert pixels.pixels.tobytes() == b''.join(
+                bytes(bytearray(_row)) for _row in s.get_pixels()
+            )
+            assert pixels.pixels.readonly
+            # the screen changes; old snapshots stay as they were
+            s.execute(b'PSET (6, 100), 1')
+            assert s.get_generation() != generation
+            assert pixels.pixels[offset:offset+2].tobytes() == b'\x02\x00'
+            assert s.get_pixel_snapshot().pixels[offset:offset+2].tobytes() == b'\x02\x01'
+            # switching the visible page counts as a change
+            s.execute(b'SCREEN 0: WIDTH 80')
+            generation = s.get_generation()
+            s.execute(b'SCREEN 0, 0, 1, 1')
+            assert s.get_generation() != generation
+            assert s.get_text_snapshot().chars.tobytes() == b' ' * 2000
+
+    def test_session_audio_file(self):
+        """Test rendering sound to a WAV file in simulated time."""
+        program = b'PLAY "T120 L8 CDEFGAB": SOUND 440, 18.2: PLAY "MB L4 CDE"'
+        renders = []
+        for _ in range(2):
+            wav = io.BytesIO()
+            with Session(audio_file=wav, input_streams=None, output_streams=None) as s:
+                s.execute(program)
+            renders.append(wav.getvalue())
+        assert renders[0] == renders[1]
+        wave_file = wave.open(io.BytesIO(renders[0]))
+        assert (wave_file.getnchannels(), wave_file.getframerate()) == (1, 44100)
+        # 7 eighth notes, one second of sound and 3 quarter notes, rendered to the end
+        assert abs(wave_file.getnframes() / 44100. - 4.25) < 0.01
+        samples = wave_file.readframes(wave_file.getnframes())
+        assert samples.strip(b'\x80')
+        # a background loop polling the queue does not hang
+        with Session(audio_file=io.BytesIO(), input_streams=None, output_streams=None) as s:
+            s.execute(b'PLAY "MB CDE": WHILE PLAY(0) > 0: WEND: A = 1')
+            assert s.evaluate(b'A') == 1
+
+    def test_session_audio_file_stop(self):
+        """Sound rendered after a stop starts straight away."""
+        renders = []
+        for program in (b'SOUND 440, 18.2', b'10 SOUND 440, 18.2\rRUN'):
+            wav = io.BytesIO()
+            with Session(audio_file=wav, input_streams=None, output_streams=None) as s:
+                s.execute(program)
+            wave_file = wave.open(io.BytesIO(wav.getvalue()))
+            renders.append(wave_file.readframes(wave_file.getnframes()))
+        # RUN sends a stop signal before the tone is played; the first sample is not silent
+        assert renders[0][:1] != b'\x80'
+        assert renders[1][:len(renders[0])] == renders[0]
+
     def test_session_no_streams(self):
         """Test Session without stream copy."""
         with Session(input_streams=None, output_streams=None) as s:
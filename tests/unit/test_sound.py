@@ -0,0 +1,129 @@
+"""
+PC-BASIC test.sound
+unit tests for sound statements
+
+(c) 2020 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+import io
+import unittest
+
+from pcbasic import Session
+from pcbasic.basic.base import signals
+from pcbasic.basic.sound import TimedQueue, VirtualClock
+
+
+class _AudioCollector(object):
+    """Collect audio signals in place of the renderer."""
+
+    def __init__(self):
+        self.signals = []
+
+    def put(self, signal):
+        if signal.event_type == signals.AUDIO_TONE:
+            self.signals.append(tuple(signal.params))
+
+    def close(self):
+        pass
+
+
+class SoundTest(unittest.TestCase):
+    """Unit tests for sound statements."""
+
+    def _session(self, syntax=u'advanced'):
+        """Session with sound in simulated time, collecting tones."""
+        session = Session(
+            syntax=syntax, audio_file=io.BytesIO(), input_streams=None, output_streams=None
+        )
+        session.start()
+        collector = _AudioCollector()
+        session._impl.sound._renderer = collector
+        return session, collector
+
+    def test_play_cache(self):
+        """Repeated PLAY strings give the same tones and state, from the cache."""
+        session, collector = self._session()
+        with session:
+            mml = b'PLAY "T160 O3 L8 C D# E-4 MS F. > G P16 N40 MB MN T120 L4"'
+            session.execute(mml)
+            first = collector.signals[:]
+            assert len(session._impl.sound._play_cache) == 1
+            # background music
+            assert session.evaluate(b'PLAY(0)') > 0
+            del collector.signals[:]
+            session.execute(mml)
+            assert len(session._impl.sound._play_cache) == 1
+            assert collector.signals == first
+            state = session._impl.sound._state[0]
+            assert (state.octave, state.fill, state.tempo, state.length) == (4, 0.875, 2., 0.25)
+            # a different starting state needs a different parse
+            session.execute(b'PLAY "MS"')
+            session.execute(mml)
+            assert len(session._impl.sound._play_cache) == 3
+
+    def test_play_uncacheable(self):
+        """PLAY strings with variables are parsed each time."""
+        session, collector = self._session()
+        with session:
+            session.execute(b'A = 4: B$ = "L=A;C": PLAY "X" + VARPTR$(B$): PLAY "L=A;D"')
+            session.execute(b'A = 2: PLAY "XB$;"')
+            assert not session._impl.sound._play_cache
+            durations = [_tone[2] for _tone in collector.signals if _tone[4]]
+            assert durations == [0.4375, 0.4375, 0.875]
+
+    def test_play_error(self):
+        """PLAY strings with errors are not cached; earlier voices still play."""
+        session, collector = self._session(u'tandy')
+        with session:
+            session.execute(b'PLAY "CDE", "CD Z"')
+            assert not session._impl.sound._play_cache
+            frequencies = [_tone[:2] for _tone in collector.signals if _tone[4]]
+            assert len(frequencies) == 5
+
+    def test_on_play(self):
+        """ON PLAY is triggered in simulated time while the program runs."""
+        session, _ = self._session()
+        with session:
+            session.execute(b'10 ON PLAY(2) GOSUB 100: PLAY ON: PLAY "MB L4 CDEFGAB"')
+            session.execute(b'20 IF N < 3 GOTO 20')
+            session.execute(b'30 END')
+            session.execute(b'100 N = N + 1: PLAY "MB CDE": RETURN')
+            session.execute(b'RUN')
+            assert session.evaluate(b'N') == 3
+
+    def test_timed_queue(self):
+        """Timed queue expires items and counts tones by the clock it is given."""
+        clock = VirtualClock()
+        queue = TimedQueue(clock)
+        for i in range(4):
+            # tone and gap
+            queue.put(i, 0.5, True)
+            queue.put(None, 0.25, False)
+        assert len(queue) == 8
+        assert queue.tones_waiting() == 3
+        assert queue.next_expiry() == 0.5
+        assert queue.expiry() == 3.
+        clock.advance_to(0.5)
+        assert len(queue) == 7
+        # the gap is playing, all remaining tones are waiting
+        assert queue.tones_waiting() == 3
+        clock.advance_to(1.25)
+        assert queue.tones_waiting() == 2
+        assert [_d for _, _d in queue.items()] == [0.25, 0.5, 0.25, 0.5, 0.25]
+        # a looping item stays until the next one is put
+        queue.put(5, None, True)
+        clock.advance_to(10.)
+        assert len(queue) == 1
+        assert queue.next_expiry() is None
+        assert queue.expiry() == 10.
+        queue.put(6, 1., True)
+        assert len(queue) == 1
+        assert queue.tones_waiting() == 0
+        queue.clear()
+        assert len(queue) == 0
+        assert queue.tones_waiting() == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+"""
+PC-BASIC test.synthesiser
+unit tests for the tone and noise sample generator
+
+(c) 2020 Rob Hagemans
+This file is released under the GNU GPL version 3 or later.
+"""
+
+import unittest
+import random
+from math import ceil
+
+from pcbasic.interface import synthesiser
+from pcbasic.interface.mixer import Mixer, CHUNK_LENGTH
+
+
+def _reference_chunk(generator, source, length):
+    """Build a chunk sample by sample, as the synthesiser used to; return a bytearray or None."""
+    res = synthesiser._RESOLUTION
+    if generator._count_samples >= generator._num_samples:
+        return None
+    if length + generator._count_samples > generator._num_samples and not generator.loop:
+        length = generator._num_samples - generator._count_samples
+    if generator._frequency in (0, 32767):
+        chunk = bytearray(length)
+    else:
+        half_wavelength = synthesiser.SAMPLE_RATE / (2.*generator._frequency)
+        first_half_wave = bytearray()
+        if source.phase:
+            first_length = int(half_wavelength * source.phase)
+            first_half_wave = bytearray([source.bit]) * first_length * res
+            length -= first_length
+            source.phase = 0.
+        bits = [source.next() for _ in range(int(ceil(length / half_wavelength)))]
+        stretch = int(half_wavelength * res)
+        matrix = first_half_wave + bytearray().join(bytearray([_b]) * stretch for _b in bits)
+        sums = [sum(matrix[_i:_i+res]) for _i in range(0, len(matrix) - len(matrix) % res, res)]
+        averages = [(_s - res // 2) * generator._amplitude // res for _s in sums]
+        chunk = bytearray(_sb if _sb >= 0 else 0xff + _sb for _sb in averages)
+    if not generator.loop:
+        if generator._count_samples + len(chunk) < generator._num_samples:
+            generator._count_samples += len(chunk)
+        else:
+            rest_length = generator._num_samples - generator._count_samples
+            if generator._frequency not in (0, 32767):
+                source.phase = float(len(chunk) - rest_length) / half_wavelength
+            else:
+                source.phase = 0.
+            chunk = chunk[:rest_length]
+            generator._count_samples = generator._num_samples
+    return chunk
+
+
+class SynthesiserTest(unittest.TestCase):
+    """Unit tests for the synthesiser."""
+
+    def _compare(self, voice, feedback, frequencies, seed):
+        """Compare chunks with the sample-by-sample reference for a sequence of random tones."""
+        rand = random.Random(seed)
+        source = synthesiser.get_signal_sources()[voice]
+        ref_source = synthesiser.get_signal_sources()[voice]
+        for _ in range(40):
+            frequency = rand.choice(frequencies + [rand.uniform(37, 20000)])
+            args = frequency, rand.uniform(0, 0.2), rand.random() < 0.1, rand.randint(0, 15)
+            generator = synthesiser.SoundGenerator(source, feedback, *args)
+            ref_generator = synthesiser.SoundGenerator(ref_source, feedback, *args)
+            for _ in range(5):
+                length = rand.choice([7, 100, 512, 1024])
+                chunk = generator.build_chunk(length)
+                ref_chunk = _reference_chunk(ref_generator, ref_source, length)
+                if ref_chunk is None:
+                    assert chunk is None
+                    break
+                assert chunk == ref_chunk
+            assert source.phase == ref_source.phase
+            assert source.bit == ref_source.bit
+
+    def test_tone(self):
+        """Tone samples agree with the sample-by-sample reference."""
+        frequencies = [0, 32767, 37, 440, 441.3, 2205, 14000, 32766]
+        self._compare(0, synthesiser.FEEDBACK_TONE, frequencies, seed=1)
+
+    def test_noise(self):
+        """Noise samples agree with the sample-by-sample reference."""
+        frequencies = [0, 110, 1747, 3495, 6991]
+        self._compare(synthesiser.NOISE_VOICE, synthesiser.FEEDBACK_NOISE, frequencies, seed=2)
+
+    def test_noise_bits(self):
+        """Shift register bits in blocks agree with single steps."""
+        source = synthesiser.SignalSource(synthesiser.FEEDBACK_NOISE, synthesiser.INIT_NOISE)
+        ref_source = synthesiser.SignalSource(synthesiser.FEEDBACK_NOISE, synthesiser.INIT_NOISE)
+        for count in (1, 8, 13, 64, 1001):
+            bits = source.next_bits(count)
+            assert bits == bytes(bytearray(ref_source.next() for _ in range(count)))
+            assert source.bit == ref_source.bit
+
+    def test_cycle_cache_bounded(self):
+        """Sampled tone cycles are kept for a limited number of tones."""
+        source = synthesiser.get_signal_sources()[0]
+        for frequency in range(100, 100 + 4 * synthesiser._MAX_CYCLES, 2):
+            generator = synthesiser.SoundGenerator(
+                source, synthesiser.FEEDBACK_TONE, frequency, 0.01, False, 15
+            )
+            generator.build_chunk(512)
+        assert len(synthesiser._tone_cycles._cycles) <= synthesiser._MAX_CYCLES
+
+    def test_mixer(self):
+        """Mixed voices wrap around as sums of signed bytes."""
+        mixer = Mixer(2048, 1024)
+        sources = synthesiser.get_signal_sources()
+        expected = [bytearray() for _ in synthesiser.VOICES]
+        for voice, frequency in enumerate((440, 1000, 3000)):
+            mixer.tone(voice, frequency, 0.05, False, 15)
+            generator = synthesiser.SoundGenerator(
+                sources[voice], synthesiser.FEEDBACK_TONE, frequency, 0.05, False, 15
+            )
+            while True:
+                chunk = generator.build_chunk(4096)
+                if chunk is None:
+                    break
+                expected[voice].extend(chunk)
+        mixer.fill()
+        length = max(len(_e) for _e in expected)
+        mixed = bytearray()
+        while len(mixed) < length:
+            mixed.extend(mixer.mix(1024))
+            mixer.fill()
+        expected = [_e.ljust(len(mixed), b'\0') for _e in expected]
+        assert mixed == bytearray(sum(_b) & 0xff for _b in zip(*expected))
+        # 16-bit output holds the mixed samples in the high bytes
+        assert mixer.mix_16(4).tobytes() == b'\0' * 8
+
+    def test_mixer_16(self):
+        """16-bit mixes hold the 8-bit mix in the high bytes of the preallocated output."""
+        mixers = Mixer(2048, 1024), Mixer(2048, 1024)
+        for mixer in mixers:
+            for voice, frequency in enumerate((440, 1000, 3000)):
+                mixer.tone(voice, frequency, 0.05, False, 15)
+            mixer.fill()
+        # a voice running out within the mix is padded with silence
+        for length in (1024, 1000, 1024):
+            expected = bytearray(2*length)
+            expected[1::2] = mixers[0].mix(length)
+            assert mixers[1].mix_16(length).tobytes() == bytes(expected)
+            for mixer in mixers:
+                mixer.fill()
+
+    def test_mixer_buffer_length(self):
+        """Minimum buffer must leave room in the ring buffer for a chunk."""
+        with self.assertRaises(ValueError):
+            Mixer(16384, 1024)
+
+    def test_mixer_consecutive(self):
+        """Consecutive tones on one voice play without gaps while another voice plays."""
+        mixer = Mixer(CHUNK_LENGTH, CHUNK_LENGTH)
+        sources = synthesiser.get_signal_sources()
+        tones = [(0, 440, 0.05), (0, 880, 0.05), (0, 660, 0.05), (1, 1000, 0.2)]
+        expected = [bytearray() for _ in synthesiser.VOICES]
+        for voice, frequency, duration in tones:
+            mixer.tone(voice, frequency, duration, False, 15)
+            generator = synthesiser.SoundGenerator(
+                sources[voice], synthesiser.FEEDBACK_TONE, frequency, duration, False, 15
+            )
+            while True:
+                chunk = generator.build_chunk(CHUNK_LENGTH)
+                if chunk is None:
+                    break
+                expected[voice].extend(chunk)
+        # mix as much as the fullest voice holds, as the pygame plugin does
+        mixed = bytearray()
+        while True:
+            mixer.fill()
+            length = min(CHUNK_LENGTH, mixer.available())
+            if not length:
+                break
+            mixed.extend(mixer.mix(length))
+        expected = [_e.ljust(len(mixed), b'\0') for _e in expected]
+        assert mixed == bytearray(sum(_b) & 0xff for _b in zip(*expected))
+
+    def test_mixer_hush(self):
+        """Hush drops buffered samples."""
+        mixer = Mixer(2048, 1024)
+        mixer.tone(0, 440, 1, False, 15)
+        mixer.fill()
+        assert mixer.busy
+        assert mixer.available()
+        mixer.hush()
+        assert not mixer.busy
+        assert mixer.mix(16) == bytearray(16)
+        assert not mixer.available()
+
+
+if __name__ == '__main__':
+    unittest.main()